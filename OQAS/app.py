@@ -7,55 +7,46 @@ from services.session_service import SessionController
 from services.qr_services import QRService
 from services.attendance_service import AttendanceService
 from services.report_service import ReportService
-import sqlite3
+from services.roster_service import RosterService
+from services.enrollment_service import EnrollmentService
+from services.dashboard_service import DashboardService
+from services.password_service import PasswordBusyError
+from services.admission import admission_limit
+from services.http_cache import conditional
+from services.profiler import profiler, memory, ProfilerBusyError
+from services.scheduler import scheduler
+from services import app_logging, assets, audit, cache, compression, data_versions, events, metrics, templating, tracing
 from datetime import datetime
-from config import DB_PATH
-from config import SECRET_KEY, PORT
-from db import get_db, close_db
+from config import SECRET_KEY, METRICS_TOKEN, SLOW_QUERY_MS, SLOW_QUERY_LOG, TRACE_SAMPLE_RATE, TRACE_SLOW_MS, TRACE_LOG
+from config import LOG_PATH, LOG_LEVEL, LOG_LEVELS, LOG_MAX_BYTES, LOG_BACKUPS, COMPRESS_MIN_SIZE, COMPRESS_LEVEL
+from config import TEMPLATE_CACHE_DIR, BACKUP_DIR, EVENTS_TOKEN
+from db import read_connection, close_db, pool_stats
+from db.query_log import query_log
+import init_db
 from werkzeug.utils import secure_filename
 from flask_wtf.csrf import CSRFProtect, CSRFError
 from collections import defaultdict, deque
 import time
 from functools import wraps
+import hmac
+import logging
 import os
+import threading
 
-app = Flask(__name__)
-app.secret_key = SECRET_KEY   # Needed for session
-csrf = CSRFProtect(app)
+logger = logging.getLogger("oqas.app")
 
-# Ensure DB connection closes after each request
-@app.teardown_appcontext
-def _teardown_db(exception):
-	close_db(exception)
-
-# Ensure critical indexes exist at startup (idempotent)
-with app.app_context():
-	conn = get_db()
-	try:
-		# Ensure session_audit table exists (for existing databases)
-		conn.execute(
-			"""
-			CREATE TABLE IF NOT EXISTS session_audit (
-			    audit_id INTEGER PRIMARY KEY AUTOINCREMENT,
-			    session_id INTEGER NOT NULL,
-			    actor_user_id INTEGER NOT NULL,
-			    action TEXT NOT NULL,
-			    note TEXT,
-			    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-			    FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE ON UPDATE CASCADE,
-			    FOREIGN KEY (actor_user_id) REFERENCES users(user_id) ON DELETE SET NULL ON UPDATE CASCADE
-			);
-			"""
-		)
-		conn.execute(
-			"""
-			CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_session_student
-			ON attendance (session_id, student_id);
-			"""
-		)
-		conn.commit()
-	except Exception:
-		pass
+csrf = CSRFProtect()
+
+# Views are recorded here at import and registered on each app by create_app(),
+# so importing this module has no side effects (no app, no DB, no DDL).
+_ROUTES = []
+
+def route(rule, **options):
+    """Module-level stand-in for @app.route; the endpoint is the function name."""
+    def decorator(f):
+        _ROUTES.append((rule, f, options))
+        return f
+    return decorator
 
 # Login required decorator
 def login_required(f):
@@ -92,11 +83,12 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@app.route("/")
+@route("/")
 def index():
     return redirect(url_for("login"))
 
-@app.route("/login", methods=["GET", "POST"])
+@route("/login", methods=["GET", "POST"])
+@admission_limit("login", methods=("POST",))
 def login():
     if request.method == "GET":
         return render_template("login.html")
@@ -121,22 +113,51 @@ def login():
     except ValueError as e:
         flash(str(e))
         return render_template("login.html", error="Invalid credentials")
+    except PasswordBusyError as e:
+        flash(str(e))
+        return render_template("login.html", error=str(e)), 503, {"Retry-After": "2"}
 
-@app.route("/logout")
+@route("/logout")
 def logout():
     session.pop('user', None)
     flash('You have been logged out.')
     return redirect(url_for('login'))
 
-@app.route("/admin/dashboard")
+@route("/admin/dashboard")
 @admin_required
 def admin_dashboard():
-    lecturers = AdminService.list_lecturers()
-    modules = AdminService.list_modules()
-    last_backup = None
-    return render_template("admin_dashboard.html", lecturers=lecturers, modules=modules, last_backup=last_backup)
+    # Lecturer and module tables are filled page by page from /admin/lecturers and /admin/modules
+    counts = DashboardService.admin()
+    backups = AdminService.list_backups(BACKUP_DIR)
+    last_backup = os.path.basename(backups[0]) if backups else None
+    return render_template("admin_dashboard.html", counts=counts, last_backup=last_backup)
 
-@app.route("/admin/lecturers", methods=["POST"])
+@route("/admin/lecturers", methods=["GET"])
+@admin_required
+def admin_search_lecturers():
+    """?q=<username prefix>&after=<next from the previous page>&dir=asc|desc&limit=N"""
+    page = AdminService.search_lecturers(
+        q=request.args.get("q", "").strip(),
+        after=request.args.get("after") or None,
+        descending=request.args.get("dir") == "desc",
+        limit=request.args.get("limit", 50, type=int),
+    )
+    return jsonify({"ok": True, **page})
+
+@route("/admin/modules", methods=["GET"])
+@admin_required
+def admin_search_modules():
+    """?q=<module code prefix>&lecturer_id=&after=&dir=asc|desc&limit=N"""
+    page = AdminService.search_modules(
+        q=request.args.get("q", "").strip(),
+        lecturer_id=request.args.get("lecturer_id", type=int),
+        after=request.args.get("after") or None,
+        descending=request.args.get("dir") == "desc",
+        limit=request.args.get("limit", 50, type=int),
+    )
+    return jsonify({"ok": True, **page})
+
+@route("/admin/lecturers", methods=["POST"])
 @admin_required
 def admin_create_lecturer():
     username = request.form.get("username", "").strip()
@@ -146,7 +167,7 @@ def admin_create_lecturer():
     flash("Lecturer created" if ok else err)
     return redirect(url_for('admin_dashboard'))
 
-@app.route("/admin/lecturers/<int:user_id>/reset", methods=["POST"])
+@route("/admin/lecturers/<int:user_id>/reset", methods=["POST"])
 @admin_required
 def admin_reset_lecturer_password(user_id: int):
     new_password = request.form.get("new_password", "").strip()
@@ -154,14 +175,14 @@ def admin_reset_lecturer_password(user_id: int):
     flash("Password reset" if ok else err)
     return redirect(url_for('admin_dashboard'))
 
-@app.route("/admin/lecturers/<int:user_id>/delete", methods=["POST"])
+@route("/admin/lecturers/<int:user_id>/delete", methods=["POST"])
 @admin_required
 def admin_delete_lecturer(user_id: int):
     ok, err = AdminService.delete_lecturer(user_id)
     flash("Lecturer deleted" if ok else err)
     return redirect(url_for('admin_dashboard'))
 
-@app.route("/admin/modules", methods=["POST"])
+@route("/admin/modules", methods=["POST"])
 @admin_required
 def admin_create_module():
     module_code = request.form.get("module_code", "").strip()
@@ -172,7 +193,7 @@ def admin_create_module():
     flash("Module created" if ok else err)
     return redirect(url_for('admin_dashboard'))
 
-@app.route("/admin/modules/<int:module_id>", methods=["POST"])
+@route("/admin/modules/<int:module_id>", methods=["POST"])
 @admin_required
 def admin_update_module(module_id: int):
     module_code = request.form.get("module_code", "").strip()
@@ -183,21 +204,21 @@ def admin_update_module(module_id: int):
     flash("Module updated" if ok else err)
     return redirect(url_for('admin_dashboard'))
 
-@app.route("/admin/modules/<int:module_id>/delete", methods=["POST"])
+@route("/admin/modules/<int:module_id>/delete", methods=["POST"])
 @admin_required
 def admin_delete_module(module_id: int):
     ok, err = AdminService.delete_module(module_id)
     flash("Module deleted" if ok else err)
     return redirect(url_for('admin_dashboard'))
 
-@app.route("/admin/backup", methods=["POST"])
+@route("/admin/backup", methods=["POST"])
 @admin_required
 def admin_backup_db():
-    ok, err, path = AdminService.backup_database(target_dir="db/backups")
+    ok, err, path = AdminService.backup_database(target_dir=BACKUP_DIR)
     flash(f"Backup created: {path}" if ok else f"Backup failed: {err}")
     return redirect(url_for('admin_dashboard'))
 
-@app.route("/admin/restore", methods=["POST"])
+@route("/admin/restore", methods=["POST"])
 @admin_required
 def admin_restore_db():
     file = request.files.get("dbfile")
@@ -214,30 +235,211 @@ def admin_restore_db():
     if ext.lower() not in allowed_exts:
         flash("Invalid file type. Please upload a .db/.sqlite file")
         return redirect(url_for('admin_dashboard'))
-    # Save uploaded file to a temp path
-    temp_path = os.path.join("db", "uploads", filename)
-    os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-    file.save(temp_path)
-    ok, err = AdminService.restore_database(temp_path)
+    # Stream the upload into a temp file beside the live DB; restore validates and swaps it
+    try:
+        staged_path = AdminService.stage_restore_upload(file.stream)
+    except Exception as e:
+        logger.exception("restore upload failed")
+        flash(f"Restore failed: {str(e)}")
+        return redirect(url_for('admin_dashboard'))
+    ok, err = AdminService.restore_database(staged_path, staged=True)
     flash("Database restored" if ok else f"Restore failed: {err}")
     return redirect(url_for('admin_dashboard'))
 
-@app.route("/lecturer/dashboard")
+@route("/admin/students/import", methods=["POST"])
+@admin_required
+def admin_import_students():
+    file = request.files.get("rosterfile")
+    if not file or not secure_filename(file.filename or ""):
+        return jsonify({"ok": False, "error": "No file uploaded"}), 400
+    if not file.filename.lower().endswith(".csv"):
+        return jsonify({"ok": False, "error": "Please upload a .csv file"}), 400
+    job_id = RosterService.start_import_job(file.read())
+    return jsonify({"ok": True, "job_id": job_id})
+
+@route("/admin/students/import/<job_id>", methods=["GET"])
+@admin_required
+def admin_import_students_status(job_id: str):
+    job = RosterService.get_job(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Unknown import job"}), 404
+    return jsonify({"ok": True, "job": job})
+
+@route("/admin/enrollments/import", methods=["POST"])
+@admin_required
+def admin_import_enrollments():
+    """Bulk load module_code,student_id rows; replace=1 syncs each listed module to the file."""
+    file = request.files.get("enrollmentfile")
+    if not file or not secure_filename(file.filename or ""):
+        return jsonify({"ok": False, "error": "No file uploaded"}), 400
+    if not file.filename.lower().endswith(".csv"):
+        return jsonify({"ok": False, "error": "Please upload a .csv file"}), 400
+    replace = request.form.get("replace") in ("1", "true", "on")
+    counts, errors = EnrollmentService.load_csv(file.read(), replace=replace)
+    return jsonify({"ok": True, "counts": counts, "errors": errors})
+
+@route("/admin/db/stats", methods=["GET"])
+@admin_required
+def admin_db_stats():
+    """Connection pool counters; reader and writer wait times are reported separately."""
+    return jsonify({"ok": True, "pools": pool_stats()})
+
+@route("/admin/cache", methods=["GET"])
+@admin_required
+def admin_cache_stats():
+    """Entries, hits, misses, evictions and invalidations of each service cache in this process."""
+    return jsonify({"ok": True, "caches": cache.stats()})
+
+@route("/admin/db/slow-queries", methods=["GET"])
+@admin_required
+def admin_slow_queries():
+    """Top statements by total time (or ?by=max|count|avg) since start, with cached plans."""
+    top = request.args.get("top", default=20, type=int)
+    by = request.args.get("by", default="total")
+    return jsonify({"ok": True, "threshold_ms": SLOW_QUERY_MS, "statements": query_log.top(top, by=by),
+                    "writer": query_log.stats()})
+
+@route("/admin/audit", methods=["GET"])
+@admin_required
+def admin_audit():
+    """Audit trail, newest first: ?session_id=&actor=&action=&since=&until=&before=<next>&limit=N"""
+    try:
+        page = audit.query(
+            session_id=request.args.get("session_id", type=int),
+            actor_user_id=request.args.get("actor", type=int),
+            action=request.args.get("action") or None,
+            since=request.args.get("since") or None,
+            until=request.args.get("until") or None,
+            before=request.args.get("before") or None,
+            limit=request.args.get("limit", audit.PAGE_SIZE, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, **page, "writer": audit.writer.stats()})
+
+@route("/admin/scheduler", methods=["GET"])
+@admin_required
+def admin_scheduler():
+    """Scheduled jobs in this worker: interval, next run, counters and recent run history."""
+    return jsonify({"ok": True, **scheduler.status()})
+
+@route("/admin/scheduler/<name>/run", methods=["POST"])
+@admin_required
+def admin_scheduler_run(name: str):
+    """Run a job now (skipped if it is already running); returns that run's record."""
+    record = scheduler.run_now(name)
+    if record is None:
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+    return jsonify({"ok": record["status"] != "error", "run": record})
+
+@route("/admin/profile", methods=["GET"])
+@admin_required
+def admin_profile_status():
+    return jsonify({"ok": True, "profile": profiler.status()})
+
+@route("/admin/profile/start", methods=["POST"])
+@admin_required
+def admin_profile_start():
+    """Sample all thread stacks for ?seconds= (default 30) every ?interval_ms= (default 10)."""
+    seconds = request.args.get("seconds", default=30.0, type=float)
+    interval_ms = request.args.get("interval_ms", default=10.0, type=float)
+    include_idle = request.args.get("idle") in ("1", "true", "yes")
+    try:
+        status = profiler.start(seconds, interval_ms, include_idle=include_idle)
+    except ProfilerBusyError as e:
+        return jsonify({"ok": False, "error": str(e), "profile": profiler.status()}), 409
+    logger.info("sampling profiler started by %s for %.0fs", session["user"]["username"], status["seconds"])
+    return jsonify({"ok": True, "profile": status})
+
+@route("/admin/profile/stop", methods=["POST"])
+@admin_required
+def admin_profile_stop():
+    return jsonify({"ok": True, "profile": profiler.stop()})
+
+@route("/admin/profile/collapsed", methods=["GET"])
+@admin_required
+def admin_profile_collapsed():
+    """Collapsed stacks of the last profile, for flamegraph.pl / speedscope."""
+    stamp = datetime.fromtimestamp(profiler.started_at or time.time()).strftime("%Y%m%d-%H%M%S")
+    return Response(
+        profiler.collapsed(),
+        mimetype="text/plain",
+        headers={"Content-Disposition": f"attachment; filename=oqas-profile-{stamp}.collapsed"},
+    )
+
+@route("/admin/memory", methods=["GET"])
+@admin_required
+def admin_memory_status():
+    return jsonify({"ok": True, "memory": memory.status()})
+
+@route("/admin/memory/start", methods=["POST"])
+@admin_required
+def admin_memory_start():
+    """Start tracemalloc, keeping ?frames= (default 10) frames per allocation."""
+    return jsonify({"ok": True, "memory": memory.start(request.args.get("frames", default=10, type=int))})
+
+@route("/admin/memory/stop", methods=["POST"])
+@admin_required
+def admin_memory_stop():
+    return jsonify({"ok": True, "memory": memory.stop()})
+
+@route("/admin/memory/snapshot", methods=["POST"])
+@admin_required
+def admin_memory_snapshot():
+    """Take a snapshot; the response lists its top allocation sites."""
+    try:
+        snap_id = memory.snapshot()
+    except RuntimeError as e:
+        return jsonify({"ok": False, "error": str(e)}), 409
+    limit = request.args.get("limit", default=20, type=int)
+    return jsonify({"ok": True, "snapshot": snap_id, "top": memory.top(snap_id, request.args.get("key", "lineno"), limit), "memory": memory.status()})
+
+@route("/admin/memory/diff", methods=["GET"])
+@admin_required
+def admin_memory_diff():
+    """Growth between snapshots ?from= and ?to= (default: the two most recent)."""
+    ids = [s["id"] for s in memory.status()["snapshots"]]
+    old_id = request.args.get("from", default=ids[-2] if len(ids) >= 2 else 0, type=int)
+    new_id = request.args.get("to", default=ids[-1] if ids else 0, type=int)
+    limit = request.args.get("limit", default=20, type=int)
+    try:
+        stats = memory.diff(old_id, new_id, request.args.get("key", "lineno"), limit)
+    except KeyError as e:
+        return jsonify({"ok": False, "error": str(e.args[0])}), 404
+    return jsonify({"ok": True, "from": old_id, "to": new_id, "stats": stats})
+
+@route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text: per-endpoint latency/status/SQL counts plus pool, gate and hash state."""
+    auth = request.headers.get("Authorization", "")
+    token_ok = bool(METRICS_TOKEN) and hmac.compare_digest(auth, f"Bearer {METRICS_TOKEN}")
+    if not token_ok and not ('user' in session and AuthService.is_admin(session['user'])):
+        return Response("forbidden\n", status=403, mimetype="text/plain")
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@route("/lecturer/dashboard")
 @lecturer_required
 def lecturer_dashboard():
     """Lecturer dashboard showing their modules"""
     user = session['user']
-    modules = ModuleService.get_modules_by_lecturer(user['user_id'])
-    
-    # Get active sessions for each module
-    for module in modules:
-        module['active_session'] = ModuleService.get_active_session(module['module_id'])
-    
-    return render_template("dashboard.html", user=user, modules=modules)
+    dashboard = DashboardService.lecturer(user['user_id'])
+    return render_template("dashboard.html", user=user, modules=dashboard["modules"], dashboard=dashboard)
+
+@route("/api/lecturer/dashboard", methods=["GET"])
+@admission_limit("api")
+@lecturer_required
+def api_lecturer_dashboard():
+    """The dashboard's data as JSON; the page refreshes its module rows from this."""
+    try:
+        return jsonify({"ok": True, "data": DashboardService.lecturer(session['user']['user_id'])})
+    except Exception as e:
+        logger.exception("lecturer dashboard data failed")
+        return jsonify({"ok": False, "error": str(e)}), 500
 
 # --- Student portal ---
-@app.route("/student/attendance")
+@route("/student/attendance")
 @login_required
+@conditional(lambda: [data_versions.student(session["user"]["user_id"])] if session["user"].get("role") == "student" else None)
 def student_portal():
     user = session['user']
     if user.get('role') != 'student':
@@ -249,7 +451,7 @@ def student_portal():
     return render_template("student_portal.html", user=user, history=history, current_session_id=session_id)
 
 # Student: Change password
-@app.route("/student/password", methods=["GET", "POST"])
+@route("/student/password", methods=["GET", "POST"])
 @login_required
 def student_change_password():
     user = session['user']
@@ -275,7 +477,7 @@ def student_change_password():
     flash('Password updated successfully.')
     return redirect(url_for('student_portal'))
 
-@app.route("/session/start/<int:module_id>", methods=["POST"])
+@route("/session/start/<int:module_id>", methods=["POST"])
 @lecturer_required
 @csrf.exempt
 def start_session(module_id):
@@ -286,7 +488,7 @@ def start_session(module_id):
         from datetime import datetime
         week_number = datetime.now().isocalendar()[1]
         
-        success = ModuleService.start_session(module_id, week_number)
+        success = ModuleService.start_session(module_id, week_number, actor_user_id=session["user"]["user_id"])
         
         if success:
             flash(f'Session started successfully for week {week_number}')
@@ -294,17 +496,18 @@ def start_session(module_id):
             flash('Failed to start session')
             
     except Exception as e:
+        logger.exception("starting session for module %s failed", module_id)
         flash(f'Error starting session: {str(e)}')
     
     return redirect(url_for('lecturer_dashboard'))
 
-@app.route("/session/close/<int:module_id>", methods=["POST"])
+@route("/session/close/<int:module_id>", methods=["POST"])
 @lecturer_required
 @csrf.exempt
 def close_session(module_id):
     """Close the active session for a module"""
     try:
-        success = ModuleService.close_session(module_id)
+        success = ModuleService.close_session(module_id, actor_user_id=session["user"]["user_id"])
         
         if success:
             flash('Session closed successfully')
@@ -312,11 +515,12 @@ def close_session(module_id):
             flash('No active session found to close')
             
     except Exception as e:
+        logger.exception("closing session for module %s failed", module_id)
         flash(f'Error closing session: {str(e)}')
     
     return redirect(url_for('lecturer_dashboard'))
 
-@app.route("/session/qr/start/<int:module_id>")
+@route("/session/qr/start/<int:module_id>")
 def start_session_qr(module_id):
     user = session.get("user")
     if not user or user.get("role") != "lecturer":
@@ -329,7 +533,7 @@ def start_session_qr(module_id):
     return render_template("session_qr.html", qr=result["qr"], module_id=module_id, session_id=result["session_id"])
 
 # JSON route to start session and return QR for floating modal
-@app.route("/api/session/qr/start/<int:module_id>", methods=["POST"])
+@route("/api/session/qr/start/<int:module_id>", methods=["POST"])
 @lecturer_required
 @csrf.exempt
 def api_start_session_qr(module_id: int):
@@ -356,21 +560,22 @@ def api_start_session_qr(module_id: int):
         "qr": result["qr"]
     })
 
-@app.route("/session/qr/close/<int:session_id>")
+@route("/session/qr/close/<int:session_id>")
 def close_session_qr(session_id):
-    SessionController.close_session(session_id)
+    SessionController.close_session(session_id, actor_user_id=(session.get("user") or {}).get("user_id"))
     return redirect(url_for("lecturer_dashboard"))
  
 
  
 
-@app.route("/lecturer/sessions/<int:session_id>/attendance", methods=["GET"])
+@route("/lecturer/sessions/<int:session_id>/attendance", methods=["GET"])
 @lecturer_required
+@conditional(lambda session_id: [data_versions.session(session_id)])
 def lecturer_view_attendance(session_id: int):
     """Render attendance list for a given session (open or closed)."""
     try:
         # Fetch basic session + module info
-        conn = sqlite3.connect(DB_PATH)
+        conn = read_connection()
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -403,12 +608,13 @@ def lecturer_view_attendance(session_id: int):
     records = AttendanceService.list_attendance_for_session(session_id)
     return render_template("attendance_session.html", session_info=session_info, records=records)
 
-@app.route("/lecturer/modules/<int:module_id>/weeks", methods=["GET"])
+@route("/lecturer/modules/<int:module_id>/weeks", methods=["GET"])
 @lecturer_required
+@conditional(lambda module_id: [data_versions.module(module_id)])
 def lecturer_module_weeks(module_id: int):
     """Show Weeks 1–14 for a module with any sessions per week and links to attendance."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = read_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT module_code, module_name, planned_weeks FROM modules WHERE module_id = ?", (module_id,))
         mod = cursor.fetchone()
@@ -449,8 +655,9 @@ def lecturer_module_weeks(module_id: int):
 
     return render_template("module_weeks.html", module_info=module_info, weeks=weeks)
 
-@app.route("/module/summary", methods=["GET"])
+@route("/module/summary", methods=["GET"])
 @lecturer_required
+@conditional(lambda: [data_versions.module(request.args["module_id"])] if request.args.get("module_id", "").isdigit() else None)
 def module_summary():
     """Render per-student totals for a module with optional filters.
 
@@ -483,10 +690,11 @@ def module_summary():
 
         return render_template("summary.html", report=report)
     except Exception as e:
+        logger.exception("module summary failed")
         flash(f"Error generating summary: {str(e)}")
         return redirect(url_for("lecturer_dashboard"))
 
-@app.route("/module/summary/export/csv", methods=["GET"])
+@route("/module/summary/export/csv", methods=["GET"])
 @lecturer_required
 def module_summary_export_csv():
     try:
@@ -509,12 +717,13 @@ def module_summary_export_csv():
         resp.headers["Content-Disposition"] = f"attachment; filename={filename}"
         return resp
     except Exception as e:
+        logger.exception("CSV export failed")
         flash(f"CSV export failed: {str(e)}")
         if request.args.get("module_id"):
             return redirect(url_for("module_summary", **request.args))
         return redirect(url_for("lecturer_dashboard"))
 
-@app.route("/module/summary/export/pdf", methods=["GET"])
+@route("/module/summary/export/pdf", methods=["GET"])
 @lecturer_required
 def module_summary_export_pdf():
     try:
@@ -540,21 +749,36 @@ def module_summary_export_pdf():
         flash(str(e))
         return redirect(url_for("module_summary", **request.args))
     except Exception as e:
+        logger.exception("PDF export failed")
         flash(f"PDF export failed: {str(e)}")
         if request.args.get("module_id"):
             return redirect(url_for("module_summary", **request.args))
         return redirect(url_for("lecturer_dashboard"))
 
-@app.route("/api/attendance/session/<int:session_id>", methods=["GET"])
+@route("/api/attendance/session/<int:session_id>", methods=["GET"])
+@admission_limit("api")
 @lecturer_required
 def api_list_attendance_for_session(session_id: int):
     try:
         records = AttendanceService.list_attendance_for_session(session_id)
         return jsonify({"ok": True, "records": records})
     except Exception as e:
+        logger.exception("listing attendance for session %s failed", session_id)
         return jsonify({"ok": False, "error": str(e)}), 500
 
-@app.route("/api/attendance/submit", methods=["POST"])
+@route("/api/attendance/session/<int:session_id>/absent", methods=["GET"])
+@admission_limit("api")
+@lecturer_required
+def api_list_absentees_for_session(session_id: int):
+    try:
+        records = EnrollmentService.list_absentees(session_id)
+        return jsonify({"ok": True, "records": records})
+    except Exception as e:
+        logger.exception("listing absentees for session %s failed", session_id)
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+@route("/api/attendance/submit", methods=["POST"])
+@admission_limit("checkin")
 @csrf.exempt
 def api_submit_attendance():
     """API endpoint for submitting attendance records"""
@@ -603,6 +827,7 @@ def api_submit_attendance():
             }), 400
             
     except Exception as e:
+        logger.exception("attendance submit failed")
         return jsonify({
             "success": False,
             "error": f"Internal server error: {str(e)}"
@@ -622,7 +847,6 @@ def _rate_limit(window_seconds: int, max_requests: int) -> None:
     dq.append(now)
 
 # Error handler for CSRF failures (HTML forms)
-@app.errorhandler(CSRFError)
 def handle_csrf_error(e):
 	if request.path.startswith("/api/"):
 		return jsonify({"ok": False, "error": "CSRF token missing or invalid"}), 400
@@ -631,7 +855,8 @@ def handle_csrf_error(e):
 
 
 # Day 11: Attendance calculation APIs
-@app.route("/api/attendance/student/<int:student_id>/module/<int:module_id>", methods=["GET"])
+@route("/api/attendance/student/<int:student_id>/module/<int:module_id>", methods=["GET"])
+@admission_limit("api")
 @lecturer_required
 def api_student_attendance_percentage(student_id: int, module_id: int):
     try:
@@ -640,10 +865,12 @@ def api_student_attendance_percentage(student_id: int, module_id: int):
             return jsonify({"ok": False, "error": result["error"]}), 404
         return jsonify({"ok": True, "data": result})
     except Exception as e:
+        logger.exception("student attendance percentage failed")
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
-@app.route("/api/attendance/module/<int:module_id>/summary", methods=["GET"])
+@route("/api/attendance/module/<int:module_id>/summary", methods=["GET"])
+@admission_limit("api")
 @lecturer_required
 def api_module_attendance_summary(module_id: int):
     try:
@@ -652,47 +879,51 @@ def api_module_attendance_summary(module_id: int):
             return jsonify({"ok": False, "error": summary["error"]}), 404
         return jsonify({"ok": True, "data": summary})
     except Exception as e:
+        logger.exception("module attendance summary failed")
         return jsonify({"ok": False, "error": str(e)}), 500
 
-@app.route("/checkin", methods=["GET", "POST"])
+@route("/api/events", methods=["GET"])
+@admission_limit("api")
+def api_attendance_events():
+    """Check-in change feed: ?after=<cursor>&limit=N, as JSON pages or NDJSON (?format=ndjson)."""
+    auth = request.headers.get("Authorization", "")
+    token_ok = bool(EVENTS_TOKEN) and hmac.compare_digest(auth, f"Bearer {EVENTS_TOKEN}")
+    if not token_ok and not ('user' in session and AuthService.is_admin(session['user'])):
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    try:
+        after = events.parse_cursor(request.args.get("after"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    ndjson = request.args.get("format") == "ndjson" or request.accept_mimetypes.best == "application/x-ndjson"
+    try:
+        if ndjson:
+            lines = events.stream(after, request.args.get("limit", events.MAX_STREAM_SIZE, type=int))
+            return Response(lines, mimetype="application/x-ndjson")
+        page = events.page(after, request.args.get("limit", events.PAGE_SIZE, type=int))
+    except events.CursorExpired as e:
+        return jsonify({"ok": False, "error": str(e), "horizon": e.horizon}), 410
+    return jsonify({"ok": True, **page})
+
+@route("/checkin", methods=["GET", "POST"])
+@admission_limit("checkin")
 def checkin():
     token = request.args.get("tk")
     if not token:
-        return render_template("checkin.html", error="Missing token"), 400
+        return templating.render_block("checkin.html", error="Missing token"), 400
 
     data = QRService.verify_token(token)
     if not data:
-        return render_template("checkin.html", error="Invalid or expired token"), 400
+        return templating.render_block("checkin.html", error="Invalid or expired token"), 400
 
     # Optional: validate core fields are present
     required_fields = ["module_id", "run_id", "session_id", "date"]
     if not all(k in data for k in required_fields):
-        return render_template("checkin.html", error="Malformed token"), 400
+        return templating.render_block("checkin.html", error="Malformed token"), 400
 
-    # Enrich with module_name and week_number for display
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT m.module_name, s.week_number, u.full_name AS lecturer_name
-            FROM sessions s
-            JOIN modules m ON s.module_id = m.module_id
-            JOIN users u ON m.lecturer_id = u.user_id
-            WHERE s.session_id = ?
-            """,
-            (int(data["session_id"]),),
-        )
-        row = cursor.fetchone()
-        if row:
-            data["module_name"] = row[0]
-            data["week_number"] = row[1]
-            data["lecturer_name"] = row[2]
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+    # Enrich with module_name, week_number and lecturer_name for display
+    info = SessionController.checkin_info(int(data["session_id"]))
+    if info:
+        data.update(info)
 
     if request.method == "POST":
         # Normalize and validate inputs
@@ -701,21 +932,78 @@ def checkin():
 
         # Basic normalization
         if not (full_student_id.isdigit() and len(full_student_id) == 9 and full_student_id.startswith("90500")):
-            return render_template("checkin.html", data=data, form_error="Student ID must start with 90500 and have 4 more digits.", form_values={"student_id": full_student_id, "student_name": student_name}), 400
+            return templating.render_block("checkin.html", data=data, form_error="Student ID must start with 90500 and have 4 more digits.", form_values={"student_id": full_student_id, "student_name": student_name}), 400
 
         student_id = int(full_student_id)
         if len(student_name) < 2:
-            return render_template("checkin.html", data=data, form_error="Name is too short.", form_values={"student_id": full_student_id, "student_name": student_name}), 400
+            return templating.render_block("checkin.html", data=data, form_error="Name is too short.", form_values={"student_id": full_student_id, "student_name": student_name}), 400
 
         ok, err = AttendanceService.submit_attendance(session_id=int(data["session_id"]), student_id=student_id, student_name=student_name)
         if not ok:
-            return render_template("checkin.html", data=data, form_error=err, form_values={"student_id": full_student_id, "student_name": student_name}), 400
+            return templating.render_block("checkin.html", data=data, form_error=err, form_values={"student_id": full_student_id, "student_name": student_name}), 400
 
         # Success
-        return render_template("checkin.html", data=data, success=True, form_values={"student_id": student_id, "student_name": student_name})
+        return templating.render_block("checkin.html", data=data, success=True, form_values={"student_id": student_id, "student_name": student_name})
 
     # GET
-    return render_template("checkin.html", data=data)
+    return templating.render_block("checkin.html", data=data)
+
+def _teardown_db(exception):
+    close_db(exception)
+
+def create_app(test_config=None, ensure_schema=False):
+    """Build and configure the Flask app.
+
+    Nothing touches the database unless ensure_schema is set (serve.py migrates
+    once before starting workers; `flask --app app init-db` does it by hand).
+    """
+    flask_app = Flask(__name__)
+    flask_app.secret_key = SECRET_KEY   # Needed for session
+    if test_config:
+        flask_app.config.update(test_config)
+    csrf.init_app(flask_app)
+    # Ensure DB connection closes after each request
+    flask_app.teardown_appcontext(_teardown_db)
+    flask_app.register_error_handler(CSRFError, handle_csrf_error)
+    # Registered first so it runs after every other after_request hook
+    compression.init_app(flask_app, COMPRESS_MIN_SIZE, COMPRESS_LEVEL)
+    if not flask_app.testing:
+        app_logging.setup_logging(LOG_PATH, LOG_LEVEL, LOG_LEVELS, LOG_MAX_BYTES, LOG_BACKUPS)
+    app_logging.init_app(flask_app)
+    assets.init_app(flask_app)
+    templating.init_app(flask_app, TEMPLATE_CACHE_DIR)
+    metrics.init_app(flask_app)
+    query_log.install(SLOW_QUERY_MS, log_path=SLOW_QUERY_LOG)
+    tracing.init_app(flask_app, TRACE_SAMPLE_RATE, TRACE_SLOW_MS, log_path=TRACE_LOG)
+    for rule, view, options in _ROUTES:
+        flask_app.add_url_rule(rule, view_func=view, **options)
+
+    @flask_app.cli.command("init-db")
+    def init_db_command():
+        """Create or migrate the database schema."""
+        if init_db.ensure_schema():
+            print(f"Schema migrated to version {init_db.SCHEMA_VERSION}")
+        else:
+            print("Schema already up to date")
+
+    if ensure_schema:
+        init_db.ensure_schema()
+    return flask_app
+
+# `from app import app` (tests, flask CLI) gets a shared default app built on first use
+_default_app = None
+_default_app_lock = threading.Lock()
+
+def __getattr__(name):
+    global _default_app
+    if name == "app":
+        with _default_app_lock:
+            if _default_app is None:
+                _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=PORT, debug=True)
+    # Production server; for the Werkzeug debugger use `flask --app app run --debug`
+    from serve import main
+    main()
@@ -1,5 +1,5 @@
+import json
 import os
-import socket
 
 # Base project directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -7,17 +7,155 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Database path
 DB_PATH = os.path.join(BASE_DIR, "db", "oqas.db")
 
+# Connection pools (writer + read-only reporting): idle handles kept for reuse,
+# SQLite busy timeout (seconds), how long a request waits while the pools are
+# paused (restore), and how long a restore waits for in-flight work to drain.
+DB_POOL_MAX_IDLE = int(os.environ.get("DB_POOL_MAX_IDLE", "8"))
+DB_READ_POOL_MAX_IDLE = int(os.environ.get("DB_READ_POOL_MAX_IDLE", "8"))
+DB_BUSY_TIMEOUT = float(os.environ.get("DB_BUSY_TIMEOUT", "5"))
+DB_ACQUIRE_TIMEOUT = float(os.environ.get("DB_ACQUIRE_TIMEOUT", "30"))
+DB_DRAIN_TIMEOUT = float(os.environ.get("DB_DRAIN_TIMEOUT", "15"))
+
+# Argon2 work runs on its own small pool: worker threads, how many more requests
+# may queue for a worker, and how long (seconds) one waits before "busy".
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+HASH_MAX_QUEUE = int(os.environ.get("HASH_MAX_QUEUE", "16"))
+HASH_QUEUE_TIMEOUT = float(os.environ.get("HASH_QUEUE_TIMEOUT", "3"))
+
+# Roster import: rows per write transaction and processes hashing initial passwords
+ROSTER_CHUNK_SIZE = int(os.environ.get("ROSTER_CHUNK_SIZE", "1000"))
+ROSTER_HASH_PROCESSES = int(os.environ.get("ROSTER_HASH_PROCESSES", str(os.cpu_count() or 1)))
+# Import job status is kept this many hours after its last progress, then pruned
+ROSTER_JOB_TTL_HOURS = float(os.environ.get("ROSTER_JOB_TTL_HOURS", "24"))
+
+# Argon2 cost parameters. scripts/calibrate_argon2.py benchmarks this host and
+# writes them to ARGON2_PARAMS_FILE; env vars override. Defaults match argon2-cffi.
+ARGON2_PARAMS_FILE = os.environ.get("ARGON2_PARAMS_FILE", os.path.join(BASE_DIR, "argon2_params.json"))
+
+def _load_argon2_params() -> dict:
+    try:
+        with open(ARGON2_PARAMS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+_argon2_params = _load_argon2_params()
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", _argon2_params.get("time_cost", 3)))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", _argon2_params.get("memory_cost", 65536)))
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", _argon2_params.get("parallelism", 4)))
+
+# Admission limits: max concurrent requests per route class inside their handlers,
+# so a login storm cannot take every server thread away from check-ins.
+ADMISSION_LIMITS = {
+    "login": int(os.environ.get("ADMISSION_LOGIN_LIMIT", "2")),
+    "checkin": int(os.environ.get("ADMISSION_CHECKIN_LIMIT", "16")),
+    "api": int(os.environ.get("ADMISSION_API_LIMIT", "8")),
+}
+ADMISSION_WAIT_SECONDS = float(os.environ.get("ADMISSION_WAIT_SECONDS", "0.5"))
+
+# Slow-query log: statements slower than SLOW_QUERY_MS (negative disables the log;
+# per-statement totals are still kept) are written as JSON lines with their plan.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG", os.path.join(BASE_DIR, "logs", "slow_queries.jsonl"))
+
+# Request tracing: a TRACE_SAMPLE_RATE fraction of requests (0..1) is written as a
+# span tree to TRACE_LOG; TRACE_SLOW_MS > 0 also keeps every request slower than that.
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", "0"))
+TRACE_LOG = os.environ.get("TRACE_LOG", os.path.join(BASE_DIR, "logs", "traces.jsonl"))
+
+# Application log (JSON lines, written off the request threads). LOG_LEVELS sets
+# per-logger levels, e.g. "oqas.access=WARNING,oqas.roster=DEBUG".
+LOG_PATH = os.environ.get("LOG_PATH", os.path.join(BASE_DIR, "logs", "app.log"))
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", "5"))
+
+# gzip/deflate for dynamic responses (services/compression.py). Bodies smaller than
+# COMPRESS_MIN_SIZE bytes are sent as-is; COMPRESS_LEVEL=0 turns compression off.
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", "6"))
+
+# Compiled Jinja templates are cached here (scripts/build_templates.py fills it at
+# deploy time); empty disables the cache and every process compiles on first render.
+TEMPLATE_CACHE_DIR = os.environ.get("TEMPLATE_CACHE_DIR", os.path.join(BASE_DIR, "cache", "templates"))
+
+# Background jobs (services/scheduler.py): one process per deployment runs them.
+# Intervals are seconds between runs (each gets +/-SCHEDULER_JITTER of itself so
+# workers restarted together drift apart); an interval of 0 disables that job.
+# Sessions still active SESSION_MAX_AGE_HOURS after they started are ended.
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1").lower() in ("1", "true", "yes", "on")
+SCHEDULER_JITTER = float(os.environ.get("SCHEDULER_JITTER", "0.1"))
+SESSION_MAX_AGE_HOURS = float(os.environ.get("SESSION_MAX_AGE_HOURS", "3"))
+SESSION_EXPIRY_INTERVAL = float(os.environ.get("SESSION_EXPIRY_INTERVAL", "60"))
+WAL_CHECKPOINT_INTERVAL = float(os.environ.get("WAL_CHECKPOINT_INTERVAL", "300"))
+PREWARM_INTERVAL = float(os.environ.get("PREWARM_INTERVAL", "600"))
+BACKUP_DIR = os.environ.get("BACKUP_DIR", os.path.join(BASE_DIR, "db", "backups"))
+BACKUP_INTERVAL = float(os.environ.get("BACKUP_INTERVAL", str(24 * 3600)))
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", "7"))
+
+# Audit trail (services/audit.py): entries are queued and written by a background
+# thread in batches of up to AUDIT_BATCH_SIZE, or whatever arrived within
+# AUDIT_FLUSH_SECONDS; at most AUDIT_MAX_PENDING wait (beyond that they are only logged).
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_SECONDS = float(os.environ.get("AUDIT_FLUSH_SECONDS", "0.5"))
+AUDIT_MAX_PENDING = int(os.environ.get("AUDIT_MAX_PENDING", "10000"))
+
+# Service result caches (services/cache.py): each namespace keeps its most recently
+# used results for a limited time. CACHE_LIMITS overrides namespaces as
+# "name=maxsize:ttl_seconds", e.g. "report=64:120,qr=0:0" (a size of 0 disables one).
+CACHE_LIMITS = os.environ.get("CACHE_LIMITS", "")
+
+# Attendance change feed (/api/events, services/events.py). Events recorded more than
+# EVENTS_RETENTION_DAYS ago are compacted away every EVENTS_COMPACT_INTERVAL seconds
+# (0 disables). Like /metrics it is admin-only unless a consumer sends
+# "Authorization: Bearer <EVENTS_TOKEN>".
+EVENTS_RETENTION_DAYS = float(os.environ.get("EVENTS_RETENTION_DAYS", "180"))
+EVENTS_COMPACT_INTERVAL = float(os.environ.get("EVENTS_COMPACT_INTERVAL", str(24 * 3600)))
+EVENTS_TOKEN = os.environ.get("EVENTS_TOKEN") or None
+
 # Secret key for Flask (sessions/CSRF). In production, set SECRET_KEY env var.
 # Falling back to a fixed dev key avoids logging out all users on every restart.
 SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-me")
 
+# /metrics is admin-only; a scraper without a session may instead send
+# "Authorization: Bearer <METRICS_TOKEN>" when this is set.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+
 # Default app port
-PORT = 8000
+PORT = int(os.environ.get("PORT", "8000"))
+
+# Production server (serve.py, waitress). Threads handle requests; the connection
+# limit caps open sockets; idle keep-alive channels are closed after the channel
+# timeout; backlog is the listen() queue. SERVE_WORKERS > 1 runs that many
+# processes sharing the port via SO_REUSEPORT. On SIGTERM each process stops
+# accepting and waits up to SERVE_DRAIN_TIMEOUT seconds for in-flight requests.
+SERVE_HOST = os.environ.get("SERVE_HOST", "0.0.0.0")
+SERVE_THREADS = int(os.environ.get("SERVE_THREADS", "16"))
+SERVE_CONNECTION_LIMIT = int(os.environ.get("SERVE_CONNECTION_LIMIT", "500"))
+SERVE_CHANNEL_TIMEOUT = int(os.environ.get("SERVE_CHANNEL_TIMEOUT", "30"))
+SERVE_BACKLOG = int(os.environ.get("SERVE_BACKLOG", "1024"))
+SERVE_CLEANUP_INTERVAL = int(os.environ.get("SERVE_CLEANUP_INTERVAL", "30"))
+SERVE_ASYNCORE_USE_POLL = os.environ.get("SERVE_ASYNCORE_USE_POLL", "1").lower() in ("1", "true", "yes", "on")
+SERVE_ASYNCORE_LOOP_TIMEOUT = int(os.environ.get("SERVE_ASYNCORE_LOOP_TIMEOUT", "1"))
+SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", "1"))
+SERVE_DRAIN_TIMEOUT = float(os.environ.get("SERVE_DRAIN_TIMEOUT", "20"))
+
+# Optional LAN host/IP for building external URLs (e.g., QR scan from phone).
+# The LAN_HOST env var (or set_lan_host()) wins; otherwise the outbound interface
+# is detected on first use and cached, so importing config never touches the network.
+LAN_HOST = os.environ.get("LAN_HOST") or None
+
+_detected_lan_host = None
 
 def _detect_lan_ip() -> str:
+    import socket
     try:
-        # This opens a dummy UDP socket to a public IP to discover the outbound interface IP
+        # A UDP "connect" sends nothing; it only asks the kernel which interface routes out
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.settimeout(0.5)
         s.connect(("8.8.8.8", 80))
         ip = s.getsockname()[0]
         s.close()
@@ -25,6 +163,16 @@ def _detect_lan_ip() -> str:
     except Exception:
         return "localhost"
 
-# Optional LAN host/IP for building external URLs (e.g., QR scan from phone)
-# Can be overridden by environment variable LAN_HOST; otherwise auto-detects.
-LAN_HOST = os.environ.get("LAN_HOST", _detect_lan_ip())
\ No newline at end of file
+def get_lan_host() -> str:
+    global _detected_lan_host
+    if LAN_HOST:
+        return LAN_HOST
+    if _detected_lan_host is None:
+        _detected_lan_host = _detect_lan_ip()
+    return _detected_lan_host
+
+def set_lan_host(host: "str | None") -> None:
+    """Override the host used in check-in URLs; None re-enables auto-detection."""
+    global LAN_HOST, _detected_lan_host
+    LAN_HOST = host or None
+    _detected_lan_host = None
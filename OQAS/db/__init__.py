@@ -1,13 +1,87 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 from flask import g
-from typing import Optional
-from config import DB_PATH
+from typing import Dict, Iterator, Optional
+from config import DB_PATH, DB_POOL_MAX_IDLE, DB_READ_POOL_MAX_IDLE, DB_BUSY_TIMEOUT, DB_ACQUIRE_TIMEOUT
+from db.pool import ConnectionPool, PoolPausedError
+
+# Writers (check-ins, session start/close, admin edits) and readers (reports,
+# summaries, listings) get separate pools so long reads never queue writes.
+_pool: Optional[ConnectionPool] = None
+_read_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def _make_pools(path: str, **kwargs) -> None:
+	global _pool, _read_pool
+	common = {
+		"busy_timeout": kwargs.get("busy_timeout", DB_BUSY_TIMEOUT),
+		"acquire_timeout": kwargs.get("acquire_timeout", DB_ACQUIRE_TIMEOUT),
+	}
+	_pool = ConnectionPool(path, max_idle=kwargs.get("max_idle", DB_POOL_MAX_IDLE), **common)
+	_read_pool = ConnectionPool(path, max_idle=kwargs.get("read_max_idle", DB_READ_POOL_MAX_IDLE), readonly=True, **common)
+
+def get_pool() -> ConnectionPool:
+	"""The writer pool."""
+	if _pool is None:
+		with _pool_lock:
+			if _pool is None:
+				_make_pools(DB_PATH)
+	return _pool  # type: ignore[return-value]
+
+def get_read_pool() -> ConnectionPool:
+	if _read_pool is None:
+		get_pool()
+	return _read_pool  # type: ignore[return-value]
+
+def configure_pool(path: str, **kwargs) -> ConnectionPool:
+	"""Point the process-wide pools at another database file (tests, tooling)."""
+	with _pool_lock:
+		for pool in (_pool, _read_pool):
+			if pool is not None:
+				pool.close()
+		_make_pools(path, **kwargs)
+	return _pool  # type: ignore[return-value]
+
+def connect() -> sqlite3.Connection:
+	"""Borrow a writer connection; call close() on it to hand it back."""
+	return get_pool().acquire()
+
+def read_connection() -> sqlite3.Connection:
+	"""Borrow a query_only connection reading one consistent snapshot until close()."""
+	return get_read_pool().acquire()
+
+@contextmanager
+def paused(drain_timeout: float = 30.0) -> Iterator[None]:
+	"""Pause both pools (readers first) for maintenance such as swapping the DB file."""
+	readers, writers = get_read_pool(), get_pool()
+	with readers.paused(drain_timeout):
+		with writers.paused(drain_timeout):
+			yield
+
+def pool_stats() -> Dict[str, Dict[str, float]]:
+	return {"writer": get_pool().stats(), "reader": get_read_pool().stats()}
+
+def checkpoint(mode: str = "PASSIVE") -> Dict[str, int]:
+	"""Copy committed WAL frames into the database file (PRAGMA wal_checkpoint).
+
+	PASSIVE never waits on readers or writers; TRUNCATE also resets the WAL to
+	zero bytes once every reader has moved past it.
+	"""
+	if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+		raise ValueError(f"unknown checkpoint mode {mode!r}")
+	conn = connect()
+	try:
+		busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+	finally:
+		conn.close()
+	return {"busy": busy, "wal_frames": log_frames, "checkpointed": checkpointed}
 
 # Request-scoped SQLite connection with foreign keys enabled
 def get_db() -> sqlite3.Connection:
 	conn: Optional[sqlite3.Connection] = getattr(g, "_db_conn", None)
 	if conn is None:
-		conn = sqlite3.connect(DB_PATH)
+		conn = connect()
 		conn.execute("PRAGMA foreign_keys = ON;")
 		setattr(g, "_db_conn", conn)
 	return conn
@@ -15,6 +89,9 @@ def get_db() -> sqlite3.Connection:
 def close_db(_: Optional[BaseException] = None) -> None:
 	conn: Optional[sqlite3.Connection] = getattr(g, "_db_conn", None)
 	if conn is not None:
-		conn.close()
+		try:
+			conn.rollback()
+			conn.execute("PRAGMA foreign_keys = OFF;")
+		finally:
+			conn.close()
 		setattr(g, "_db_conn", None)
-
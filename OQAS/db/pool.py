@@ -0,0 +1,375 @@
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+StatementListener = Callable[[str, Any, float], None]
+
+# Called as listener(sql, parameters, seconds) after each statement run on a pooled
+# connection (metrics, slow-query log). Replaced wholesale on change so the hot
+# path reads it without a lock; listeners must be cheap and must not raise.
+_statement_listeners: Tuple[StatementListener, ...] = ()
+# Called with the SQL text of every statement SQLite starts on a pooled connection,
+# including ones the cursor wrappers never see (implicit BEGIN, executescript parts).
+# Installed with set_trace_callback on connections opened after registration.
+_trace_listeners: Tuple[Callable[[str], None], ...] = ()
+_listeners_lock = threading.Lock()
+
+
+def add_statement_listener(listener: StatementListener) -> None:
+	global _statement_listeners
+	with _listeners_lock:
+		if listener not in _statement_listeners:
+			_statement_listeners = _statement_listeners + (listener,)
+
+
+def remove_statement_listener(listener: StatementListener) -> None:
+	global _statement_listeners
+	with _listeners_lock:
+		_statement_listeners = tuple(l for l in _statement_listeners if l is not listener)
+
+
+def add_trace_listener(listener: Callable[[str], None]) -> None:
+	global _trace_listeners
+	with _listeners_lock:
+		if listener not in _trace_listeners:
+			_trace_listeners = _trace_listeners + (listener,)
+
+
+def remove_trace_listener(listener: Callable[[str], None]) -> None:
+	global _trace_listeners
+	with _listeners_lock:
+		_trace_listeners = tuple(l for l in _trace_listeners if l is not listener)
+
+
+def _trace(sql: str) -> None:
+	for listener in _trace_listeners:
+		try:
+			listener(sql)
+		except Exception:
+			pass
+
+
+def _notify(sql: str, parameters: Any, seconds: float) -> None:
+	for listener in _statement_listeners:
+		try:
+			listener(sql, parameters, seconds)
+		except Exception:
+			pass
+
+
+class PoolPausedError(sqlite3.OperationalError):
+	"""Raised when the pool stays paused (e.g. during a restore) longer than the caller waits."""
+
+
+class _Lease:
+	__slots__ = ("leased", "generation")
+
+	def __init__(self) -> None:
+		self.leased = False
+		self.generation = 0
+
+
+class TimedCursor(sqlite3.Cursor):
+	"""Cursor that reports each statement's execution time to the statement listeners.
+
+	The time covers preparing the statement and stepping to the first row;
+	rows fetched later are not included.
+	"""
+
+	def execute(self, sql: str, parameters: Any = ()) -> "TimedCursor":
+		if not _statement_listeners:
+			return super().execute(sql, parameters)
+		start = time.perf_counter()
+		try:
+			return super().execute(sql, parameters)
+		finally:
+			_notify(sql, parameters, time.perf_counter() - start)
+
+	def executemany(self, sql: str, seq_of_parameters: Any) -> "TimedCursor":
+		if not _statement_listeners:
+			return super().executemany(sql, seq_of_parameters)
+		start = time.perf_counter()
+		try:
+			return super().executemany(sql, seq_of_parameters)
+		finally:
+			_notify(sql, None, time.perf_counter() - start)
+
+	def executescript(self, sql_script: str) -> "TimedCursor":
+		if not _statement_listeners:
+			return super().executescript(sql_script)
+		start = time.perf_counter()
+		try:
+			return super().executescript(sql_script)
+		finally:
+			_notify(sql_script, None, time.perf_counter() - start)
+
+
+class PooledConnection(sqlite3.Connection):
+	"""sqlite3 connection that goes back to its pool on close() instead of closing.
+
+	Services keep the familiar ``conn = connect() ... conn.close()`` shape; the pool
+	decides whether the underlying handle is reused or really closed.
+	"""
+
+	_pool: Optional["ConnectionPool"] = None
+	_lease: _Lease
+	readonly: bool = False
+
+	def cursor(self, factory: type = TimedCursor) -> sqlite3.Cursor:  # type: ignore[override]
+		return super().cursor(factory)
+
+	# The C implementations of these bypass cursor(), so route them through it
+	def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:  # type: ignore[override]
+		return self.cursor().execute(sql, parameters)
+
+	def executemany(self, sql: str, seq_of_parameters: Any) -> sqlite3.Cursor:  # type: ignore[override]
+		return self.cursor().executemany(sql, seq_of_parameters)
+
+	def executescript(self, sql_script: str) -> sqlite3.Cursor:  # type: ignore[override]
+		return self.cursor().executescript(sql_script)
+
+	# COMMIT is where WAL fsyncs happen, so it is timed like any other statement
+	def commit(self) -> None:
+		if not _statement_listeners or not self.in_transaction:
+			return super().commit()
+		start = time.perf_counter()
+		try:
+			return super().commit()
+		finally:
+			_notify("COMMIT", None, time.perf_counter() - start)
+
+	def rollback(self) -> None:
+		if not _statement_listeners or not self.in_transaction:
+			return super().rollback()
+		start = time.perf_counter()
+		try:
+			return super().rollback()
+		finally:
+			_notify("ROLLBACK", None, time.perf_counter() - start)
+
+	def close(self) -> None:
+		pool = self._pool
+		if pool is None:
+			super().close()
+		elif self._lease.leased:
+			pool.release(self)
+
+	def _close_handle(self) -> None:
+		sqlite3.Connection.close(self)
+
+
+class ConnectionPool:
+	"""Small SQLite connection pool that can be paused and drained.
+
+	Acquiring never blocks on pool size (nested acquires from one thread are common in
+	the services); ``max_idle`` only bounds how many open handles are kept for reuse.
+	``pause()`` blocks new borrowers, waits for in-flight work to hand its connections
+	back and closes idle handles, so the database file can be swapped underneath.
+
+	A ``readonly`` pool hands out ``PRAGMA query_only`` connections with a deferred
+	transaction already open, so every statement in one borrow reads the same
+	snapshot (in WAL mode this never blocks the writer).
+	"""
+
+	def __init__(self, path: str, max_idle: int = 8, busy_timeout: float = 5.0, acquire_timeout: float = 30.0, readonly: bool = False):
+		self.path = path
+		self.max_idle = max_idle
+		self.busy_timeout = busy_timeout
+		self.acquire_timeout = acquire_timeout
+		self.readonly = readonly
+		self._acquired = 0
+		self._reused = 0
+		self._opened = 0
+		self._wait_total = 0.0
+		self._wait_max = 0.0
+		self._idle: List[PooledConnection] = []
+		self._in_use = 0
+		self._paused = False
+		self._generation = 0
+		self._cond = threading.Condition()
+
+	def _open(self) -> PooledConnection:
+		conn = sqlite3.connect(
+			self.path,
+			timeout=self.busy_timeout,
+			check_same_thread=False,
+			factory=PooledConnection,
+			# URI mode lets read-only archives be ATTACHed as file:...?mode=ro
+			uri=True,
+		)
+		conn._pool = self
+		conn.readonly = self.readonly
+		if self.readonly:
+			sqlite3.Connection.execute(conn, "PRAGMA query_only = ON;")
+		if _trace_listeners:
+			conn.set_trace_callback(_trace)
+		conn._lease = _Lease()
+		# A borrower that drops its connection without close() must not wedge pause()
+		weakref.finalize(conn, self._reclaim, conn._lease)
+		return conn  # type: ignore[return-value]
+
+	def _reclaim(self, lease: _Lease) -> None:
+		if lease.leased:
+			lease.leased = False
+			with self._cond:
+				self._in_use -= 1
+				self._cond.notify_all()
+
+	def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+		wait = self.acquire_timeout if timeout is None else timeout
+		started = time.monotonic()
+		deadline = started + wait
+		with self._cond:
+			while self._paused:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					raise PoolPausedError("Database is temporarily unavailable (maintenance in progress)")
+				self._cond.wait(remaining)
+			self._in_use += 1
+			generation = self._generation
+			conn = self._idle.pop() if self._idle else None
+			if conn is None:
+				self._opened += 1
+			else:
+				self._reused += 1
+		if conn is None:
+			try:
+				conn = self._open()
+			except Exception:
+				with self._cond:
+					self._in_use -= 1
+					self._cond.notify_all()
+				raise
+		conn._lease.generation = generation
+		conn._lease.leased = True
+		if self.readonly:
+			try:
+				sqlite3.Connection.execute(conn, "BEGIN")  # snapshot start; not counted as a query
+			except Exception:
+				self.release(conn)
+				raise
+		waited = time.monotonic() - started
+		with self._cond:
+			self._acquired += 1
+			self._wait_total += waited
+			if waited > self._wait_max:
+				self._wait_max = waited
+		return conn
+
+	def release(self, conn: PooledConnection) -> None:
+		conn._lease.leased = False
+		reusable = True
+		try:
+			if conn.in_transaction:
+				# Untimed: ending a read snapshot is pool housekeeping, not a query
+				sqlite3.Connection.rollback(conn)
+		except sqlite3.Error:
+			reusable = False
+		with self._cond:
+			self._in_use -= 1
+			keep = (
+				reusable
+				and not self._paused
+				and conn._lease.generation == self._generation
+				and len(self._idle) < self.max_idle
+			)
+			if keep:
+				self._idle.append(conn)
+			self._cond.notify_all()
+		if not keep:
+			conn._close_handle()
+
+	def prewarm(self, count: Optional[int] = None, warm_sql: Optional[str] = None) -> int:
+		"""Open idle handles up to ``count`` (default max_idle) ahead of demand; returns how many.
+
+		``warm_sql`` runs once on each new handle so it has parsed the schema and pulled
+		the pages that query reads into cache before a request borrows it.
+		"""
+		target = self.max_idle if count is None else min(count, self.max_idle)
+		opened: List[PooledConnection] = []
+		with self._cond:
+			if self._paused:
+				return 0
+			missing = target - len(self._idle)
+			generation = self._generation
+		for _ in range(max(0, missing)):
+			conn = self._open()
+			if warm_sql:
+				sqlite3.Connection.execute(conn, warm_sql).fetchall()
+			conn._lease.generation = generation
+			opened.append(conn)
+		with self._cond:
+			keep = [] if self._paused or generation != self._generation else opened[: max(0, self.max_idle - len(self._idle))]
+			self._idle.extend(keep)
+			self._opened += len(keep)
+		for conn in opened[len(keep):]:
+			conn._close_handle()
+		return len(keep)
+
+	@property
+	def in_use(self) -> int:
+		with self._cond:
+			return self._in_use
+
+	def stats(self) -> Dict[str, float]:
+		"""Counters for monitoring: acquisitions, time spent waiting for a connection, occupancy."""
+		with self._cond:
+			return {
+				"acquired": self._acquired,
+				"reused": self._reused,
+				"opened": self._opened,
+				"wait_seconds_total": self._wait_total,
+				"wait_seconds_max": self._wait_max,
+				"wait_seconds_avg": (self._wait_total / self._acquired) if self._acquired else 0.0,
+				"in_use": self._in_use,
+				"idle": len(self._idle),
+				"paused": self._paused,
+			}
+
+	def pause(self, drain_timeout: float = 30.0) -> bool:
+		"""Stop handing out connections and wait for borrowed ones to come back.
+
+		Returns False (and leaves the pool running) if in-flight work did not finish
+		within ``drain_timeout`` seconds.
+		"""
+		deadline = time.monotonic() + drain_timeout
+		with self._cond:
+			if self._paused:
+				return False
+			self._paused = True
+			while self._in_use > 0:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					self._paused = False
+					self._cond.notify_all()
+					return False
+				self._cond.wait(remaining)
+			idle, self._idle = self._idle, []
+			self._generation += 1
+		for conn in idle:
+			conn._close_handle()
+		return True
+
+	def resume(self) -> None:
+		with self._cond:
+			self._paused = False
+			self._cond.notify_all()
+
+	@contextmanager
+	def paused(self, drain_timeout: float = 30.0) -> Iterator[None]:
+		if not self.pause(drain_timeout):
+			raise PoolPausedError("Timed out waiting for in-flight database work to finish")
+		try:
+			yield
+		finally:
+			self.resume()
+
+	def close(self) -> None:
+		with self._cond:
+			idle, self._idle = self._idle, []
+			self._generation += 1
+		for conn in idle:
+			conn._close_handle()
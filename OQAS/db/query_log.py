@@ -0,0 +1,283 @@
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional, Tuple
+
+from db.pool import add_statement_listener, add_trace_listener, remove_statement_listener, remove_trace_listener
+
+logger = logging.getLogger("oqas.sql.slow")
+# Problems writing the slow-query log go to the application log, not to the file itself
+errors = logging.getLogger("oqas.sql.query_log")
+# At most one traceback per this many seconds while writes keep failing
+ERROR_LOG_INTERVAL = 60.0
+
+_DB_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJECT_ROOT = os.path.dirname(_DB_DIR)
+_BINDINGS_RE = re.compile(r"uses (\d+), and there are")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+def _shape(value: Any) -> str:
+	if isinstance(value, (str, bytes)):
+		return f"{type(value).__name__}[{len(value)}]"
+	return type(value).__name__
+
+
+def param_shapes(parameters: Any) -> Any:
+	"""Types (and lengths) of bind parameters; the values themselves are never logged."""
+	if parameters is None:
+		return None
+	if isinstance(parameters, dict):
+		return {k: _shape(v) for k, v in parameters.items()}
+	if isinstance(parameters, (list, tuple)):
+		return [_shape(v) for v in parameters]
+	return _shape(parameters)
+
+
+def calling_method() -> str:
+	"""First frame outside db/ that belongs to the project: path:Class.method:line."""
+	frame = sys._getframe(2)
+	while frame is not None:
+		filename = frame.f_code.co_filename
+		if filename.startswith(_PROJECT_ROOT) and not filename.startswith(_DB_DIR) and "site-packages" not in filename:
+			rel = os.path.relpath(filename, _PROJECT_ROOT)
+			return f"{rel}:{frame.f_code.co_qualname}:{frame.f_lineno}"
+		frame = frame.f_back
+	return "unknown"
+
+
+class _Stat:
+	__slots__ = ("count", "total", "max", "callers")
+
+	def __init__(self) -> None:
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+		self.callers: Dict[str, int] = {}
+
+
+class _FileHandler(RotatingFileHandler):
+	"""Raises write failures (disk full, unwritable path) to the writer thread instead
+	of printing them to stderr, so they are counted and logged."""
+
+	def handleError(self, record: logging.LogRecord) -> None:
+		raise
+
+
+class QueryLog:
+	"""Per-statement timing totals plus a log of statements slower than a threshold.
+
+	Timings come from the pooled connections' cursor/commit wrappers. SQLite's
+	trace callback adds what those wrappers cannot see: statements the sqlite3
+	module issues implicitly (BEGIN before a write) and the individual statements
+	of an executescript(); their keywords are attached to the next slow entry so a
+	lock wait on BEGIN is not blamed on the INSERT text alone.
+
+	Slow entries carry parameter shapes, the calling service method and EXPLAIN
+	QUERY PLAN. Plans are computed off the request thread on a separate, unpooled
+	read-only connection (so they are not timed themselves) and cached per statement.
+	"""
+
+	def __init__(self) -> None:
+		self.threshold = 0.1
+		self._lock = threading.Lock()
+		self._stats: Dict[str, _Stat] = {}
+		self._normalized: Dict[str, str] = {}
+		self._plans: Dict[str, List[str]] = {}
+		self._local = threading.local()
+		self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=1000)
+		self._worker: Optional[threading.Thread] = None
+		self._db_path: Optional[str] = None
+		self.installed = False
+		self.written = 0
+		self.dropped = 0
+		self.failed = 0
+		self._last_error = float("-inf")
+
+	def install(self, threshold_ms: float, log_path: Optional[str] = None, db_path: Optional[str] = None) -> None:
+		"""Start collecting; a negative threshold keeps the totals but logs nothing."""
+		self.threshold = threshold_ms / 1000.0 if threshold_ms >= 0 else float("inf")
+		self._db_path = db_path
+		if log_path and not logger.handlers:
+			os.makedirs(os.path.dirname(log_path), exist_ok=True)
+			handler = _FileHandler(log_path, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8", delay=True)
+			handler.setFormatter(logging.Formatter("%(message)s"))
+			logger.addHandler(handler)
+			logger.setLevel(logging.INFO)
+			logger.propagate = False
+		if not self.installed:
+			add_statement_listener(self._on_statement)
+			add_trace_listener(self._on_trace)
+			self.installed = True
+
+	def uninstall(self) -> None:
+		remove_statement_listener(self._on_statement)
+		remove_trace_listener(self._on_trace)
+		self.installed = False
+
+	# ---------------------- hot path ----------------------
+	def _normalize(self, sql: str) -> str:
+		norm = self._normalized.get(sql)
+		if norm is None:
+			norm = " ".join(sql.split())
+			if len(self._normalized) < 5000:
+				self._normalized[sql] = norm
+		return norm
+
+	def _on_trace(self, sql: str) -> None:
+		traced = getattr(self._local, "traced", None)
+		if traced is None:
+			traced = self._local.traced = []
+		if len(traced) < 20:
+			# Keyword only: traced SQL has the bound values expanded into it
+			traced.append(sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "")
+
+	def _on_statement(self, sql: str, parameters: Any, seconds: float) -> None:
+		traced = getattr(self._local, "traced", None)
+		self._local.traced = []
+		norm = self._normalize(sql)
+		caller = calling_method()
+		with self._lock:
+			stat = self._stats.get(norm)
+			if stat is None:
+				# Statements built with variable IN (...) lists must not grow this forever
+				key = norm if len(self._stats) < 2000 else "(other statements)"
+				stat = self._stats.get(key)
+				if stat is None:
+					stat = self._stats[key] = _Stat()
+			stat.count += 1
+			stat.total += seconds
+			if seconds > stat.max:
+				stat.max = seconds
+			if caller in stat.callers or len(stat.callers) < 5:
+				stat.callers[caller] = stat.callers.get(caller, 0) + 1
+		if seconds >= self.threshold:
+			verb = norm.split(None, 1)[0].upper() if norm else ""
+			implicit = [t for t in (traced or []) if t and t != verb]
+			entry = {
+				"ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+				"ms": round(seconds * 1000.0, 3),
+				"sql": norm,
+				"params": param_shapes(parameters),
+				"caller": caller,
+				"implicit": implicit,
+				"thread": threading.current_thread().name,
+			}
+			self._enqueue(entry, parameters)
+
+	def _enqueue(self, entry: Dict[str, Any], parameters: Any) -> None:
+		if self._worker is None:
+			with self._lock:
+				if self._worker is None:
+					self._worker = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+					self._worker.start()
+		try:
+			self._queue.put_nowait({"entry": entry, "parameters": parameters})
+		except queue.Full:
+			self.dropped += 1
+
+	# ---------------------- background ----------------------
+	def _run(self) -> None:
+		while True:
+			item = self._queue.get()
+			if item is None:
+				self._queue.task_done()
+				return
+			try:
+				entry = item["entry"]
+				entry["plan"] = self.explain(entry["sql"], item["parameters"])
+				logger.info(json.dumps(entry, default=str))
+				self.written += 1
+			except Exception:
+				self.failed += 1
+				now = time.monotonic()
+				if now - self._last_error >= ERROR_LOG_INTERVAL:
+					self._last_error = now
+					errors.exception("writing a slow-query entry failed (%d lost so far)", self.failed)
+			finally:
+				self._queue.task_done()
+
+	def stats(self) -> Dict[str, int]:
+		"""Slow entries written, dropped because the queue was full, and lost to failed writes."""
+		return {"written": self.written, "dropped": self.dropped, "failed": self.failed}
+
+	def flush(self, timeout: float = 5.0) -> None:
+		"""Wait until queued slow entries are written (tests, shutdown)."""
+		deadline = time.monotonic() + timeout
+		while self._queue.unfinished_tasks and time.monotonic() < deadline:
+			time.sleep(0.01)
+
+	def _database_path(self) -> str:
+		if self._db_path:
+			return self._db_path
+		from db import get_pool
+		return get_pool().path
+
+	def explain(self, sql: str, parameters: Any = None) -> List[str]:
+		"""EXPLAIN QUERY PLAN rows (indented by depth) for one statement, cached by text."""
+		norm = self._normalize(sql)
+		cached = self._plans.get(norm)
+		if cached is not None:
+			return cached
+		if not norm.split(None, 1) or norm.split(None, 1)[0].upper() not in _EXPLAINABLE:
+			return []
+		try:
+			conn = sqlite3.connect(f"file:{self._database_path()}?mode=ro", uri=True, timeout=1.0)
+			try:
+				params = parameters if isinstance(parameters, (tuple, list, dict)) else ()
+				try:
+					rows = conn.execute("EXPLAIN QUERY PLAN " + norm, params).fetchall()
+				except sqlite3.ProgrammingError as e:
+					# executemany (no single parameter set): bind NULLs just to get a plan
+					match = _BINDINGS_RE.search(str(e))
+					if not match:
+						raise
+					rows = conn.execute("EXPLAIN QUERY PLAN " + norm, (None,) * int(match.group(1))).fetchall()
+			finally:
+				conn.close()
+			depth: Dict[int, int] = {0: -1}
+			plan: List[str] = []
+			for node_id, parent, _, detail in rows:
+				depth[node_id] = depth.get(parent, -1) + 1
+				plan.append("  " * depth[node_id] + str(detail))
+		except sqlite3.Error as e:
+			plan = [f"plan unavailable: {e}"]
+		if len(self._plans) < 2000:
+			self._plans[norm] = plan
+		return plan
+
+	# ---------------------- reporting ----------------------
+	def top(self, n: int = 10, by: str = "total") -> List[Dict[str, Any]]:
+		"""The n statements with the highest total (or max/count/avg) time."""
+		with self._lock:
+			rows: List[Tuple[str, _Stat]] = [(sql, s) for sql, s in self._stats.items()]
+			snapshot = [
+				{
+					"sql": sql,
+					"count": s.count,
+					"total_ms": round(s.total * 1000.0, 3),
+					"avg_ms": round(s.total * 1000.0 / s.count, 3) if s.count else 0.0,
+					"max_ms": round(s.max * 1000.0, 3),
+					"callers": sorted(s.callers, key=s.callers.get, reverse=True),
+				}
+				for sql, s in rows
+			]
+		key = {"total": "total_ms", "max": "max_ms", "count": "count", "avg": "avg_ms"}.get(by, "total_ms")
+		snapshot.sort(key=lambda r: r[key], reverse=True)
+		for row in snapshot[:n]:
+			row["plan"] = self._plans.get(row["sql"])
+		return snapshot[:n]
+
+	def reset(self) -> None:
+		with self._lock:
+			self._stats.clear()
+
+
+query_log = QueryLog()
@@ -13,8 +13,160 @@ from config import DB_PATH
 # Ensure the database folder exists
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
+# Bumped whenever create_tables() changes the schema; stored in PRAGMA user_version
+SCHEMA_VERSION = 11
+
+# Tables every OQAS database must have (used to validate restores)
+REQUIRED_TABLES = ("users", "modules", "sessions", "attendance")
+
+
+def ensure_enrollments(cursor: sqlite3.Cursor) -> None:
+    """Create the module enrollments table (the roster summaries/reports are driven from).
+
+    The (module_id, student_id) primary key doubles as the covering roster index.
+    When the table is new, everyone who has already attended a module is enrolled in it.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'enrollments';")
+    had_enrollments = cursor.fetchone() is not None
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS enrollments (
+            module_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            enrolled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (module_id, student_id),
+            FOREIGN KEY (module_id) REFERENCES modules(module_id) ON DELETE CASCADE ON UPDATE CASCADE,
+            FOREIGN KEY (student_id) REFERENCES users(user_id) ON DELETE CASCADE ON UPDATE CASCADE
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_enrollments_student
+        ON enrollments (student_id, module_id);
+    """)
+    if not had_enrollments:
+        cursor.execute("""
+            INSERT OR IGNORE INTO enrollments (module_id, student_id)
+            SELECT DISTINCT s.module_id, a.student_id
+            FROM attendance a
+            JOIN sessions s ON s.session_id = a.session_id;
+        """)
+
+
+def ensure_events(cursor: sqlite3.Cursor) -> None:
+    """Create the attendance change feed (services/events.py).
+
+    Append-only and without foreign keys, like the audit trail: an event stays
+    in the feed after its session is archived or its module deleted. When the
+    table is new, the check-ins already recorded are replayed into it in
+    check-in order, so a consumer's first sync starts from the beginning.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attendance_events';")
+    had_events = cursor.fetchone() is not None
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            attendance_id INTEGER NOT NULL,
+            session_id INTEGER NOT NULL,
+            module_id INTEGER NOT NULL,
+            week_number INTEGER NULL,
+            student_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            occurred_at TIMESTAMP NOT NULL,
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    # Retention compaction finds its cutoff without scanning the whole log
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attendance_events_recorded
+        ON attendance_events (recorded_at);
+    """)
+    if not had_events:
+        cursor.execute("""
+            INSERT INTO attendance_events (kind, attendance_id, session_id, module_id, week_number, student_id, status, occurred_at)
+            SELECT 'checkin', a.attendance_id, a.session_id, s.module_id, s.week_number, a.student_id,
+                   COALESCE(a.status, 'present'), COALESCE(a.checkin_time, CURRENT_TIMESTAMP)
+            FROM attendance a
+            JOIN sessions s ON s.session_id = a.session_id
+            ORDER BY a.checkin_time, a.attendance_id;
+        """)
+
+def ensure_audit(cursor: sqlite3.Cursor) -> None:
+    """Rebuild an older session_audit (session-only, NOT NULL actor, cascading FKs) and index it."""
+    cursor.execute("PRAGMA table_info(session_audit);")
+    if 'target' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("""
+            CREATE TABLE session_audit_new (
+                audit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER NULL,
+                actor_user_id INTEGER NULL,
+                action TEXT NOT NULL,
+                target TEXT NULL,
+                note TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        # Old rows were session actions ("start", "close"); they become "session.start", ...
+        cursor.execute("""
+            INSERT INTO session_audit_new (audit_id, session_id, actor_user_id, action, note, created_at)
+            SELECT audit_id, session_id, actor_user_id,
+                   CASE WHEN instr(action, '.') THEN action ELSE 'session.' || action END,
+                   note, created_at
+            FROM session_audit;
+        """)
+        cursor.execute("DROP TABLE session_audit;")
+        cursor.execute("ALTER TABLE session_audit_new RENAME TO session_audit;")
+    # Keyset pages by session, by actor, or by time alone: (created_at, audit_id) order
+    # comes straight from each index (audit_id is the rowid every index ends with)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_session ON session_audit (session_id, created_at);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_actor ON session_audit (actor_user_id, created_at);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_created ON session_audit (created_at);")
+
+def dedupe_sessions(cursor: sqlite3.Cursor) -> int:
+    """Merge duplicate sessions for the same module and week into the newest one.
+
+    Racing starts could insert such duplicates before idx_sessions_module_week
+    existed. Check-ins and audit rows move to the kept session (a student
+    checked into both keeps one row); the kept session is active if any of
+    the duplicates was. Returns how many sessions were removed.
+    """
+    cursor.execute("DROP TABLE IF EXISTS temp.session_dupes;")
+    cursor.execute("""
+        CREATE TEMP TABLE session_dupes AS
+        SELECT session_id AS dup, keep, status FROM (
+            SELECT session_id, status,
+                   FIRST_VALUE(session_id) OVER (
+                       PARTITION BY module_id, week_number
+                       ORDER BY created_at DESC, session_id DESC
+                   ) AS keep
+            FROM sessions
+        )
+        WHERE session_id <> keep;
+    """)
+    removed = cursor.execute("SELECT COUNT(*) FROM temp.session_dupes;").fetchone()[0]
+    if removed:
+        cursor.execute("""
+            UPDATE OR IGNORE attendance
+            SET session_id = (SELECT keep FROM temp.session_dupes WHERE dup = attendance.session_id)
+            WHERE session_id IN (SELECT dup FROM temp.session_dupes);
+        """)
+        cursor.execute("DELETE FROM attendance WHERE session_id IN (SELECT dup FROM temp.session_dupes);")
+        cursor.execute("""
+            UPDATE session_audit
+            SET session_id = (SELECT keep FROM temp.session_dupes WHERE dup = session_audit.session_id)
+            WHERE session_id IN (SELECT dup FROM temp.session_dupes);
+        """)
+        cursor.execute("""
+            UPDATE sessions SET status = 'active', ended_at = NULL
+            WHERE session_id IN (SELECT keep FROM temp.session_dupes WHERE status = 'active');
+        """)
+        cursor.execute("DELETE FROM sessions WHERE session_id IN (SELECT dup FROM temp.session_dupes);")
+    cursor.execute("DROP TABLE temp.session_dupes;")
+    return removed
+
 def create_tables(cursor: sqlite3.Cursor) -> None:
     cursor.execute("PRAGMA foreign_keys = ON;")
+    # WAL lets read-only report connections keep their snapshot without blocking check-ins
+    cursor.execute("PRAGMA journal_mode = WAL;")
 
     # Users table
     cursor.execute("""
@@ -84,17 +236,48 @@ def create_tables(cursor: sqlite3.Cursor) -> None:
         );
     """)
 
-    # Session audit trail (reopen/close actions, notes)
+    # Audit trail (services/audit.py): session lifecycle, admin edits, backups/restores.
+    # Append-only, so no foreign keys: entries outlive archived sessions and deleted users.
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS session_audit (
             audit_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id INTEGER NOT NULL,
-            actor_user_id INTEGER NOT NULL,
+            session_id INTEGER NULL,
+            actor_user_id INTEGER NULL,
             action TEXT NOT NULL,
+            target TEXT NULL,
             note TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    ensure_audit(cursor)
+
+    # Per-term archive files holding closed sessions/attendance moved out of the live DB
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archives (
+            term TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            session_count INTEGER NOT NULL DEFAULT 0,
+            attendance_count INTEGER NOT NULL DEFAULT 0,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+    ensure_enrollments(cursor)
+
+    # Roster import jobs (RosterService): progress and result, visible to every
+    # worker process that may receive the status poll; pruned after ROSTER_JOB_TTL_HOURS
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS import_jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'running',
+            done INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            result TEXT NULL,
+            error TEXT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE ON UPDATE CASCADE,
-            FOREIGN KEY (actor_user_id) REFERENCES users(user_id) ON DELETE SET NULL ON UPDATE CASCADE
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
     """)
 
@@ -103,10 +286,14 @@ def create_tables(cursor: sqlite3.Cursor) -> None:
     columns = [row[1] for row in cursor.fetchall()]
     if 'run_id' not in columns:
         cursor.execute("ALTER TABLE sessions ADD COLUMN run_id INTEGER NULL;")
+    # When an ended session was last made active again (SessionController.open_week)
+    if 'reopened_at' not in columns:
+        cursor.execute("ALTER TABLE sessions ADD COLUMN reopened_at TIMESTAMP NULL;")
 
-    # If there is a UNIQUE index from an older schema, rebuild table without it
+    # If the table itself declares a UNIQUE constraint (older schemas), rebuild it
+    # without; unique indexes created below (origin 'c') are kept.
     cursor.execute("PRAGMA index_list('sessions');")
-    unique_indexes = [row for row in cursor.fetchall() if row[2] == 1]
+    unique_indexes = [row for row in cursor.fetchall() if row[2] == 1 and row[3] == 'u']
     if unique_indexes:
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS sessions_new (
@@ -118,16 +305,72 @@ def create_tables(cursor: sqlite3.Cursor) -> None:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 ended_at TIMESTAMP NULL,
                 run_id INTEGER NULL,
+                reopened_at TIMESTAMP NULL,
                 FOREIGN KEY (module_id) REFERENCES modules(module_id) ON DELETE CASCADE ON UPDATE CASCADE
             );
         """)
         cursor.execute("""
-            INSERT INTO sessions_new(session_id, module_id, week_number, session_date, status, created_at, ended_at, run_id)
-            SELECT session_id, module_id, week_number, session_date, status, created_at, ended_at, run_id FROM sessions;
+            INSERT INTO sessions_new(session_id, module_id, week_number, session_date, status, created_at, ended_at, run_id, reopened_at)
+            SELECT session_id, module_id, week_number, session_date, status, created_at, ended_at, run_id, reopened_at FROM sessions;
         """)
         cursor.execute("DROP TABLE sessions;")
         cursor.execute("ALTER TABLE sessions_new RENAME TO sessions;")
 
+    dedupe_sessions(cursor)
+    # One session per module and week: SessionController.open_week upserts against this
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_module_week
+        ON sessions (module_id, week_number);
+    """)
+
+    # Module session lookups (counts, date windows) without scanning all sessions
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_module_date
+        ON sessions (module_id, session_date);
+    """)
+
+    # A lecturer's modules (dashboard) in code order without scanning every module
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_modules_lecturer
+        ON modules (lecturer_id, module_code);
+    """)
+
+    # Admin lecturer search: role filter, username prefix and keyset order in one index range.
+    # (Module search by code uses the UNIQUE(module_code) index.)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_role_username
+        ON users (role, username);
+    """)
+
+    # Scheduled expiry of stale sessions: status = 'active' AND (last) start < cutoff,
+    # where a reopened session started again at reopened_at
+    cursor.execute("DROP INDEX IF EXISTS idx_sessions_status_created;")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_status_started
+        ON sessions (status, COALESCE(reopened_at, created_at));
+    """)
+
+    # After dedupe_sessions(), so replayed check-ins point at the surviving sessions
+    ensure_events(cursor)
+
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+def ensure_schema(db_path: str = DB_PATH) -> bool:
+    """Run create_tables() only if the database is older than SCHEMA_VERSION.
+
+    Cheap when up to date (one PRAGMA read). Returns True if a migration ran.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return False
+        create_tables(conn.cursor())
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
 def init_db() -> None:
     conn = sqlite3.connect(DB_PATH)
     try:
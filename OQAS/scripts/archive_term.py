@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+
+# Ensure project root is on sys.path so we can import config/services
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+from services.archive_service import ArchiveService
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Move a closed term's sessions and attendance into an archive DB.")
+	parser.add_argument("--term", help="Term label, e.g. 2025-S1 (used in the archive file name)")
+	parser.add_argument("--start", help="First session date of the term (YYYY-MM-DD)")
+	parser.add_argument("--end", help="Last session date of the term (YYYY-MM-DD)")
+	parser.add_argument("--vacuum", action="store_true", help="VACUUM the live DB afterwards to return space")
+	parser.add_argument("--list", action="store_true", help="List existing archives and exit")
+	args = parser.parse_args()
+
+	if args.list:
+		for a in ArchiveService.list_archives():
+			print(f"{a['term']}: {a['start_date']}..{a['end_date']} sessions={a['session_count']} attendance={a['attendance_count']} ({a['path']})")
+		return
+
+	if not (args.term and args.start and args.end):
+		parser.error("--term, --start and --end are required")
+
+	ok, err, stats = ArchiveService.archive_term(args.term, args.start, args.end, vacuum=args.vacuum)
+	if not ok:
+		print(f"Archive failed: {err}")
+		sys.exit(1)
+	print(f"Archived {stats['sessions']} sessions and {stats['attendance']} attendance rows into term {args.term}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+# Ensure project root is on sys.path so child interpreters can import the app
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+# What a test run or a respawned worker pays before it can serve a request
+STARTUP = "import app; app.create_app()"
+
+
+def time_startup(runs: int) -> List[float]:
+	"""Wall time (ms) of a fresh interpreter importing the app and building it."""
+	timings: List[float] = []
+	for _ in range(runs):
+		start = time.perf_counter()
+		subprocess.run([sys.executable, "-c", STARTUP], cwd=PROJECT_ROOT, check=True)
+		timings.append((time.perf_counter() - start) * 1000.0)
+	return timings
+
+
+def slowest_imports(top: int) -> List[Tuple[int, str]]:
+	"""Top cumulative import times (us) from python -X importtime."""
+	out = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", STARTUP],
+		cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+	)
+	rows: List[Tuple[int, str]] = []
+	for line in out.stderr.splitlines():
+		parts = line.split("|")
+		if len(parts) != 3 or not parts[1].strip().isdigit():
+			continue
+		rows.append((int(parts[1]), parts[2].rstrip()))
+	rows.sort(reverse=True)
+	return rows[:top]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Measure how long the app takes to import and build in a fresh process.")
+	parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters to time (default 10)")
+	parser.add_argument("--imports", type=int, default=0, metavar="N", help="Also list the N slowest imports")
+	args = parser.parse_args()
+
+	time_startup(2)  # warm the OS file cache; not reported
+	timings = time_startup(args.runs)
+	bare: List[float] = []
+	for _ in range(args.runs):
+		start = time.perf_counter()
+		subprocess.run([sys.executable, "-c", "pass"], check=True)
+		bare.append((time.perf_counter() - start) * 1000.0)
+
+	print(f"interpreter only : {statistics.median(bare):7.1f} ms median")
+	print(f"import + create  : {statistics.median(timings):7.1f} ms median, {min(timings):.1f} min, {max(timings):.1f} max over {args.runs} runs")
+
+	if args.imports:
+		print("\nSlowest imports (cumulative):")
+		for micros, name in slowest_imports(args.imports):
+			print(f"{micros / 1000.0:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+# Ensure project root is on sys.path so we can import the app
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+from flask import render_template
+
+from services import templating
+
+SAMPLE = {"module_name": "Software Engineering", "lecturer_name": "T. Mokoena", "module_id": 12, "week_number": 7, "session_id": 345}
+
+CASES = {
+	"error": {"error": "Invalid or expired token"},
+	"form": {"data": SAMPLE},
+	"form_error": {"data": SAMPLE, "form_error": "Name is too short.", "form_values": {"student_id": "905001234", "student_name": "A"}},
+	"success": {"data": SAMPLE, "success": True, "form_values": {"student_id": 905001234, "student_name": "Ann Lee"}},
+}
+
+
+def per_call_us(fn: Callable[[], object], runs: int) -> float:
+	fn()
+	batches: List[float] = []
+	for _ in range(5):
+		start = time.perf_counter()
+		for _ in range(runs):
+			fn()
+		batches.append((time.perf_counter() - start) / runs * 1e6)
+	return statistics.median(batches)
+
+
+def compile_ms(cache_dir: str) -> float:
+	"""Load all templates in a fresh environment using cache_dir ("" = no bytecode cache)."""
+	from app import create_app
+	flask_app = create_app({"TESTING": True})
+	templating.init_app(flask_app, cache_dir)
+	return sum(ms for _, ms in templating.precompile(flask_app))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Compare template compile and checkin.html render times with and without the fast paths.")
+	parser.add_argument("--runs", type=int, default=2000, help="Renders per timing batch (default 2000)")
+	args = parser.parse_args()
+
+	from app import create_app
+
+	cache_dir = tempfile.mkdtemp(prefix="oqas-bench-templates-")
+	try:
+		cold = compile_ms("")
+		compile_ms(cache_dir)  # fills the cache
+		warm = compile_ms(cache_dir)
+	finally:
+		shutil.rmtree(cache_dir, ignore_errors=True)
+	print(f"load all templates : {cold:7.1f} ms compiling, {warm:7.1f} ms from bytecode cache")
+
+	flask_app = create_app({"TESTING": True})
+	templating.precompile(flask_app)
+	print(f"checkin.html render ({args.runs} x 5 batches, median us per render):")
+	print(f"  {'case':12} {'render_template':>16} {'render_block':>14} {'speedup':>8}")
+	with flask_app.test_request_context("/checkin?tk=bench"):
+		for label, context in CASES.items():
+			before = per_call_us(lambda: render_template("checkin.html", **context), args.runs)
+			after = per_call_us(lambda: templating.render_block("checkin.html", **context), args.runs)
+			print(f"  {label:12} {before:16.1f} {after:14.1f} {before / after:7.1f}x")
+
+
+if __name__ == "__main__":
+	main()
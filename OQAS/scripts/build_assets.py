@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+
+# Ensure project root is on sys.path so we can import services
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+from services.assets import STATIC_DIR, VENDOR, build, vendor
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Vendor third-party assets and build fingerprinted, precompressed copies in static/dist.")
+	parser.add_argument("--vendor", action="store_true", help="Download missing vendored files (needs internet; commit the result)")
+	parser.add_argument("--force", action="store_true", help="With --vendor, download even files that are present")
+	parser.add_argument("--clean", action="store_true", help="Remove hashed files that are not in the new manifest")
+	args = parser.parse_args()
+
+	if args.vendor:
+		fetched = vendor(force=args.force)
+		print(f"Fetched {len(fetched)} of {len(VENDOR)} vendored files")
+	missing = [p for p in VENDOR if not os.path.isfile(os.path.join(STATIC_DIR, p))]
+	if missing:
+		print(f"Warning: {len(missing)} vendored files are missing (pages fall back to the CDN): run with --vendor")
+
+	assets = build(clean=args.clean)
+	raw = sum(a["size"] for a in assets.values())
+	print(f"Built {len(assets)} assets ({raw / 1024:.0f} KiB) into {os.path.join(STATIC_DIR, 'dist')}")
+	for logical, entry in sorted(assets.items()):
+		encodings = ", ".join(entry["encodings"]) or "-"
+		print(f"  {logical} -> {entry['path']} ({entry['size'] / 1024:.1f} KiB; {encodings})")
+
+
+if __name__ == "__main__":
+	main()
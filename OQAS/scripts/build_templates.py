@@ -0,0 +1,34 @@
+import argparse
+import os
+import shutil
+import sys
+
+# Ensure project root is on sys.path so we can import the app
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+from config import TEMPLATE_CACHE_DIR
+from services.templating import precompile
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Compile every template in templates/ into the Jinja bytecode cache.")
+	parser.add_argument("--clean", action="store_true", help="Empty the cache first (after upgrading Jinja or Python)")
+	args = parser.parse_args()
+
+	if not TEMPLATE_CACHE_DIR:
+		print("TEMPLATE_CACHE_DIR is empty: the bytecode cache is disabled")
+		sys.exit(1)
+	if args.clean and os.path.isdir(TEMPLATE_CACHE_DIR):
+		shutil.rmtree(TEMPLATE_CACHE_DIR)
+
+	from app import create_app
+	timings = precompile(create_app())
+	for name, ms in timings:
+		print(f"  {name:32} {ms:7.2f} ms")
+	print(f"Compiled {len(timings)} templates into {TEMPLATE_CACHE_DIR} ({sum(ms for _, ms in timings):.1f} ms)")
+
+
+if __name__ == "__main__":
+	main()
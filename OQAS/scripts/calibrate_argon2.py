@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# Ensure project root is on sys.path so we can import config
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+from argon2 import PasswordHasher
+from config import ARGON2_PARAMS_FILE
+
+
+def measure_verify_ms(time_cost: int, memory_cost: int, parallelism: int, samples: int) -> float:
+	"""Median wall time of one ph.verify() with the given parameters, in milliseconds."""
+	ph = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+	hashed = ph.hash("calibration-password")
+	timings: List[float] = []
+	for _ in range(samples):
+		start = time.perf_counter()
+		ph.verify(hashed, "calibration-password")
+		timings.append((time.perf_counter() - start) * 1000.0)
+	return statistics.median(timings)
+
+
+def calibrate(target_ms: float, max_memory_kib: int, min_memory_kib: int, parallelism: int, samples: int) -> Tuple[Dict[str, int], float, List[Tuple[int, int, float]]]:
+	"""Pick the strongest parameters whose verify time stays within target_ms.
+
+	Memory is the main defence against GPU cracking, so use as much as allowed and
+	then raise time_cost while the budget holds; if even time_cost=1 is too slow,
+	halve memory until it fits (never below min_memory_kib).
+	Returns (params, measured_ms, trials).
+	"""
+	trials: List[Tuple[int, int, float]] = []
+	memory_cost = max_memory_kib
+	while True:
+		ms = measure_verify_ms(1, memory_cost, parallelism, samples)
+		trials.append((1, memory_cost, ms))
+		if ms <= target_ms or memory_cost // 2 < min_memory_kib:
+			break
+		memory_cost //= 2
+
+	best_time_cost, best_ms = 1, trials[-1][2]
+	time_cost = 2
+	while best_ms <= target_ms:
+		ms = measure_verify_ms(time_cost, memory_cost, parallelism, samples)
+		trials.append((time_cost, memory_cost, ms))
+		if ms > target_ms:
+			break
+		best_time_cost, best_ms = time_cost, ms
+		time_cost += 1
+		if time_cost > 20:
+			break
+
+	params = {"time_cost": best_time_cost, "memory_cost": memory_cost, "parallelism": parallelism}
+	return params, best_ms, trials
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Benchmark Argon2 on this machine and pick parameters for a target verify latency.")
+	parser.add_argument("--target-ms", type=float, default=250.0, help="Verify latency budget per login (default 250)")
+	parser.add_argument("--max-memory-mib", type=int, default=64, help="Upper bound for memory_cost (default 64 MiB)")
+	parser.add_argument("--min-memory-mib", type=int, default=8, help="Lower bound for memory_cost (default 8 MiB)")
+	parser.add_argument("--parallelism", type=int, default=min(4, os.cpu_count() or 1), help="Lanes per hash (default: min(4, CPUs))")
+	parser.add_argument("--samples", type=int, default=5, help="Verifications timed per candidate (median is used)")
+	parser.add_argument("--write", action="store_true", help=f"Save the result to {ARGON2_PARAMS_FILE}")
+	args = parser.parse_args()
+
+	params, ms, trials = calibrate(
+		target_ms=args.target_ms,
+		max_memory_kib=args.max_memory_mib * 1024,
+		min_memory_kib=args.min_memory_mib * 1024,
+		parallelism=args.parallelism,
+		samples=args.samples,
+	)
+	for time_cost, memory_cost, trial_ms in trials:
+		print(f"time_cost={time_cost:<2} memory={memory_cost // 1024:>4} MiB parallelism={args.parallelism}: {trial_ms:7.1f} ms")
+	print(f"Selected {params} ({ms:.1f} ms per verify, target {args.target_ms:.0f} ms)")
+
+	if args.write:
+		with open(ARGON2_PARAMS_FILE, "w", encoding="utf-8") as f:
+			json.dump({**params, "target_ms": args.target_ms, "measured_ms": round(ms, 1)}, f, indent=2)
+		print(f"Saved to {ARGON2_PARAMS_FILE}. Restart the app; existing hashes are upgraded on each user's next login.")
+
+
+if __name__ == "__main__":
+	main()
@@ -9,6 +9,7 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from config import DB_PATH
+from services import data_versions
 
 
 def main() -> None:
@@ -40,6 +41,8 @@ def main() -> None:
         # Delete student users
         cursor.execute("DELETE FROM users WHERE role='student'")
         conn.commit()
+        # Pages the running app handed out with ETags are stale now
+        data_versions.touch_all()
 
         # Report after
         cursor.execute("SELECT COUNT(*) FROM users WHERE role='student'")
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+import time
+
+# Ensure project root is on sys.path so we can import config/services
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+from config import ROSTER_HASH_PROCESSES
+from services.roster_service import RosterService
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Create/refresh student accounts from a roster CSV (student_id, full_name[, password]).")
+	parser.add_argument("csv_path", help="Roster CSV file")
+	parser.add_argument("--processes", type=int, default=ROSTER_HASH_PROCESSES, help="Processes hashing initial passwords")
+	args = parser.parse_args()
+
+	with open(args.csv_path, "rb") as f:
+		data = f.read()
+
+	started = time.monotonic()
+
+	def progress(done: int, total: int) -> None:
+		rate = done / max(time.monotonic() - started, 1e-6)
+		print(f"\r{done}/{total} students ({rate:.0f}/s)", end="", flush=True)
+
+	result = RosterService.import_csv(data, progress=progress, processes=args.processes)
+	print()
+	for err in result["errors"][:20]:
+		print(f"skipped {err}")
+	if len(result["errors"]) > 20:
+		print(f"... and {len(result['errors']) - 20} more skipped rows")
+	print(
+		f"Inserted {result['inserted']}, renamed {result['updated']}, unchanged {result['unchanged']} "
+		f"in {time.monotonic() - started:.1f}s"
+	)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,74 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import Any, Dict, List
+
+# Ensure project root is on sys.path so we can import config
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+from config import SLOW_QUERY_LOG
+
+
+def load_entries(path: str) -> List[Dict[str, Any]]:
+	"""Entries from the log and its rotated copies (path.1, path.2, ...)."""
+	entries: List[Dict[str, Any]] = []
+	for file in sorted(glob.glob(path + ".*"), reverse=True) + [path]:
+		if not os.path.isfile(file):
+			continue
+		with open(file, "r", encoding="utf-8") as f:
+			for line in f:
+				try:
+					entries.append(json.loads(line))
+				except ValueError:
+					continue
+	return entries
+
+
+def summarize(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+	by_sql: Dict[str, Dict[str, Any]] = {}
+	for e in entries:
+		row = by_sql.setdefault(e["sql"], {"sql": e["sql"], "count": 0, "total_ms": 0.0, "max_ms": 0.0, "callers": {}, "plan": None})
+		row["count"] += 1
+		row["total_ms"] += float(e.get("ms", 0.0))
+		row["max_ms"] = max(row["max_ms"], float(e.get("ms", 0.0)))
+		caller = e.get("caller", "unknown")
+		row["callers"][caller] = row["callers"].get(caller, 0) + 1
+		row["plan"] = e.get("plan") or row["plan"]
+	return list(by_sql.values())
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Top slow SQL statements from the slow-query log.")
+	parser.add_argument("--file", default=SLOW_QUERY_LOG, help=f"Log to read (default {SLOW_QUERY_LOG})")
+	parser.add_argument("--top", type=int, default=10)
+	parser.add_argument("--by", choices=("total", "max", "count"), default="total")
+	parser.add_argument("--plans", action="store_true", help="Print EXPLAIN QUERY PLAN for each statement")
+	args = parser.parse_args()
+
+	entries = load_entries(args.file)
+	if not entries:
+		print(f"No slow statements logged in {args.file}")
+		return
+	rows = summarize(entries)
+	key = {"total": "total_ms", "max": "max_ms", "count": "count"}[args.by]
+	rows.sort(key=lambda r: r[key], reverse=True)
+
+	print(f"{len(entries)} slow executions of {len(rows)} statements; top {args.top} by {args.by}\n")
+	for i, row in enumerate(rows[:args.top], start=1):
+		avg = row["total_ms"] / row["count"]
+		print(f"#{i} total {row['total_ms']:.1f} ms | {row['count']}x | avg {avg:.1f} ms | max {row['max_ms']:.1f} ms")
+		print(f"   {row['sql'][:200]}")
+		for caller, count in sorted(row["callers"].items(), key=lambda kv: kv[1], reverse=True)[:3]:
+			print(f"   from {caller} ({count}x)")
+		if args.plans and row["plan"]:
+			for step in row["plan"]:
+				print(f"   | {step}")
+		print()
+
+
+if __name__ == "__main__":
+	main()
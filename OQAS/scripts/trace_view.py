@@ -0,0 +1,157 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Ensure project root is on sys.path so we can import config
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+from config import TRACE_LOG
+
+BAR_WIDTH = 40
+
+
+def load_traces(path: str) -> List[Dict[str, Any]]:
+	"""Traces from the log and its rotated copies (path.1, path.2, ...), oldest first."""
+	traces: List[Dict[str, Any]] = []
+	for file in sorted(glob.glob(path + ".*"), reverse=True) + [path]:
+		if not os.path.isfile(file):
+			continue
+		with open(file, "r", encoding="utf-8") as f:
+			for line in f:
+				try:
+					traces.append(json.loads(line))
+				except ValueError:
+					continue
+	return traces
+
+
+def label(span: Dict[str, Any]) -> str:
+	if span["name"] == "sql":
+		return "SQL " + span.get("attrs", {}).get("sql", "")[:70]
+	return span["name"]
+
+
+def self_ms(span: Dict[str, Any]) -> float:
+	children = sum(c["ms"] for c in span.get("children", ()))
+	return max(0.0, span["ms"] - children)
+
+
+def walk(span: Dict[str, Any], stack: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], Dict[str, Any]]]:
+	stack = stack + (label(span),)
+	yield stack, span
+	for child in span.get("children", ()):
+		yield from walk(child, stack)
+
+
+def aggregate(traces: List[Dict[str, Any]]) -> Dict[Tuple[str, ...], List[float]]:
+	"""stack -> [total ms, self ms, calls] summed over all traces."""
+	stacks: Dict[Tuple[str, ...], List[float]] = {}
+	for trace in traces:
+		for stack, span in walk(trace["root"]):
+			row = stacks.setdefault(stack, [0.0, 0.0, 0])
+			row[0] += span["ms"]
+			row[1] += self_ms(span)
+			row[2] += 1
+	return stacks
+
+
+def bar(fraction: float) -> str:
+	filled = int(round(max(0.0, min(1.0, fraction)) * BAR_WIDTH))
+	return "#" * filled + "." * (BAR_WIDTH - filled)
+
+
+def print_flame(traces: List[Dict[str, Any]], min_percent: float) -> None:
+	"""Call tree merged across traces, children ordered by time: a flame graph on its side."""
+	stacks = aggregate(traces)
+	roots = {stack[0] for stack in stacks if len(stack) == 1}
+	for root in sorted(roots, key=lambda r: stacks[(r,)][0], reverse=True):
+		root_total = stacks[(root,)][0] or 1.0
+		calls = int(stacks[(root,)][2])
+		print(f"{root}: {calls} request(s), avg {stacks[(root,)][0] / calls:.1f} ms")
+
+		def show(stack: Tuple[str, ...]) -> None:
+			total, own, count = stacks[stack]
+			share = total / root_total
+			if share * 100.0 < min_percent:
+				return
+			name = stack[-1]
+			indent = "  " * (len(stack) - 1)
+			print(f"  {bar(share)} {share * 100.0:5.1f}%  {total / calls:8.2f} ms/req  self {own / calls:7.2f}  x{count / calls:g}  {indent}{name}")
+			children = [s for s in stacks if len(s) == len(stack) + 1 and s[:-1] == stack]
+			for child in sorted(children, key=lambda s: stacks[s][0], reverse=True):
+				show(child)
+
+		show((root,))
+		print()
+
+
+def print_folded(traces: List[Dict[str, Any]]) -> None:
+	"""Folded stacks (self time in microseconds) for flamegraph.pl or speedscope."""
+	for stack, (_, own, _) in sorted(aggregate(traces).items()):
+		if own > 0:
+			print(";".join(s.replace(";", ",") for s in stack), int(round(own * 1000.0)))
+
+
+def print_trace(trace: Dict[str, Any]) -> None:
+	"""One request as a timeline: offset, duration and a bar positioned on the request."""
+	root = trace["root"]
+	total = root["ms"] or 1.0
+	attrs = root.get("attrs", {})
+	print(f"trace {trace['trace_id']} {trace['ts']} {attrs.get('method', '')} {attrs.get('path', '')} -> {attrs.get('status', '')} in {root['ms']:.1f} ms ({trace.get('kept')})")
+	if trace.get("dropped_spans"):
+		print(f"  ({trace['dropped_spans']} spans beyond the per-trace limit were not recorded)")
+	for stack, span in walk(root):
+		start = int(span["start_ms"] / total * BAR_WIDTH)
+		width = max(1, int(round(span["ms"] / total * BAR_WIDTH)))
+		timeline = (" " * start + "=" * width)[:BAR_WIDTH].ljust(BAR_WIDTH)
+		extra = {k: v for k, v in span.get("attrs", {}).items() if k not in ("sql", "method", "path", "status")}
+		suffix = f"  {extra}" if extra else ""
+		print(f"  |{timeline}| {span['start_ms']:8.2f} +{span['ms']:8.2f} ms  {'  ' * (len(stack) - 1)}{label(span)}{suffix}")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Summarise request traces written by services/tracing.py.")
+	parser.add_argument("--file", default=TRACE_LOG, help=f"Trace log to read (default {TRACE_LOG})")
+	parser.add_argument("--endpoint", help="Only traces whose root span (Flask endpoint) has this name")
+	parser.add_argument("--min-ms", type=float, default=0.0, help="Only requests at least this slow")
+	parser.add_argument("--min-percent", type=float, default=1.0, help="Hide frames below this share of the request (default 1)")
+	parser.add_argument("--slowest", type=int, metavar="N", help="List the N slowest traces")
+	parser.add_argument("--trace", metavar="ID", help="Show one trace as a timeline ('slowest' for the slowest)")
+	parser.add_argument("--folded", action="store_true", help="Print folded stacks instead of the merged tree")
+	args = parser.parse_args()
+
+	traces = [
+		t for t in load_traces(args.file)
+		if t["ms"] >= args.min_ms and (not args.endpoint or t["root"]["name"] == args.endpoint)
+	]
+	if not traces:
+		print(f"No matching traces in {args.file}")
+		return
+
+	if args.trace:
+		found: Optional[Dict[str, Any]]
+		if args.trace == "slowest":
+			found = max(traces, key=lambda t: t["ms"])
+		else:
+			found = next((t for t in traces if t["trace_id"] == args.trace), None)
+		if found is None:
+			print(f"Trace {args.trace} not found")
+			return
+		print_trace(found)
+	elif args.slowest:
+		for t in sorted(traces, key=lambda t: t["ms"], reverse=True)[:args.slowest]:
+			attrs = t["root"].get("attrs", {})
+			print(f"{t['trace_id']}  {t['ms']:9.1f} ms  {t['spans']:4d} spans  {attrs.get('method', '')} {attrs.get('path', '')}")
+	elif args.folded:
+		print_folded(traces)
+	else:
+		print_flame(traces, args.min_percent)
+
+
+if __name__ == "__main__":
+	main()
@@ -7,6 +7,7 @@ if PROJECT_ROOT not in sys.path:
 	sys.path.insert(0, PROJECT_ROOT)
 
 from config import DB_PATH
+from services import data_versions
 
 def main() -> None:
 	conn = sqlite3.connect(DB_PATH)
@@ -15,6 +16,8 @@ def main() -> None:
 		before = cur.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
 		cur.execute("DELETE FROM attendance")
 		conn.commit()
+		# Pages the running app handed out with ETags are stale now
+		data_versions.touch_all()
 		after = cur.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
 		print(f"Deleted rows: {before - after} (remaining: {after})")
 	finally:
@@ -0,0 +1,280 @@
+"""Production entry point: run OQAS under waitress.
+
+    python serve.py                      # settings from config / env (SERVE_*)
+    python serve.py --workers 4 --threads 8
+
+With more than one worker, each process gets its own listening socket bound with
+SO_REUSEPORT, so the kernel spreads connections across them. Sockets are bound by
+the supervisor before forking (bind errors surface immediately) and the app is
+imported only inside the workers, so no SQLite handle crosses a fork. The schema
+is migrated once by the supervisor before any worker starts. In-memory state
+(rate limiter, admission gates, caches) is per process; roster import jobs
+are tracked in the database, so any worker answers their status polls. Database restores
+need exclusive use of the file and are refused while more than one worker runs.
+
+SIGTERM/SIGINT drain gracefully: stop accepting, let queued and in-flight requests
+(check-ins) finish for up to --drain-timeout seconds, then exit. A second signal
+exits immediately.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from werkzeug.wsgi import ClosingIterator
+
+import config
+from config import (
+    PORT,
+    SERVE_HOST,
+    SERVE_THREADS,
+    SERVE_CONNECTION_LIMIT,
+    SERVE_CHANNEL_TIMEOUT,
+    SERVE_BACKLOG,
+    SERVE_CLEANUP_INTERVAL,
+    SERVE_ASYNCORE_USE_POLL,
+    SERVE_ASYNCORE_LOOP_TIMEOUT,
+    SERVE_WORKERS,
+    SERVE_DRAIN_TIMEOUT,
+    LOG_PATH,
+    LOG_LEVEL,
+    LOG_LEVELS,
+    LOG_MAX_BYTES,
+    LOG_BACKUPS,
+)
+
+logger = logging.getLogger("oqas.serve")
+
+
+class InFlightMiddleware:
+    """WSGI middleware counting requests between app call and response close."""
+
+    def __init__(self, app):
+        self.app = app
+        self._idle = threading.Condition()
+        self.in_flight = 0
+        self.served = 0
+
+    def __call__(self, environ, start_response):
+        with self._idle:
+            self.in_flight += 1
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            self._finished()
+            raise
+        return ClosingIterator(result, self._finished)
+
+    def _finished(self) -> None:
+        with self._idle:
+            self.in_flight -= 1
+            self.served += 1
+            if self.in_flight == 0:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Block until no request is in flight; False if timeout expired first."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self.in_flight == 0, timeout)
+
+
+class GracefulShutdown:
+    """Installs SIGTERM/SIGINT handlers that drain a waitress server before exit."""
+
+    def __init__(self, server, middleware: InFlightMiddleware, drain_timeout: float):
+        self.server = server
+        self.middleware = middleware
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        self.drained = False
+
+    def install(self) -> None:
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+
+    def _on_signal(self, signum, frame) -> None:
+        if self.drained or self.draining:
+            # Drain finished (or a second signal): unwind waitress' run loop
+            raise KeyboardInterrupt
+        self.draining = True
+        logger.info("pid %s: draining (up to %.0fs)", os.getpid(), self.drain_timeout)
+        # Listener changes must happen inside the asyncore loop, not mid-iteration
+        self.server.trigger.pull_trigger(self._stop_accepting)
+        threading.Thread(target=self._drain, name="serve-drain", daemon=True).start()
+
+    def _stop_accepting(self) -> None:
+        self.server.accepting = False
+        self.server.del_channel()
+        self.server.socket.close()
+
+    def _queue_empty(self) -> bool:
+        dispatcher = self.server.task_dispatcher
+        return not dispatcher.queue and dispatcher.active_count == 0
+
+    def _outbufs_empty(self) -> bool:
+        channels = list(self.server.active_channels.values())
+        return all(not getattr(ch, "total_outbufs_len", 0) for ch in channels)
+
+    def _drain(self) -> None:
+        deadline = time.monotonic() + self.drain_timeout
+        while time.monotonic() < deadline:
+            remaining = max(0.0, deadline - time.monotonic())
+            if self.middleware.wait_idle(min(remaining, 0.5)) and self._queue_empty() and self._outbufs_empty():
+                break
+            time.sleep(0.05)
+        else:
+            logger.warning("pid %s: drain timed out with %d request(s) in flight", os.getpid(), self.middleware.in_flight)
+        logger.info("pid %s: drained after %d request(s)", os.getpid(), self.middleware.served)
+        self.drained = True
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def bind_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+def waitress_options(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "threads": args.threads,
+        "connection_limit": args.connection_limit,
+        "channel_timeout": args.channel_timeout,
+        "backlog": args.backlog,
+        "cleanup_interval": args.cleanup_interval,
+        "asyncore_use_poll": args.asyncore_use_poll,
+        "asyncore_loop_timeout": args.asyncore_loop_timeout,
+        "ident": "oqas",
+    }
+
+
+def run_worker(sock: socket.socket, args: argparse.Namespace, worker: Optional[int] = None) -> None:
+    from waitress.server import create_server
+    from app import create_app
+
+    from services.app_logging import setup_logging, shutdown_logging
+
+    if worker is not None:
+        # Rotation is not safe across processes: each worker writes its own app.<n>.log
+        base, ext = os.path.splitext(LOG_PATH)
+        setup_logging(f"{base}.{worker}{ext}", LOG_LEVEL, LOG_LEVELS, LOG_MAX_BYTES, LOG_BACKUPS)
+
+    from services import audit
+    from services.scheduler import scheduler, start_maintenance
+    from services.templating import precompile
+
+    flask_app = create_app()
+    # Load every template now (from the bytecode cache when built) rather than on first request
+    precompile(flask_app)
+    # Session expiry, backups, checkpoints: the worker holding the scheduler lock runs them
+    start_maintenance()
+    middleware = InFlightMiddleware(flask_app)
+    server = create_server(middleware, sockets=[sock], **waitress_options(args))
+    GracefulShutdown(server, middleware, args.drain_timeout).install()
+    server.print_listen("pid " + str(os.getpid()) + ": serving on http://{}:{}")
+    try:
+        server.run()
+    finally:
+        scheduler.stop()
+        audit.flush()
+        # Forked workers leave via os._exit(), which skips atexit: write out queued records
+        shutdown_logging()
+
+
+def supervise(socks: List[socket.socket], args: argparse.Namespace) -> None:
+    """Fork one worker per socket, restart crashed workers, forward shutdown signals."""
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                for j, other in enumerate(socks):
+                    if j != index:
+                        other.close()
+                run_worker(socks[index], args, worker=index)
+            except BaseException:
+                logger.exception("worker %s crashed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def on_signal(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for i in range(len(socks)):
+        spawn(i)
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    logger.info("supervisor %s: %d workers on port %s", os.getpid(), len(socks), args.port)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            logger.warning("worker %s exited (status %s); restarting", pid, status)
+            time.sleep(1)
+            spawn(index)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve OQAS with waitress.")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help="Processes sharing the port via SO_REUSEPORT")
+    parser.add_argument("--threads", type=int, default=SERVE_THREADS, help="Request threads per process")
+    parser.add_argument("--connection-limit", type=int, default=SERVE_CONNECTION_LIMIT)
+    parser.add_argument("--channel-timeout", type=int, default=SERVE_CHANNEL_TIMEOUT, help="Seconds before an idle connection is closed")
+    parser.add_argument("--backlog", type=int, default=SERVE_BACKLOG)
+    parser.add_argument("--cleanup-interval", type=int, default=SERVE_CLEANUP_INTERVAL)
+    parser.add_argument("--asyncore-use-poll", action=argparse.BooleanOptionalAction, default=SERVE_ASYNCORE_USE_POLL)
+    parser.add_argument("--asyncore-loop-timeout", type=int, default=SERVE_ASYNCORE_LOOP_TIMEOUT)
+    parser.add_argument("--drain-timeout", type=float, default=SERVE_DRAIN_TIMEOUT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    # Migrate once here rather than in every worker
+    from init_db import ensure_schema
+    if ensure_schema():
+        logger.info("database schema migrated")
+
+    workers = max(1, args.workers)
+    if workers > 1 and not (hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT")):
+        logger.warning("multi-process mode needs fork() and SO_REUSEPORT; running a single process")
+        workers = 1
+    # Read by the app once imported in the workers (restore checks it)
+    config.SERVE_WORKERS = workers
+
+    if workers == 1:
+        run_worker(bind_socket(args.host, args.port, reuse_port=False), args)
+        return
+    socks = [bind_socket(args.host, args.port, reuse_port=True) for _ in range(workers)]
+    supervise(socks, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
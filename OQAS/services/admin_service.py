@@ -1,14 +1,40 @@
+import logging
 import os
 import shutil
 import sqlite3
+import tempfile
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
-from argon2 import PasswordHasher
-from config import DB_PATH
+from config import DB_DRAIN_TIMEOUT, SERVE_WORKERS
+import db
+from db import connect, get_pool, read_connection
+from db.pool import PoolPausedError
+from init_db import REQUIRED_TABLES, SCHEMA_VERSION, create_tables
+from services import audit, data_versions
+from services.password_service import PasswordService
 
+logger = logging.getLogger("oqas.admin")
 
-ph = PasswordHasher()
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+
+
+def _keyset(column: str, q: str, after: Optional[str], descending: bool) -> Tuple[List[str], List[Any], str]:
+    """WHERE terms, parameters and ORDER BY for a prefix filter plus keyset position on column.
+
+    The prefix is a BINARY range (column >= q AND column < q + U+10FFFF) so it is
+    an index seek, unlike LIKE on a case-sensitive column.
+    """
+    where: List[str] = []
+    params: List[Any] = []
+    if q:
+        where.append(f"{column} >= ? AND {column} < ?")
+        params += [q, q + "\U0010ffff"]
+    if after:
+        where.append(f"{column} {'<' if descending else '>'} ?")
+        params.append(after)
+    return where, params, f"{column} {'DESC' if descending else 'ASC'}"
 
 
 class AdminService:
@@ -17,7 +43,7 @@ class AdminService:
     # ---------------------- Lecturers ----------------------
     @staticmethod
     def list_lecturers() -> List[Dict]:
-        conn = sqlite3.connect(DB_PATH)
+        conn = read_connection()
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -35,11 +61,40 @@ class AdminService:
         finally:
             conn.close()
 
+    @staticmethod
+    def search_lecturers(q: str = "", after: Optional[str] = None, descending: bool = False, limit: int = SEARCH_PAGE_SIZE) -> Dict[str, Any]:
+        """One page of lecturers by username, optionally those whose username starts with q.
+
+        Pass the returned "next" as ``after`` to get the following page; each page
+        is an index range scan on (role, username), however many users exist.
+        """
+        limit = max(1, min(int(limit), SEARCH_MAX_PAGE_SIZE))
+        where, params, order = _keyset("u.username", q, after, descending)
+        conn = read_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT u.user_id, u.username, u.full_name,
+                       (SELECT COUNT(*) FROM modules m WHERE m.lecturer_id = u.user_id)
+                FROM users u
+                WHERE {" AND ".join(["u.role = 'lecturer'"] + where)}
+                ORDER BY {order}
+                LIMIT ?
+                """,
+                params + [limit + 1],
+            )
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        items = [{"user_id": r[0], "username": r[1], "full_name": r[2], "module_count": r[3]} for r in rows[:limit]]
+        return {"items": items, "next": items[-1]["username"] if len(rows) > limit else None}
+
     @staticmethod
     def create_lecturer(username: str, full_name: str, password: str) -> Tuple[bool, Optional[str]]:
         if not username or not full_name or not password:
             return False, "All fields are required"
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -47,9 +102,10 @@ class AdminService:
                 INSERT INTO users (username, password_hash, role, full_name)
                 VALUES (?, ?, 'lecturer', ?)
                 """,
-                (username, ph.hash(password), full_name),
+                (username, PasswordService.hash(password), full_name),
             )
             conn.commit()
+            audit.record("lecturer.create", target=f"user:{cursor.lastrowid}", note=username)
             return True, None
         except sqlite3.IntegrityError:
             return False, "Username already exists"
@@ -60,29 +116,34 @@ class AdminService:
     def reset_lecturer_password(user_id: int, new_password: str) -> Tuple[bool, Optional[str]]:
         if not new_password:
             return False, "New password is required"
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         try:
             cursor.execute(
                 "UPDATE users SET password_hash = ? WHERE user_id = ? AND role = 'lecturer'",
-                (ph.hash(new_password), user_id),
+                (PasswordService.hash(new_password), user_id),
             )
             if cursor.rowcount == 0:
                 return False, "Lecturer not found"
             conn.commit()
+            audit.record("lecturer.reset_password", target=f"user:{user_id}")
             return True, None
         finally:
             conn.close()
 
     @staticmethod
     def delete_lecturer(user_id: int) -> Tuple[bool, Optional[str]]:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         try:
-            cursor.execute("DELETE FROM users WHERE user_id = ? AND role = 'lecturer'", (user_id,))
-            if cursor.rowcount == 0:
+            cursor.execute("DELETE FROM users WHERE user_id = ? AND role = 'lecturer' RETURNING username", (user_id,))
+            row = cursor.fetchone()
+            if row is None:
                 return False, "Lecturer not found"
             conn.commit()
+            # Their modules (and those modules' sessions) went with them
+            data_versions.touch_all()
+            audit.record("lecturer.delete", target=f"user:{user_id}", note=row[0])
             return True, None
         except sqlite3.IntegrityError as e:
             return False, f"Cannot delete lecturer: {str(e)}"
@@ -92,7 +153,7 @@ class AdminService:
     # ---------------------- Modules ----------------------
     @staticmethod
     def list_modules() -> List[Dict]:
-        conn = sqlite3.connect(DB_PATH)
+        conn = read_connection()
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -119,11 +180,56 @@ class AdminService:
         finally:
             conn.close()
 
+    @staticmethod
+    def search_modules(
+        q: str = "",
+        lecturer_id: Optional[int] = None,
+        after: Optional[str] = None,
+        descending: bool = False,
+        limit: int = SEARCH_PAGE_SIZE,
+    ) -> Dict[str, Any]:
+        """One page of modules by code (prefix q, optionally one lecturer's); see search_lecturers()."""
+        limit = max(1, min(int(limit), SEARCH_MAX_PAGE_SIZE))
+        where, params, order = _keyset("m.module_code", q, after, descending)
+        if lecturer_id is not None:
+            where.insert(0, "m.lecturer_id = ?")
+            params.insert(0, lecturer_id)
+        conn = read_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT m.module_id, m.module_code, m.module_name, m.planned_weeks,
+                       u.user_id, u.full_name
+                FROM modules m
+                JOIN users u ON m.lecturer_id = u.user_id
+                {"WHERE " + " AND ".join(where) if where else ""}
+                ORDER BY {order}
+                LIMIT ?
+                """,
+                params + [limit + 1],
+            )
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        items = [
+            {
+                "module_id": r[0],
+                "module_code": r[1],
+                "module_name": r[2],
+                "planned_weeks": r[3],
+                "lecturer_id": r[4],
+                "lecturer_name": r[5],
+            }
+            for r in rows[:limit]
+        ]
+        return {"items": items, "next": items[-1]["module_code"] if len(rows) > limit else None}
+
     @staticmethod
     def create_module(module_code: str, module_name: str, lecturer_id: int, planned_weeks: int = 14) -> Tuple[bool, Optional[str]]:
         if not module_code or not module_name or not lecturer_id:
             return False, "module_code, module_name, lecturer_id are required"
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -134,6 +240,7 @@ class AdminService:
                 (module_code, module_name, lecturer_id, planned_weeks or 14),
             )
             conn.commit()
+            audit.record("module.create", target=f"module:{cursor.lastrowid}", note=f"{module_code} lecturer:{lecturer_id}")
             return True, None
         except sqlite3.IntegrityError:
             return False, "Module code already exists"
@@ -142,7 +249,7 @@ class AdminService:
 
     @staticmethod
     def update_module(module_id: int, module_code: str, module_name: str, lecturer_id: int, planned_weeks: int) -> Tuple[bool, Optional[str]]:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -156,6 +263,10 @@ class AdminService:
             if cursor.rowcount == 0:
                 return False, "Module not found"
             conn.commit()
+            # Module names appear on student and session pages too
+            data_versions.touch_all()
+            audit.record("module.update", target=f"module:{module_id}",
+                         note=f"{module_code} {module_name!r} lecturer:{lecturer_id} weeks:{planned_weeks}")
             return True, None
         except sqlite3.IntegrityError:
             return False, "Module code already exists"
@@ -164,49 +275,199 @@ class AdminService:
 
     @staticmethod
     def delete_module(module_id: int) -> Tuple[bool, Optional[str]]:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         try:
-            cursor.execute("DELETE FROM modules WHERE module_id = ?", (module_id,))
-            if cursor.rowcount == 0:
+            cursor.execute("DELETE FROM modules WHERE module_id = ? RETURNING module_code", (module_id,))
+            row = cursor.fetchone()
+            if row is None:
                 return False, "Module not found"
             conn.commit()
+            data_versions.touch_all()
+            audit.record("module.delete", target=f"module:{module_id}", note=row[0])
             return True, None
         finally:
             conn.close()
 
     # ---------------------- Backup/Restore ----------------------
     @staticmethod
-    def backup_database(target_dir: str) -> Tuple[bool, Optional[str], Optional[str]]:
-        """Create a copy of the SQLite DB file in target_dir. Returns (ok, error, filepath)."""
+    def backup_database(target_dir: str, prefix: str = "oqas_backup") -> Tuple[bool, Optional[str], Optional[str]]:
+        """Write a consistent snapshot of the live DB into target_dir. Returns (ok, error, filepath).
+
+        Uses SQLite's online backup from a read snapshot, so commits still in the WAL
+        are included and writers are not blocked; the file appears under its final
+        name only once complete.
+        """
         try:
             os.makedirs(target_dir, exist_ok=True)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"oqas_backup_{timestamp}.sqlite3"
+            filename = f"{prefix}_{timestamp}.sqlite3"
             dest_path = os.path.join(target_dir, filename)
-            # Use shutil.copy2 for metadata preservation
-            shutil.copy2(DB_PATH, dest_path)
+            partial = dest_path + ".part"
+            live = read_connection()
+            try:
+                dest = sqlite3.connect(partial)
+                try:
+                    live.backup(dest)
+                finally:
+                    dest.close()
+            finally:
+                live.close()
+            os.replace(partial, dest_path)
+            audit.record("db.backup", target=filename, note="scheduled" if prefix == "oqas_scheduled" else None)
             return True, None, dest_path
         except Exception as e:
+            logger.exception("database backup failed")
             return False, str(e), None
 
     @staticmethod
-    def restore_database(source_path: str) -> Tuple[bool, Optional[str]]:
-        """Replace current DB with the provided file, after making an automatic backup."""
+    def list_backups(target_dir: str, prefixes: Tuple[str, ...] = ("oqas_backup_", "oqas_scheduled_")) -> List[str]:
+        """Backup files made by backup_database() in target_dir, newest first."""
+        try:
+            names = [n for n in os.listdir(target_dir) if n.startswith(prefixes) and n.endswith(".sqlite3")]
+        except FileNotFoundError:
+            return []
+        # Newest first by the timestamp in the name, whichever prefix it carries
+        names.sort(key=lambda n: n.rsplit("_", 2)[-2:], reverse=True)
+        return [os.path.join(target_dir, n) for n in names]
+
+    @staticmethod
+    def scheduled_backup(target_dir: str, keep: int) -> Dict[str, Any]:
+        """Back up, then delete all but the newest ``keep`` scheduled backups (scheduler job).
+
+        Backups taken by hand from the admin page are never pruned.
+        """
+        ok, err, path = AdminService.backup_database(target_dir, prefix="oqas_scheduled")
+        if not ok:
+            raise RuntimeError(f"backup failed: {err}")
+        removed = 0
+        for old in AdminService.list_backups(target_dir, prefixes=("oqas_scheduled_",))[max(1, keep):]:
+            try:
+                os.remove(old)
+                removed += 1
+            except OSError:
+                logger.warning("could not remove old backup %s", old)
+        return {"path": path, "removed": removed}
+
+    @staticmethod
+    def stage_restore_upload(stream: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+        """Stream an uploaded database into a temp file next to the live DB.
+
+        Staging on the same filesystem lets restore_database() swap it in with an
+        atomic os.replace(). Returns the staged path.
+        """
+        db_dir = os.path.dirname(os.path.abspath(get_pool().path))
+        os.makedirs(db_dir, exist_ok=True)
+        fd, staged_path = tempfile.mkstemp(prefix=".restore_", suffix=".sqlite3", dir=db_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(stream, out, chunk_size)
+        except Exception:
+            os.unlink(staged_path)
+            raise
+        return staged_path
+
+    @staticmethod
+    def validate_restore_file(path: str) -> Optional[str]:
+        """Check a candidate database and migrate it to the current schema.
+
+        Returns an error message, or None when the file is safe to swap in.
+        """
+        try:
+            conn = sqlite3.connect(path)
+        except sqlite3.Error as e:
+            return f"Not a SQLite database: {str(e)}"
+        try:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA integrity_check")
+            problems = [r[0] for r in cursor.fetchall()]
+            if problems != ["ok"]:
+                return f"Integrity check failed: {'; '.join(problems[:3])}"
+            cursor.execute("PRAGMA user_version")
+            version = cursor.fetchone()[0]
+            if version > SCHEMA_VERSION:
+                return f"Backup schema version {version} is newer than supported version {SCHEMA_VERSION}"
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            tables = {r[0] for r in cursor.fetchall()}
+            missing = [t for t in REQUIRED_TABLES if t not in tables]
+            if missing:
+                return f"Not an OQAS database (missing tables: {', '.join(missing)})"
+            # Bring older backups up to the current schema before they go live
+            create_tables(cursor)
+            conn.commit()
+            return None
+        except sqlite3.DatabaseError as e:
+            return f"Not a valid database: {str(e)}"
+        finally:
+            conn.close()
+
+    @staticmethod
+    def restore_database(source_path: str, staged: bool = False) -> Tuple[bool, Optional[str]]:
+        """Replace the live DB with source_path, after validating it and backing up the current DB.
+
+        The candidate is copied (or, if ``staged``, used directly) as a temp file beside
+        the live DB and validated while the app keeps serving. Only the final swap runs
+        with the connection pool paused: in-flight requests drain, the file is replaced
+        with os.replace() and stale journal files are removed before the pool resumes.
+
+        Pausing only drains this process's pools. Other serve.py workers would keep
+        writing to the replaced file and its WAL, so with SERVE_WORKERS > 1 the
+        restore is refused before anything is touched.
+        """
+        if SERVE_WORKERS > 1:
+            if staged:
+                try:
+                    os.remove(source_path)
+                except OSError:
+                    pass
+            return False, (f"Restore needs a single server process, but {SERVE_WORKERS} workers share the "
+                           "database; restart with --workers 1 (SERVE_WORKERS=1), restore, then scale back up")
         if not os.path.isfile(source_path):
             return False, "Source file does not exist"
+        db_path = os.path.abspath(get_pool().path)
+        staged_path = source_path
         try:
-            # Auto-backup current DB next to it
-            current_dir = os.path.dirname(DB_PATH)
-            os.makedirs(current_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = os.path.join(current_dir, f"auto_backup_before_restore_{timestamp}.sqlite3")
-            if os.path.exists(DB_PATH):
-                shutil.copy2(DB_PATH, backup_path)
-            # Replace
-            shutil.copy2(source_path, DB_PATH)
+            if not staged:
+                with open(source_path, "rb") as src:
+                    staged_path = AdminService.stage_restore_upload(src)
+
+            error = AdminService.validate_restore_file(staged_path)
+            if error:
+                return False, error
+
+            # Auto-backup current DB next to it (online backup, consistent snapshot)
+            if os.path.exists(db_path):
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                backup_path = os.path.join(os.path.dirname(db_path), f"auto_backup_before_restore_{timestamp}.sqlite3")
+                live = connect()
+                try:
+                    dest = sqlite3.connect(backup_path)
+                    try:
+                        live.backup(dest)
+                    finally:
+                        dest.close()
+                finally:
+                    live.close()
+
+            with db.paused(drain_timeout=DB_DRAIN_TIMEOUT):
+                os.replace(staged_path, db_path)
+                for suffix in ("-wal", "-shm", "-journal"):
+                    try:
+                        os.remove(db_path + suffix)
+                    except FileNotFoundError:
+                        pass
+            data_versions.touch_all()
+            # Written into the restored database, after the entries that came with it
+            audit.record("db.restore", target=os.path.basename(source_path))
             return True, None
+        except PoolPausedError as e:
+            return False, str(e)
         except Exception as e:
+            logger.exception("database restore failed")
             return False, str(e)
-
-
+        finally:
+            if os.path.exists(staged_path) and (staged or staged_path != source_path):
+                try:
+                    os.remove(staged_path)
+                except OSError:
+                    pass
@@ -0,0 +1,84 @@
+import threading
+from functools import wraps
+from typing import Dict, Iterable
+
+from flask import flash, jsonify, render_template, request
+
+from config import ADMISSION_LIMITS, ADMISSION_WAIT_SECONDS
+
+
+class AdmissionGate:
+    """Caps how many requests of one class may be inside their handlers at once.
+
+    Each class (login, checkin, api) gets its own gate, so a login storm can only
+    occupy ``limit`` server threads and the rest stay free for check-ins.
+    """
+
+    def __init__(self, name: str, limit: int, wait_seconds: float):
+        self.name = name
+        self.limit = limit
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def enter(self) -> bool:
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.active += 1
+            self.admitted += 1
+        return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"limit": self.limit, "active": self.active, "admitted": self.admitted, "rejected": self.rejected}
+
+
+GATES: Dict[str, AdmissionGate] = {
+    name: AdmissionGate(name, limit, ADMISSION_WAIT_SECONDS) for name, limit in ADMISSION_LIMITS.items()
+}
+
+
+def _busy_response(gate: AdmissionGate):
+    headers = {"Retry-After": "2"}
+    if request.path.startswith("/api/"):
+        return jsonify({"ok": False, "success": False, "error": "Server busy, please retry shortly"}), 503, headers
+    message = "The server is busy right now. Please try again in a few seconds."
+    if gate.name == "login":
+        flash(message)
+        return render_template("login.html", error=message), 503, headers
+    return render_template("checkin.html", error=message), 503, headers
+
+
+def admission_limit(gate_name: str, methods: Iterable[str] = ("GET", "POST")):
+    """Route decorator: run the view only if the named gate has a free slot, else 503."""
+    gate = GATES[gate_name]
+    limited = {m.upper() for m in methods}
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in limited:
+                return f(*args, **kwargs)
+            if not gate.enter():
+                return _busy_response(gate)
+            try:
+                return f(*args, **kwargs)
+            finally:
+                gate.leave()
+        return decorated_function
+    return decorator
+
+
+def admission_stats() -> Dict[str, Dict[str, int]]:
+    return {name: gate.stats() for name, gate in GATES.items()}
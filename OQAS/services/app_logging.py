@@ -0,0 +1,289 @@
+"""Structured JSON application logging that never writes from a request thread.
+
+Every logger under "oqas" (oqas.access, oqas.attendance, oqas.serve, ...) goes
+through one QueueHandler. The handler only stamps the record with the current
+request id, route and role and puts it on an in-memory queue; a QueueListener
+thread formats it as one JSON line and writes it to LOG_PATH (size-rotated), and
+to the console too when the process configured root handlers (serve.py). If the
+queue is full the record is dropped and counted rather than blocking a check-in.
+
+oqas.sql.slow and oqas.trace keep their own files (see db/query_log.py and
+services/tracing.py) and are not duplicated here.
+"""
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from flask import Flask, g, request, session
+
+from services import metrics
+
+ROOT_LOGGER = "oqas"
+access_logger = logging.getLogger("oqas.access")
+
+# Request ids: a random per-process prefix plus a counter (uuid4() costs a urandom
+# syscall per request; this is unique enough to grep for across workers and restarts)
+_id_prefix = os.urandom(4).hex()
+_id_counter = itertools.count(1)
+
+# (request_id, route, role) of the request being handled by this thread
+_request_context: ContextVar[Optional[tuple]] = ContextVar("oqas_log_request", default=None)
+
+# Attributes every LogRecord has; anything else was passed with extra= and is logged
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request fields, extras, exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, default=str)
+
+
+class _RequestContextFilter(logging.Filter):
+    """Copies the request id, route and role onto records, in the thread that logs."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = _request_context.get()
+        if ctx is not None and not hasattr(record, "request_id"):
+            record.request_id, record.route, record.role = ctx
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only freeze the message here (this is the sole handler, so no copy is
+        # needed); JSON formatting and the traceback text are the listener's job
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _NonBlockingQueueHandler.dropped += 1
+
+
+class _JsonFileHandler(RotatingFileHandler):
+    """Size-rotated file that formats each record once and keeps its own byte count.
+
+    The stock shouldRollover() formats the record a second time and stats and
+    seeks the file for every line; here the size is tracked as lines are written
+    and flushing is left to the listener, once per batch.
+    """
+
+    _size = 0
+
+    def _open(self):
+        stream = super()._open()
+        self._size = os.fstat(stream.fileno()).st_size
+        return stream
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            line = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self._size and self._size + len(line) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(line)
+            self._size += len(line)  # JSON output is ASCII, so characters are bytes
+        except Exception:
+            self.handleError(record)
+
+
+class _BatchingQueueListener(QueueListener):
+    """Handles whatever has queued up, flushes once, then naps before the next batch.
+
+    Waking per record would cost a thread switch and a write() per request; with
+    the nap a busy server wakes the listener a few times a second at most.
+    """
+
+    interval = 0.05
+    max_batch = 1000
+
+    def _monitor(self) -> None:
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                    continue
+                self.handle(record)
+            for handler in self.handlers:
+                handler.flush()
+            for _ in batch:
+                q.task_done()
+            if stop:
+                return
+            time.sleep(self.interval)
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_setup_lock = threading.Lock()
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """'oqas.access=WARNING,oqas.roster=DEBUG' -> {logger name: level}."""
+    levels: Dict[str, int] = {}
+    for part in spec.split(","):
+        name, sep, level = part.partition("=")
+        if not sep or not name.strip():
+            continue
+        value = logging.getLevelName(level.strip().upper())
+        if isinstance(value, int):
+            levels[name.strip()] = value
+    return levels
+
+
+def setup_logging(
+    log_path: str,
+    level: str = "INFO",
+    module_levels: str = "",
+    max_bytes: int = 10 * 1024 * 1024,
+    backups: int = 5,
+    queue_size: int = 10000,
+) -> bool:
+    """Route the "oqas" loggers through a queue to a rotating JSON file.
+
+    The first call wins (later calls, e.g. from every create_app(), are no-ops);
+    returns True if this call configured logging.
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return False
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        file_handler = _JsonFileHandler(log_path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        file_handler.setFormatter(JsonFormatter())
+        # Console handlers set up by the entry point (serve.py) are written by the listener too
+        handlers = [file_handler] + list(logging.getLogger().handlers)
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+        queue_handler = _NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(_RequestContextFilter())
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.handlers = [queue_handler]
+        root.setLevel(parse_levels(f"{ROOT_LOGGER}={level}").get(ROOT_LOGGER, logging.INFO))
+        root.propagate = False
+        for name, value in parse_levels(module_levels).items():
+            logging.getLogger(name).setLevel(value)
+
+        _queue_handler = queue_handler
+        _listener = _BatchingQueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return True
+
+
+def shutdown_logging() -> None:
+    """Write out whatever is queued and stop the listener thread."""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger(ROOT_LOGGER).removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.flush()
+            if isinstance(handler, _JsonFileHandler):
+                handler.close()
+        _listener = None
+        _queue_handler = None
+
+
+def dropped_records() -> int:
+    return _NonBlockingQueueHandler.dropped
+
+
+# ---------------------- Flask hooks ----------------------
+def _before_request() -> None:
+    g._log_started = time.perf_counter()
+    incoming = request.headers.get("X-Request-ID", "")
+    request_id = incoming if 0 < len(incoming) <= 64 and incoming.isprintable() else f"{_id_prefix}{next(_id_counter):08x}"
+    role = None
+    # Static files skip the session: reading it would add "Vary: Cookie" to cacheable assets
+    if request.endpoint != "static":
+        user = session.get("user")
+        role = user.get("role") if isinstance(user, dict) else None
+    g.request_id = request_id
+    g._log_token = _request_context.set((request_id, request.endpoint or "unmatched", role))
+
+
+def _after_request(response):
+    request_id = g.get("request_id")
+    if request_id:
+        response.headers.setdefault("X-Request-ID", request_id)
+        g._log_status = response.status_code
+    return response
+
+
+def _teardown_request(exc: Optional[BaseException]) -> None:
+    started = g.pop("_log_started", None)
+    token = g.pop("_log_token", None)
+    if started is None:
+        return
+    try:
+        if access_logger.isEnabledFor(logging.INFO):
+            sql_count, sql_seconds = metrics.request_sql()
+            status = 500 if exc is not None else g.get("_log_status")
+            access_logger.info(
+                "%s %s %s",
+                request.method,
+                request.path,
+                status,
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "status": status,
+                    "ms": round((time.perf_counter() - started) * 1000.0, 3),
+                    "sql_count": sql_count,
+                    "sql_ms": round(sql_seconds * 1000.0, 3),
+                },
+                exc_info=exc if exc is not None else None,
+            )
+    finally:
+        if token is not None:
+            _request_context.reset(token)
+
+
+def init_app(app: Flask) -> None:
+    """Assign request ids and write one access record per request; safe for several apps."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,243 @@
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from db import connect, get_pool
+from services import data_versions
+
+logger = logging.getLogger("oqas.archive")
+
+
+ARCHIVE_DIR_NAME = "archive"
+
+
+class ArchiveService:
+    """Move closed terms out of the live DB into per-term archive files.
+
+    Archived sessions/attendance keep their original ids, so readers can combine
+    rows from ``main`` and from archives ATTACHed read-only on demand.
+    """
+
+    @staticmethod
+    def _archive_dir() -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(get_pool().path)), ARCHIVE_DIR_NAME)
+
+    @staticmethod
+    def _resolve(path: str) -> str:
+        # Paths are stored relative to the DB folder so backups/restores stay portable
+        if os.path.isabs(path):
+            return path
+        return os.path.join(os.path.dirname(os.path.abspath(get_pool().path)), path)
+
+    @staticmethod
+    def _create_archive_tables(conn: sqlite3.Connection, schema: str) -> None:
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.sessions (
+                session_id INTEGER PRIMARY KEY,
+                module_id INTEGER NOT NULL,
+                week_number INTEGER NOT NULL,
+                session_date DATE NOT NULL,
+                status TEXT,
+                created_at TIMESTAMP,
+                ended_at TIMESTAMP NULL,
+                run_id INTEGER NULL
+            )
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.attendance (
+                attendance_id INTEGER PRIMARY KEY,
+                session_id INTEGER NOT NULL,
+                student_id INTEGER NOT NULL,
+                status TEXT,
+                checkin_time TIMESTAMP
+            )
+            """
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_arch_sessions_module ON sessions (module_id, session_date)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_arch_sessions_date ON sessions (session_date)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_arch_attendance_session ON attendance (session_id, student_id)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_arch_attendance_student ON attendance (student_id)")
+
+    @staticmethod
+    def archive_term(term: str, start_date: str, end_date: str, vacuum: bool = False) -> Tuple[bool, Optional[str], Dict[str, int]]:
+        """Move ended sessions dated within [start_date, end_date] and their attendance
+        into ``db/archive/oqas_<term>.sqlite3``.
+
+        Runs in one transaction, so a failure leaves the live DB untouched. Re-running
+        for the same term appends newly closed sessions to the same file.
+        Returns (ok, error, {"sessions": n, "attendance": n}).
+        """
+        stats = {"sessions": 0, "attendance": 0}
+        term = (term or "").strip()
+        if not term or not all(c.isalnum() or c in "-_" for c in term):
+            return False, "Term must be letters, digits, '-' or '_'", stats
+        try:
+            start = datetime.strptime(start_date, "%Y-%m-%d").date().isoformat()
+            end = datetime.strptime(end_date, "%Y-%m-%d").date().isoformat()
+        except (TypeError, ValueError):
+            return False, "Dates must be YYYY-MM-DD", stats
+        if start > end:
+            return False, "start_date must not be after end_date", stats
+
+        os.makedirs(ArchiveService._archive_dir(), exist_ok=True)
+        rel_path = os.path.join(ARCHIVE_DIR_NAME, f"oqas_{term}.sqlite3")
+        abs_path = ArchiveService._resolve(rel_path)
+
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT COUNT(*) FROM sessions WHERE status = 'active' AND session_date BETWEEN ? AND ?",
+                (start, end),
+            )
+            if cursor.fetchone()[0]:
+                return False, "Close all active sessions in this term before archiving", stats
+
+            cursor.execute("ATTACH DATABASE ? AS arch", (abs_path,))
+            try:
+                ArchiveService._create_archive_tables(conn, "arch")
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(
+                    """
+                    CREATE TEMP TABLE IF NOT EXISTS archive_batch (session_id INTEGER PRIMARY KEY)
+                    """
+                )
+                cursor.execute("DELETE FROM temp.archive_batch")
+                cursor.execute(
+                    """
+                    INSERT INTO temp.archive_batch (session_id)
+                    SELECT session_id FROM main.sessions
+                    WHERE status = 'ended' AND session_date BETWEEN ? AND ?
+                    """,
+                    (start, end),
+                )
+                cursor.execute(
+                    """
+                    INSERT OR REPLACE INTO arch.sessions
+                        (session_id, module_id, week_number, session_date, status, created_at, ended_at, run_id)
+                    SELECT session_id, module_id, week_number, session_date, status, created_at, ended_at, run_id
+                    FROM main.sessions
+                    WHERE session_id IN (SELECT session_id FROM temp.archive_batch)
+                    """
+                )
+                stats["sessions"] = cursor.rowcount
+                cursor.execute(
+                    """
+                    INSERT OR REPLACE INTO arch.attendance
+                        (attendance_id, session_id, student_id, status, checkin_time)
+                    SELECT attendance_id, session_id, student_id, status, checkin_time
+                    FROM main.attendance
+                    WHERE session_id IN (SELECT session_id FROM temp.archive_batch)
+                    """
+                )
+                stats["attendance"] = cursor.rowcount
+                cursor.execute("DELETE FROM main.attendance WHERE session_id IN (SELECT session_id FROM temp.archive_batch)")
+                cursor.execute("DELETE FROM main.sessions WHERE session_id IN (SELECT session_id FROM temp.archive_batch)")
+                cursor.execute(
+                    """
+                    INSERT INTO main.archives (term, path, start_date, end_date, session_count, attendance_count)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(term) DO UPDATE SET
+                        start_date = MIN(start_date, excluded.start_date),
+                        end_date = MAX(end_date, excluded.end_date),
+                        session_count = session_count + excluded.session_count,
+                        attendance_count = attendance_count + excluded.attendance_count,
+                        archived_at = CURRENT_TIMESTAMP
+                    """,
+                    (term, rel_path, start, end, stats["sessions"], stats["attendance"]),
+                )
+                cursor.execute("DELETE FROM temp.archive_batch")
+                conn.commit()
+                data_versions.touch_all()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute("DETACH DATABASE arch")
+
+            if vacuum and stats["sessions"]:
+                conn.execute("VACUUM")
+            return True, None, stats
+        except Exception as e:
+            logger.exception("archiving term failed")
+            return False, str(e), stats
+        finally:
+            conn.close()
+
+    @staticmethod
+    def list_archives() -> List[Dict[str, Any]]:
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT term, path, start_date, end_date, session_count, attendance_count, archived_at
+                FROM archives
+                ORDER BY start_date
+                """
+            )
+            return [
+                {
+                    "term": r[0],
+                    "path": r[1],
+                    "start_date": r[2],
+                    "end_date": r[3],
+                    "session_count": r[4],
+                    "attendance_count": r[5],
+                    "archived_at": r[6],
+                }
+                for r in cursor.fetchall()
+            ]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def archives_for_range(conn: sqlite3.Connection, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[str]:
+        """Absolute paths of archives whose date span overlaps [start_date, end_date] (open-ended if None)."""
+        try:
+            cursor = conn.execute(
+                """
+                SELECT path FROM main.archives
+                WHERE (? IS NULL OR end_date >= ?) AND (? IS NULL OR start_date <= ?)
+                ORDER BY start_date DESC
+                """,
+                (start_date, start_date, end_date, end_date),
+            )
+            return [ArchiveService._resolve(r[0]) for r in cursor.fetchall()]
+        except sqlite3.OperationalError:
+            # Databases created before archiving existed have no archives table
+            return []
+
+    @staticmethod
+    def iter_sources(
+        conn: sqlite3.Connection,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        include_live: bool = True,
+    ) -> Iterator[str]:
+        """Yield schema names to query: ``main`` first, then each overlapping archive.
+
+        Archives are ATTACHed read-only one at a time (so the attach limit never
+        matters) and DETACHed as soon as the caller moves on. Callers must fully
+        fetch their results before advancing the iterator.
+        """
+        if include_live:
+            yield "main"
+        for path in ArchiveService.archives_for_range(conn, start_date, end_date):
+            if not os.path.exists(path):
+                continue
+            if conn.in_transaction and getattr(conn, "readonly", False):
+                # ATTACH is not allowed inside a transaction; the live snapshot has
+                # already been read and archives are immutable, so just end it.
+                conn.rollback()
+            conn.execute("ATTACH DATABASE ? AS arch_ro", (f"file:{quote(path)}?mode=ro",))
+            try:
+                yield "arch_ro"
+            finally:
+                conn.execute("DETACH DATABASE arch_ro")
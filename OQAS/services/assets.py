@@ -0,0 +1,266 @@
+"""Fingerprinted, precompressed static assets.
+
+scripts/build_assets.py vendors the third-party CSS/JS/fonts listed in VENDOR
+into static/vendor/ and builds static/dist/: a copy of every static file named
+with a hash of its content (css/theme.3f2a9c1b0d4e.css), CSS url() references
+rewritten to the hashed names, .gz (and .br when the brotli module is
+installed) siblings, and manifest.json mapping logical to hashed paths.
+
+Templates call asset_url("css/theme.css") instead of url_for("static", ...).
+With a manifest it points at the hashed file, which is served with
+Cache-Control: immutable and the smallest encoding the client accepts, so a
+phone checking in downloads Bootstrap once per release and never revalidates.
+Without a build it falls back to the plain static file, or for vendored files
+that were never downloaded, to the CDN they come from.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask, current_app, has_request_context, request, send_from_directory, url_for
+
+from services.compression import choose_encoding
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Logical path under static/ -> upstream URL. Pinned: one version of each everywhere.
+VENDOR: Dict[str, str] = {
+    "vendor/bootstrap/css/bootstrap.min.css": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css",
+    "vendor/bootstrap/js/bootstrap.bundle.min.js": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js",
+    "vendor/fontawesome/css/all.min.css": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css",
+    "vendor/fontawesome/webfonts/fa-brands-400.woff2": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-brands-400.woff2",
+    "vendor/fontawesome/webfonts/fa-brands-400.ttf": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-brands-400.ttf",
+    "vendor/fontawesome/webfonts/fa-regular-400.woff2": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-regular-400.woff2",
+    "vendor/fontawesome/webfonts/fa-regular-400.ttf": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-regular-400.ttf",
+    "vendor/fontawesome/webfonts/fa-solid-900.woff2": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-solid-900.woff2",
+    "vendor/fontawesome/webfonts/fa-solid-900.ttf": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-solid-900.ttf",
+    "vendor/fontawesome/webfonts/fa-v4compatibility.woff2": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-v4compatibility.woff2",
+    "vendor/fontawesome/webfonts/fa-v4compatibility.ttf": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-v4compatibility.ttf",
+}
+
+# Only these are worth compressing; images and woff2 are compressed already
+COMPRESSIBLE = (".css", ".js", ".svg", ".ttf", ".json", ".txt", ".map")
+
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+_manifest: Optional[Dict[str, Dict[str, object]]] = None
+# hashed path -> the encodings built for it
+_hashed: Optional[Dict[str, Tuple[str, ...]]] = None
+_manifest_lock = threading.Lock()
+# (script_root, logical path) -> URL; asset_url() runs several times per page render
+_urls: Dict[Tuple[str, str], str] = {}
+# Bumped whenever the manifest is dropped, so callers caching rendered URLs can tell
+_generation = 0
+
+
+def _load_manifest() -> Dict[str, Dict[str, object]]:
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                try:
+                    with open(os.path.join(STATIC_DIR, DIST_DIR, MANIFEST), "r", encoding="utf-8") as f:
+                        _manifest = json.load(f).get("assets", {})
+                except (OSError, ValueError):
+                    _manifest = {}
+    return _manifest
+
+
+def reload_manifest() -> None:
+    """Forget the cached manifest (after a rebuild, in tests)."""
+    global _manifest, _hashed, _generation
+    with _manifest_lock:
+        _manifest = None
+        _hashed = None
+        _urls.clear()
+        _generation += 1
+
+
+def generation() -> int:
+    """Changes every time reload_manifest() runs."""
+    return _generation
+
+
+def asset_url(filename: str) -> str:
+    """url_for("static", filename=...) that prefers the fingerprinted build."""
+    key = (request.script_root, filename) if has_request_context() else None
+    url = _urls.get(key) if key is not None else None
+    if url is not None:
+        return url
+    entry = _load_manifest().get(filename)
+    if entry is not None:
+        url = url_for("static", filename=f"{DIST_DIR}/{entry['path']}")
+    elif filename in VENDOR and not os.path.isfile(os.path.join(STATIC_DIR, filename)):
+        url = VENDOR[filename]
+    else:
+        url = url_for("static", filename=filename)
+    if key is not None:
+        _urls[key] = url
+    return url
+
+
+def _variants(hashed_path: str) -> Optional[Tuple[str, ...]]:
+    global _hashed
+    if _hashed is None:
+        _hashed = {str(e["path"]): tuple(e.get("encodings", ())) for e in _load_manifest().values()}
+    return _hashed.get(hashed_path)
+
+
+def serve_static(filename: str):
+    """The app's "static" endpoint: hashed builds are immutable and precompressed."""
+    prefix = DIST_DIR + "/"
+    variants = _variants(filename[len(prefix):]) if filename.startswith(prefix) else None
+    if variants is None:
+        return current_app.send_static_file(filename)
+
+    coding = choose_encoding(request.headers.get("Accept-Encoding", ""), [c for c, _ in _ENCODINGS if c in variants])
+    chosen = (coding, dict(_ENCODINGS)[coding]) if coding else None
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if chosen is None:
+        response = send_from_directory(STATIC_DIR, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    else:
+        response = send_from_directory(STATIC_DIR, filename + chosen[1], mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        response.headers["Content-Encoding"] = chosen[0]
+        response.headers.pop("Content-Disposition", None)
+    if variants:
+        response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app: Flask) -> None:
+    """Expose asset_url() to templates and serve the hashed build from the static route."""
+    app.jinja_env.globals["asset_url"] = asset_url
+    if "static" in app.view_functions:
+        app.view_functions["static"] = serve_static
+
+
+# ---------------------- build (scripts/build_assets.py) ----------------------
+def vendor(static_dir: str = STATIC_DIR, force: bool = False) -> List[str]:
+    """Download the VENDOR files that are not in static/ yet; returns what was fetched."""
+    import urllib.request
+
+    fetched: List[str] = []
+    for logical, url in VENDOR.items():
+        target = os.path.join(static_dir, *logical.split("/"))
+        if os.path.isfile(target) and not force:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            data = resp.read()
+        with open(target + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(target + ".tmp", target)
+        fetched.append(logical)
+    return fetched
+
+
+def _hashed_name(logical: str, data: bytes) -> str:
+    stem, ext = posixpath.splitext(logical)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _rewrite_css(logical: str, css: str, assets: Dict[str, Dict[str, Any]]) -> str:
+    """Point url() references at the hashed files (relative, so the CSS can move)."""
+    base = posixpath.dirname(logical)
+    hashed_base = posixpath.dirname(assets[logical]["path"]) if logical in assets else base
+
+    def replace(match: "re.Match[str]") -> str:
+        quote, ref = match.group(1), match.group(2).strip()
+        if ref.startswith(("data:", "http:", "https:", "//", "#", "/")):
+            return match.group(0)
+        # Font Awesome style refs carry ?v= and #iefix suffixes; keep them
+        path, suffix = re.match(r"([^?#]*)(.*)", ref).groups()
+        target = posixpath.normpath(posixpath.join(base, path))
+        entry = assets.get(target)
+        if entry is None:
+            return match.group(0)
+        new_ref = posixpath.relpath(str(entry["path"]), hashed_base or ".") + suffix
+        return f"url({quote}{new_ref}{quote})"
+
+    return _CSS_URL.sub(replace, css)
+
+
+def _compress(path: str, data: bytes) -> List[str]:
+    encodings: List[str] = []
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    if brotli is not None:
+        packed = brotli.compress(data, quality=11)
+        if len(packed) < len(data) * 0.95:
+            with open(path + ".br", "wb") as f:
+                f.write(packed)
+            encodings.append("br")
+    packed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(packed) < len(data) * 0.95:
+        with open(path + ".gz", "wb") as f:
+            f.write(packed)
+        encodings.append("gzip")
+    return encodings
+
+
+def build(static_dir: str = STATIC_DIR, clean: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Fingerprint and precompress everything under static_dir into static_dir/dist.
+
+    Files from earlier builds are kept (pages rendered before a deploy still point
+    at them) unless clean is set. Returns the new manifest's assets.
+    """
+    dist = os.path.join(static_dir, DIST_DIR)
+    sources: List[str] = []
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir) and DIST_DIR in dirs:
+            dirs.remove(DIST_DIR)
+        for name in files:
+            if name.startswith(".") or name.endswith(".tmp"):
+                continue
+            rel = os.path.relpath(os.path.join(root, name), static_dir)
+            sources.append(rel.replace(os.sep, "/"))
+    # CSS last, so the files it references already have their hashed names
+    sources.sort(key=lambda p: (p.endswith(".css"), p))
+
+    assets: Dict[str, Dict[str, Any]] = {}
+    for logical in sources:
+        with open(os.path.join(static_dir, *logical.split("/")), "rb") as f:
+            data = f.read()
+        if logical.endswith(".css"):
+            data = _rewrite_css(logical, data.decode("utf-8"), assets).encode("utf-8")
+        hashed = _hashed_name(logical, data)
+        target = os.path.join(dist, *hashed.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not os.path.isfile(target):
+            with open(target, "wb") as f:
+                f.write(data)
+        encodings = _compress(target, data) if logical.endswith(COMPRESSIBLE) else []
+        assets[logical] = {"path": hashed, "size": len(data), "encodings": encodings}
+
+    manifest_path = os.path.join(dist, MANIFEST)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "assets": assets}, f, indent=1, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    if clean:
+        keep = {MANIFEST}
+        for entry in assets.values():
+            keep.add(entry["path"])
+            keep.update(str(entry["path"]) + suffix for coding, suffix in _ENCODINGS if coding in entry["encodings"])
+        for root, _, files in os.walk(dist):
+            for name in files:
+                rel = os.path.relpath(os.path.join(root, name), dist).replace(os.sep, "/")
+                if rel not in keep:
+                    os.unlink(os.path.join(root, name))
+    if os.path.abspath(static_dir) == os.path.abspath(STATIC_DIR):
+        reload_manifest()
+    return assets
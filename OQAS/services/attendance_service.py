@@ -1,12 +1,19 @@
+import logging
 import sqlite3
 from typing import Optional, Tuple, List, Dict, Any
-from argon2 import PasswordHasher
-from config import DB_PATH
+from db import connect, read_connection
+from services import data_versions, events
+from services.archive_service import ArchiveService
+from services.password_service import INITIAL_PASSWORD_HASH
+from services.tracing import traced
 from datetime import datetime
 
+logger = logging.getLogger("oqas.attendance")
+
 
 class AttendanceService:
     @staticmethod
+    @traced()
     def submit_attendance(session_id: int, student_id: int, student_name: str) -> Tuple[bool, Optional[str]]:
         """Submit attendance record with enhanced validation and error handling.
         
@@ -32,7 +39,7 @@ class AttendanceService:
             if not student_name or len(student_name.strip()) < 2:
                 return False, "Student name must be at least 2 characters long."
             
-            conn = sqlite3.connect(DB_PATH)
+            conn = connect()
             cursor = conn.cursor()
             
             try:
@@ -78,15 +85,13 @@ class AttendanceService:
                     (student_id,),
                 )
                 if cursor.fetchone() is None:
-                    ph = PasswordHasher()
-                    placeholder_password_hash = ph.hash("temp-password")
                     username = str(student_id)
                     cursor.execute(
                         """
                         INSERT INTO users (user_id, username, password_hash, role, full_name)
                         VALUES (?, ?, ?, 'student', ?)
                         """,
-                        (student_id, username, placeholder_password_hash, student_name),
+                        (student_id, username, INITIAL_PASSWORD_HASH, student_name),
                     )
                     conn.commit()
                 
@@ -99,7 +104,16 @@ class AttendanceService:
                     """,
                     (session_id, student_id, current_timestamp),
                 )
+                # The change feed row commits (or rolls back) with the check-in itself
+                events.append_checkin(cursor, cursor.lastrowid, session_id, module_id, week_number,
+                                      student_id, occurred_at=current_timestamp)
+                # Walk-ins join the module roster in the same transaction
+                cursor.execute(
+                    "INSERT OR IGNORE INTO enrollments (module_id, student_id) VALUES (?, ?)",
+                    (module_id, student_id),
+                )
                 conn.commit()
+                data_versions.touch(data_versions.session(session_id), data_versions.module(module_id), data_versions.student(student_id))
                 
                 return True, None
                 
@@ -109,10 +123,12 @@ class AttendanceService:
                     return False, "Student has already checked in for this session."
                 return False, f"Database constraint error: {str(e)}"
             except Exception as e:
+                logger.exception("check-in write failed for session %s", session_id)
                 conn.rollback()
                 return False, f"Database error: {str(e)}"
                 
         except Exception as e:
+            logger.exception("check-in failed for session %s", session_id)
             return False, f"System error: {str(e)}"
         finally:
             try:
@@ -122,6 +138,7 @@ class AttendanceService:
                 pass
 
     @staticmethod
+    @traced()
     def record_attendance(session_id: int, student_id: int, student_name: str) -> Tuple[bool, Optional[str]]:
         """Insert attendance record if not already present.
         
@@ -131,12 +148,12 @@ class AttendanceService:
         Returns (ok, error_message).
         """
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = connect()
             cursor = conn.cursor()
 
             # Ensure session exists and is active
             cursor.execute(
-                "SELECT status FROM sessions WHERE session_id = ?",
+                "SELECT status, module_id, week_number FROM sessions WHERE session_id = ?",
                 (session_id,),
             )
             row = cursor.fetchone()
@@ -151,15 +168,13 @@ class AttendanceService:
                 (student_id,),
             )
             if cursor.fetchone() is None:
-                ph = PasswordHasher()
-                placeholder_password_hash = ph.hash("temp-password")
                 username = str(student_id)
                 cursor.execute(
                     """
                     INSERT INTO users (user_id, username, password_hash, role, full_name)
                     VALUES (?, ?, ?, 'student', ?)
                     """,
-                    (student_id, username, placeholder_password_hash, student_name),
+                    (student_id, username, INITIAL_PASSWORD_HASH, student_name),
                 )
                 conn.commit()
 
@@ -172,11 +187,18 @@ class AttendanceService:
                     """,
                     (session_id, student_id),
                 )
+                events.append_checkin(cursor, cursor.lastrowid, session_id, row[1], row[2], student_id)
+                cursor.execute(
+                    "INSERT OR IGNORE INTO enrollments (module_id, student_id) VALUES (?, ?)",
+                    (row[1], student_id),
+                )
                 conn.commit()
+                data_versions.touch(data_versions.session(session_id), data_versions.module(row[1]), data_versions.student(student_id))
                 return True, None
             except sqlite3.IntegrityError:
                 return False, "Already checked in."
         except Exception as e:
+            logger.exception("recording attendance failed for session %s", session_id)
             return False, str(e)
         finally:
             try:
@@ -191,7 +213,7 @@ class AttendanceService:
         Each row contains: student_id, student_name (from users), checkin_time (ISO string).
         """
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = read_connection()
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -213,6 +235,7 @@ class AttendanceService:
                 })
             return results
         except Exception:
+            logger.exception("listing attendance for session %s failed", session_id)
             return []
         finally:
             try:
@@ -239,7 +262,7 @@ class AttendanceService:
             - grade_contribution: Grade contribution based on grading rules (0-5)
         """
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = read_connection()
             cursor = conn.cursor()
             
             # Get student name
@@ -261,12 +284,24 @@ class AttendanceService:
             
             student_name = student_row[0]
             
-            # Get total sessions for the module
-            cursor.execute(
-                "SELECT COUNT(*) FROM sessions WHERE module_id = ?",
-                (module_id,)
-            )
-            total_sessions = cursor.fetchone()[0]
+            # Sessions and check-ins for the module, live and in archived terms (as reports count them)
+            total_sessions = 0
+            attended_sessions = 0
+            for schema in ArchiveService.iter_sources(conn):
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM {schema}.sessions WHERE module_id = ?",
+                    (module_id,)
+                )
+                total_sessions += cursor.fetchone()[0]
+                cursor.execute(
+                    f"""
+                    SELECT COUNT(*) FROM {schema}.attendance a
+                    JOIN {schema}.sessions s ON a.session_id = s.session_id
+                    WHERE a.student_id = ? AND s.module_id = ?
+                    """,
+                    (student_id, module_id)
+                )
+                attended_sessions += cursor.fetchone()[0]
             
             if total_sessions == 0:
                 return {
@@ -279,17 +314,6 @@ class AttendanceService:
                     "error": "No sessions found for this module"
                 }
             
-            # Get attended sessions for the student in this module
-            cursor.execute(
-                """
-                SELECT COUNT(*) FROM attendance a
-                JOIN sessions s ON a.session_id = s.session_id
-                WHERE a.student_id = ? AND s.module_id = ?
-                """,
-                (student_id, module_id)
-            )
-            attended_sessions = cursor.fetchone()[0]
-            
             # Calculate attendance percentage
             attendance_percentage = (attended_sessions / total_sessions) * 100 if total_sessions > 0 else 0.0
             
@@ -307,6 +331,7 @@ class AttendanceService:
             }
             
         except Exception as e:
+            logger.exception("attendance percentage failed for student %s module %s", student_id, module_id)
             return {
                 "student_id": student_id,
                 "student_name": "Error",
@@ -324,6 +349,7 @@ class AttendanceService:
                 pass
 
     @staticmethod
+    @traced()
     def calculate_module_attendance_summary(module_id: int) -> Dict[str, Any]:
         """
         Calculate attendance summary for all students in a specific module.
@@ -340,7 +366,7 @@ class AttendanceService:
             - module_average: Average attendance percentage for the module
         """
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = read_connection()
             cursor = conn.cursor()
             
             # Get module information
@@ -365,13 +391,59 @@ class AttendanceService:
                 "module_name": module_name
             }
             
-            # Get total sessions for the module
+            # Roster comes from enrollments (primary-key range read), so never-attended
+            # students show 0; it is fetched before any archive is attached
             cursor.execute(
-                "SELECT COUNT(*) FROM sessions WHERE module_id = ?",
+                """
+                SELECT e.student_id, u.full_name
+                FROM enrollments e
+                JOIN users u ON u.user_id = e.student_id
+                WHERE e.module_id = ? AND u.role = 'student'
+                """,
                 (module_id,)
             )
-            total_sessions = cursor.fetchone()[0]
-            
+            attended_by_student: Dict[int, List[Any]] = {sid: [name, 0] for sid, name in cursor.fetchall()}
+
+            # Sessions and per-student check-ins, live and in archived terms, aggregated
+            # once per source like ReportService.get_module_summary
+            total_sessions = 0
+            unrostered: List[int] = []
+            for schema in ArchiveService.iter_sources(conn):
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM {schema}.sessions WHERE module_id = ?",
+                    (module_id,)
+                )
+                total_sessions += cursor.fetchone()[0]
+                cursor.execute(
+                    f"""
+                    SELECT a.student_id, COUNT(*)
+                    FROM {schema}.sessions s
+                    JOIN {schema}.attendance a ON a.session_id = s.session_id
+                    WHERE s.module_id = ?
+                    GROUP BY a.student_id
+                    """,
+                    (module_id,)
+                )
+                for sid, attended in cursor.fetchall():
+                    entry = attended_by_student.get(sid)
+                    if entry is None:
+                        # Attendance predating the enrollments table (e.g. an old archive)
+                        entry = attended_by_student[sid] = [None, 0]
+                        unrostered.append(sid)
+                    entry[1] += attended
+            if unrostered:
+                placeholders = ",".join("?" * len(unrostered))
+                cursor.execute(
+                    f"SELECT user_id, full_name FROM main.users WHERE role = 'student' AND user_id IN ({placeholders})",
+                    tuple(unrostered),
+                )
+                known = dict(cursor.fetchall())
+                for sid in unrostered:
+                    if sid in known:
+                        attended_by_student[sid][0] = known[sid]
+                    else:
+                        del attended_by_student[sid]
+
             if total_sessions == 0:
                 return {
                     "module_id": module_id,
@@ -381,32 +453,29 @@ class AttendanceService:
                     "module_average": 0.0,
                     "error": "No sessions found for this module"
                 }
-            
-            # Get all students enrolled in this module (have attended at least one session)
-            cursor.execute(
-                """
-                SELECT DISTINCT u.user_id, u.full_name
-                FROM users u
-                JOIN attendance a ON u.user_id = a.student_id
-                JOIN sessions s ON a.session_id = s.session_id
-                WHERE s.module_id = ? AND u.role = 'student'
-                ORDER BY u.full_name
-                """,
-                (module_id,)
+            students = sorted(
+                ((sid, name, attended) for sid, (name, attended) in attended_by_student.items()),
+                key=lambda s: s[1] or "",
             )
-            students = cursor.fetchall()
             
             student_attendance = []
             total_percentage = 0.0
-            student_count = 0
             
-            for student_id, student_name in students:
-                # Calculate individual student attendance
-                student_data = AttendanceService.calculate_student_attendance_percentage(student_id, module_id)
-                if student_data.get("error") is None:
-                    student_attendance.append(student_data)
-                    total_percentage += student_data["attendance_percentage"]
-                    student_count += 1
+            for student_id, student_name, attended_sessions in students:
+                attendance_percentage = (attended_sessions / total_sessions) * 100
+                grade_contribution = min(5.0, (attendance_percentage / 100) * 5.0)
+                student_attendance.append({
+                    "student_id": student_id,
+                    "student_name": student_name,
+                    "total_sessions": total_sessions,
+                    "attended_sessions": attended_sessions,
+                    "absent_sessions": total_sessions - attended_sessions,
+                    "attendance_percentage": round(attendance_percentage, 2),
+                    "grade_contribution": round(grade_contribution, 2),
+                    "error": None
+                })
+                total_percentage += round(attendance_percentage, 2)
+            student_count = len(student_attendance)
             
             # Calculate module average
             module_average = round(total_percentage / student_count, 2) if student_count > 0 else 0.0
@@ -421,6 +490,7 @@ class AttendanceService:
             }
             
         except Exception as e:
+            logger.exception("attendance summary failed for module %s", module_id)
             return {
                 "module_id": module_id,
                 "module_info": None,
@@ -437,45 +507,55 @@ class AttendanceService:
                 pass
 
     @staticmethod
-    def get_student_attendance_history(student_id: int, limit: int = 50, session_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    @traced()
+    def get_student_attendance_history(
+        student_id: int,
+        limit: int = 50,
+        session_id: Optional[int] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
         """
         Get detailed attendance history for a specific student.
         
         Args:
             student_id: The student's ID
             limit: Maximum number of records to return (default: 50)
+            session_id: Only return the record for this session
+            start_date: Optional YYYY-MM-DD lower bound on session_date
+            end_date: Optional YYYY-MM-DD upper bound on session_date
             
         Returns:
-            List of attendance records with session details
+            List of attendance records with session details. Archived terms are only
+            read when the live DB does not already fill ``limit`` rows.
         """
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = read_connection()
             cursor = conn.cursor()
-            
+
+            where_clauses = ["a.student_id = ?"]
+            params: List[Any] = [student_id]
             if session_id is not None:
-                cursor.execute(
-                    """
-                    SELECT 
-                        a.session_id,
-                        s.module_id,
-                        m.module_code,
-                        m.module_name,
-                        s.week_number,
-                        s.session_date,
-                        a.checkin_time,
-                        a.status
-                    FROM attendance a
-                    JOIN sessions s ON a.session_id = s.session_id
-                    JOIN modules m ON s.module_id = m.module_id
-                    WHERE a.student_id = ? AND a.session_id = ?
-                    ORDER BY a.checkin_time ASC
-                    LIMIT ?
-                    """,
-                    (student_id, session_id, limit)
-                )
+                where_clauses.append("a.session_id = ?")
+                params.append(session_id)
+                order_sql = "a.checkin_time ASC"
             else:
+                order_sql = "s.session_date DESC, s.week_number DESC"
+            if start_date:
+                where_clauses.append("s.session_date >= ?")
+                params.append(start_date)
+            if end_date:
+                where_clauses.append("s.session_date <= ?")
+                params.append(end_date)
+            where_sql = " AND ".join(where_clauses)
+
+            history = []
+            for schema in ArchiveService.iter_sources(conn, start_date, end_date):
+                remaining = limit - len(history)
+                if remaining <= 0:
+                    break
                 cursor.execute(
-                    """
+                    f"""
                     SELECT 
                         a.session_id,
                         s.module_id,
@@ -485,34 +565,32 @@ class AttendanceService:
                         s.session_date,
                         a.checkin_time,
                         a.status
-                    FROM attendance a
-                    JOIN sessions s ON a.session_id = s.session_id
-                    JOIN modules m ON s.module_id = m.module_id
-                    WHERE a.student_id = ?
-                    ORDER BY s.session_date DESC, s.week_number DESC
+                    FROM {schema}.attendance a
+                    JOIN {schema}.sessions s ON a.session_id = s.session_id
+                    JOIN main.modules m ON s.module_id = m.module_id
+                    WHERE {where_sql}
+                    ORDER BY {order_sql}
                     LIMIT ?
                     """,
-                    (student_id, limit)
+                    (*params, remaining)
                 )
-            
-            rows = cursor.fetchall()
-            history = []
-            
-            for row in rows:
-                history.append({
-                    "session_id": row[0],
-                    "module_id": row[1],
-                    "module_code": row[2],
-                    "module_name": row[3],
-                    "week_number": row[4],
-                    "session_date": row[5],
-                    "checkin_time": row[6],
-                    "status": row[7]
-                })
+                rows = cursor.fetchall()
+                for row in rows:
+                    history.append({
+                        "session_id": row[0],
+                        "module_id": row[1],
+                        "module_code": row[2],
+                        "module_name": row[3],
+                        "week_number": row[4],
+                        "session_date": row[5],
+                        "checkin_time": row[6],
+                        "status": row[7]
+                    })
             
             return history
             
         except Exception as e:
+            logger.exception("attendance history failed for student %s", student_id)
             return []
         finally:
             try:
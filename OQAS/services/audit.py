@@ -0,0 +1,232 @@
+"""Append-only audit trail, written in batches off the request threads.
+
+Services call record() after their own transaction commits: session
+start/reopen/close/expire, lecturer and module edits, backups and restores.
+record() only appends to an in-memory queue; one writer thread per process
+drains it into session_audit with one transaction per batch (up to
+AUDIT_BATCH_SIZE rows, or whatever arrived within AUDIT_FLUSH_SECONDS).
+So auditing never adds a write or a lock wait to the click that caused it.
+
+Each entry carries the time it happened, not the time its batch was written,
+and the signed-in user as the actor unless one is given (scheduled jobs and
+scripts record a NULL actor). If the database is unavailable (restore in
+progress), the batch is retried; entries that still cannot be written, or
+that do not fit in the queue, are logged to oqas.audit instead of being lost
+silently.
+
+query() pages through the trail newest first, by session, actor, action and
+time range, with a keyset cursor over (created_at, audit_id).
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import has_request_context, session
+
+from config import AUDIT_BATCH_SIZE, AUDIT_FLUSH_SECONDS, AUDIT_MAX_PENDING
+from db import connect, read_connection
+from db.pool import PoolPausedError
+
+logger = logging.getLogger("oqas.audit")
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+_RETRIES = 3
+
+Entry = Tuple[Optional[int], Optional[int], str, Optional[str], Optional[str], str]
+
+
+def _now() -> str:
+    # Same format and clock (UTC) as SQLite's CURRENT_TIMESTAMP
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _current_actor() -> Optional[int]:
+    if has_request_context():
+        return (session.get("user") or {}).get("user_id")
+    return None
+
+
+class AuditWriter:
+    """Queue of pending entries and the thread that writes them in batches."""
+
+    def __init__(self, batch_size: int = AUDIT_BATCH_SIZE, flush_seconds: float = AUDIT_FLUSH_SECONDS,
+                 max_pending: int = AUDIT_MAX_PENDING) -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = max(0.0, flush_seconds)
+        self._queue: "queue.Queue[Optional[Entry]]" = queue.Queue(maxsize=max(1, max_pending))
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def append(self, entry: Entry) -> None:
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._worker.start()
+                    # Scripts exit right after their last record(); write it out first
+                    atexit.register(self.flush)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("audit queue full, not stored: %s", entry)
+
+    def _next_batch(self) -> Tuple[List[Entry], bool]:
+        """Block for one entry, then gather more until the batch is full or flush_seconds pass."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _write(self, batch: List[Entry]) -> None:
+        for attempt in range(_RETRIES):
+            try:
+                conn = connect()
+                try:
+                    conn.executemany(
+                        "INSERT INTO session_audit (session_id, actor_user_id, action, target, note, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                    conn.commit()
+                finally:
+                    conn.close()
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except PoolPausedError:
+                time.sleep(0.5 * (attempt + 1))
+            except Exception:
+                logger.exception("writing %d audit entries failed", len(batch))
+                time.sleep(0.5 * (attempt + 1))
+        for entry in batch:
+            logger.error("audit entry not stored: %s", entry)
+
+    def _run(self) -> None:
+        while True:
+            batch, stop = self._next_batch()
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait until queued entries are written (tests, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": self._queue.qsize(), "written": self.written, "batches": self.batches, "dropped": self.dropped}
+
+
+writer = AuditWriter()
+
+
+def record(action: str, session_id: Optional[int] = None, actor_user_id: Optional[int] = None,
+           target: Optional[str] = None, note: Optional[str] = None) -> None:
+    """Queue one audit entry ("session.start", "module.update", "db.backup", ...)."""
+    if actor_user_id is None:
+        actor_user_id = _current_actor()
+    writer.append((session_id, actor_user_id, action, target, note, _now()))
+
+
+def flush(timeout: float = 5.0) -> None:
+    """Write out everything queued so far (tests, shutdown; forked workers skip atexit)."""
+    writer.flush(timeout)
+
+
+def query(
+    session_id: Optional[int] = None,
+    actor_user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+) -> Dict[str, Any]:
+    """One page of audit entries, newest first.
+
+    since/until bound created_at (UTC, "YYYY-MM-DD[ HH:MM:SS]", until exclusive).
+    Pass the returned "next" as ``before`` for the following page; anything else
+    raises ValueError. Filtering by
+    session or actor is a range scan of idx_audit_session / idx_audit_actor, a
+    time window alone of idx_audit_created; each page reads ``limit`` rows.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    where: List[str] = []
+    params: List[Any] = []
+    if session_id is not None:
+        where.append("session_id = ?")
+        params.append(session_id)
+    if actor_user_id is not None:
+        where.append("actor_user_id = ?")
+        params.append(actor_user_id)
+    if action:
+        where.append("action = ?")
+        params.append(action)
+    if since:
+        where.append("created_at >= ?")
+        params.append(since)
+    if until:
+        where.append("created_at < ?")
+        params.append(until)
+    if before:
+        created_at, sep, audit_id = before.rpartition("|")
+        if not (sep and created_at and audit_id.isdigit()):
+            raise ValueError(f"invalid cursor {before!r}: pass the \"next\" of the previous page")
+        where.append("(created_at, audit_id) < (?, ?)")
+        params += [created_at, int(audit_id)]
+    conn = read_connection()
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT audit_id, session_id, actor_user_id, action, target, note, created_at
+            FROM session_audit
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY created_at DESC, audit_id DESC
+            LIMIT ?
+            """,
+            params + [limit + 1],
+        ).fetchall()
+    finally:
+        conn.close()
+    items = [
+        {
+            "audit_id": r[0],
+            "session_id": r[1],
+            "actor_user_id": r[2],
+            "action": r[3],
+            "target": r[4],
+            "note": r[5],
+            "created_at": r[6],
+        }
+        for r in rows[:limit]
+    ]
+    last = items[-1] if len(rows) > limit else None
+    return {"items": items, "next": f"{last['created_at']}|{last['audit_id']}" if last else None}
@@ -1,13 +1,15 @@
-import sqlite3
-from argon2 import PasswordHasher
-from config import DB_PATH
+import logging
+from db import connect
+from services.password_service import PasswordService
+from services.tracing import traced
 
-ph = PasswordHasher()
+logger = logging.getLogger("oqas.auth")
 
 class AuthService:
     @staticmethod
+    @traced()
     def login(username: str, password: str):
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
 
         cursor.execute("SELECT user_id, username, password_hash, role, full_name FROM users WHERE username = ?", (username,))
@@ -19,11 +21,15 @@ class AuthService:
 
         user_id, db_username, password_hash, role, full_name = row
 
-        try:
-            ph.verify(password_hash, password)
-        except Exception:
+        # Runs on the bounded hashing pool; PasswordBusyError propagates to the route
+        ok, new_hash = PasswordService.verify_and_rehash(password_hash, password)
+        if not ok:
             raise ValueError("Invalid credentials")
 
+        # Hash was made with older/weaker parameters: upgrade it transparently
+        if new_hash:
+            AuthService._store_rehash(user_id, password_hash, new_hash)
+
         # Return user as dict
         return {
             "user_id": user_id,
@@ -32,6 +38,23 @@ class AuthService:
             "full_name": full_name
         }
 
+    @staticmethod
+    def _store_rehash(user_id: int, old_hash: str, new_hash: str) -> None:
+        conn = connect()
+        try:
+            # Only replace the hash we verified, so a concurrent password change wins
+            conn.execute(
+                "UPDATE users SET password_hash = ? WHERE user_id = ? AND password_hash = ?",
+                (new_hash, user_id, old_hash),
+            )
+            conn.commit()
+        except Exception:
+            # The login itself succeeded; the upgrade is retried on the next login
+            logger.warning("storing upgraded password hash failed for user %s", user_id, exc_info=True)
+            conn.rollback()
+        finally:
+            conn.close()
+
     @staticmethod
     def is_admin(user: dict) -> bool:
         return user.get("role") == "admin"
@@ -41,20 +64,19 @@ class AuthService:
         return user.get("role") == "lecturer"
 
     @staticmethod
+    @traced()
     def change_password(user_id: int, current_password: str, new_password: str) -> bool:
         """Verify current password and update to a new password for the given user_id."""
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         try:
             cursor.execute("SELECT password_hash FROM users WHERE user_id = ?", (user_id,))
             row = cursor.fetchone()
             if not row:
                 return False
-            try:
-                ph.verify(row[0], current_password)
-            except Exception:
+            if not PasswordService.verify(row[0], current_password):
                 return False
-            new_hash = ph.hash(new_password)
+            new_hash = PasswordService.hash(new_password)
             cursor.execute("UPDATE users SET password_hash = ? WHERE user_id = ?", (new_hash, user_id))
             conn.commit()
             return True
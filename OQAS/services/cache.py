@@ -0,0 +1,191 @@
+"""In-process caches for service results, invalidated through data versions.
+
+@memoize(namespace, tags) caches a static service method per argument tuple,
+in an LRU of at most ``maxsize`` entries that each live at most ``ttl``
+seconds. ``tags`` maps the same arguments to the data-version keys
+(services/data_versions.py) the result was built from: "module:3",
+"session:41", ... Each entry remembers their counters, and a lookup whose
+counters have moved since is a miss. The write paths in AdminService,
+ModuleService, SessionController, AttendanceService and friends already
+touch() those keys after committing, and touch_all() after bulk changes, so
+they are the invalidation messages; nothing has to know which caches exist.
+
+The counters live in the memory-mapped versions file shared by every waitress
+worker and CLI script, so a check-in handled by one process invalidates the
+reports cached in the others, and validating a hit costs a few shared-memory
+reads rather than a query. The counters are read before the method runs, so a
+write committing meanwhile leaves the new entry already stale, never wrong.
+
+Cached values are shared between callers: treat them as read-only.
+CACHE_LIMITS overrides a namespace's size and TTL ("report=64:120"; a size of
+0 turns it off). Hits and misses are counted in /metrics and /admin/cache.
+"""
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import db
+from config import CACHE_LIMITS
+from services import data_versions, metrics
+
+TagsFunc = Callable[..., Iterable[str]]
+
+metrics.describe("oqas_cache_entries", "gauge", "Entries held by each service cache.")
+
+_MISSING = object()
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, float]]:
+    """'report=64:120,qr=0:0' -> {namespace: (maxsize, ttl seconds)}."""
+    limits: Dict[str, Tuple[int, float]] = {}
+    for part in spec.split(","):
+        name, sep, value = part.partition("=")
+        size, colon, ttl = value.partition(":")
+        if not sep or not name.strip() or not colon:
+            continue
+        try:
+            limits[name.strip()] = (int(size), float(ttl))
+        except ValueError:
+            continue
+    return limits
+
+
+class Cache:
+    """One namespace: an LRU of (value, expiry, validator) entries."""
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float) -> None:
+        self.namespace = namespace
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = float(ttl)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    @staticmethod
+    def validator(tags: Iterable[str]) -> tuple:
+        """What the data looked like: the database file and the counters of GLOBAL and tags."""
+        return (db.get_pool().path, data_versions.current(tags)[0])
+
+    def get(self, key: Hashable, tags: Iterable[str] = ()) -> Any:
+        """The cached value, or _MISSING if absent, expired or invalidated."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires, seen = entry
+                if expires > time.monotonic() and seen == self.validator(tags):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.cache_hit(self.namespace)
+                    return value
+                del self._entries[key]
+                self.invalidations += 1
+            self.misses += 1
+        metrics.cache_miss(self.namespace)
+        return _MISSING
+
+    def put(self, key: Hashable, value: Any, seen: tuple) -> None:
+        """Store value as of the validator read before it was computed."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl, seen)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_caches: Dict[str, Cache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str, maxsize: int = 256, ttl: float = 300.0) -> Cache:
+    """The cache for namespace, created with CACHE_LIMITS applied on first use."""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            maxsize, ttl = parse_limits(CACHE_LIMITS).get(namespace, (maxsize, ttl))
+            cache = _caches[namespace] = Cache(namespace, maxsize, ttl)
+        return cache
+
+
+def memoize(namespace: str, tags: Optional[TagsFunc] = None, maxsize: int = 256, ttl: float = 300.0,
+            store_if: Optional[Callable[[Any], bool]] = None):
+    """Cache a static method's results per arguments (see module docstring).
+
+    tags(*args, **kwargs) names the data-version keys the result depends on;
+    without it only touch_all() (and the TTL) invalidates. Results for which
+    store_if(result) is false (error dicts, not-found) are returned uncached.
+    """
+    cache = get_cache(namespace, maxsize, ttl)
+
+    def decorator(f):
+        signature = inspect.signature(f)
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not cache.enabled:
+                return f(*args, **kwargs)
+            # f(3) and f(module_id=3) share an entry
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.items())
+            keys = list(tags(*args, **kwargs)) if tags is not None else []
+            value = cache.get(key, keys)
+            if value is not _MISSING:
+                return value
+            seen = Cache.validator(keys)
+            value = f(*args, **kwargs)
+            if store_if is None or store_if(value):
+                cache.put(key, value, seen)
+            return value
+
+        decorated_function.cache = cache
+        return decorated_function
+    return decorator
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.namespace: cache.stats() for cache in caches}
+
+
+def clear_all() -> None:
+    """Drop every entry in this process (tests; data changes go through data_versions)."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.clear()
+
+
+def _samples():
+    for namespace, s in stats().items():
+        yield "oqas_cache_entries", (("cache", namespace),), s["entries"]
+
+
+metrics.register_collector(_samples)
@@ -0,0 +1,159 @@
+"""gzip/deflate compression of dynamic responses (HTML pages, JSON, CSV, event streams).
+
+Applied as the last after_request step. Cheap checks come first, so the many tiny
+responses (redirects, small JSON acks, 304s) return before any header parsing.
+Buffered bodies are compressed in one go; streamed bodies are wrapped chunk by
+chunk, flushing after every chunk for event streams so each event still arrives
+immediately. Files from send_file / the static route are never touched: hashed
+assets are precompressed at build time (services/assets.py) and images do not shrink.
+"""
+import zlib
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Flask, request
+
+# Streams where the client waits for each chunk as it is produced
+_FLUSH_EACH_CHUNK = ("text/event-stream", "application/x-ndjson")
+
+# content-coding -> zlib wbits (gzip container, or the zlib format "deflate" means in HTTP)
+_WBITS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+DEFAULT_MIMETYPES = frozenset({
+    "text/html",
+    "text/plain",
+    "text/csv",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/x-ndjson",
+    "text/event-stream",
+    "image/svg+xml",
+})
+
+# Set by init_app()
+_min_size = 1024
+_level = 6
+_mimetypes = DEFAULT_MIMETYPES
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}."""
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str, available: Iterable[str]) -> Optional[str]:
+    """The first of `available` (in preference order) the client accepts, if any."""
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    for coding in available:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0.0:
+            return coding
+    return None
+
+
+def etag_variants(etag: str) -> Tuple[str, ...]:
+    """The tags a client may hold for a response whose identity ETag is etag."""
+    return (etag,) + tuple(f"{etag}-{coding}" for coding in _WBITS)
+
+
+class _CompressedStream:
+    """Compressed chunks of a streamed body; closing it closes the source body.
+
+    WSGI servers call close() on the response body even if it was never iterated
+    (client gone before the first chunk). A bare generator would ignore that and
+    leave the source (e.g. events' read connection) open.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], source, coding: str, level: int, flush_each: bool) -> None:
+        self._chunks = chunks
+        self._source = source
+        self._coding = coding
+        self._level = level
+        self._flush_each = flush_each
+
+    def __iter__(self) -> Iterator[bytes]:
+        compressor = zlib.compressobj(self._level, zlib.DEFLATED, _WBITS[self._coding])
+        try:
+            for chunk in self._chunks:
+                if not chunk:
+                    continue
+                out = compressor.compress(chunk)
+                if self._flush_each:
+                    out += compressor.flush(zlib.Z_SYNC_FLUSH)
+                if out:
+                    yield out
+            yield compressor.flush()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._source is not None:
+            source, self._source = self._source, None
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+
+
+def compress_response(response):
+    """after_request hook: compress the body when it is worth it and the client agrees."""
+    if response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    length = response.content_length
+    if length is not None and length < _min_size:
+        return response
+    if request.method == "HEAD" or "Content-Encoding" in response.headers:
+        return response
+    mimetype = response.mimetype or ""
+    if mimetype not in _mimetypes or "no-transform" in response.headers.get("Cache-Control", ""):
+        return response
+    coding = choose_encoding(request.headers.get("Accept-Encoding", ""), ("gzip", "deflate"))
+    response.vary.add("Accept-Encoding")
+    if coding is None:
+        return response
+
+    if response.is_streamed:
+        source = response.response
+        response.response = _CompressedStream(
+            response.iter_encoded(), source, coding, _level, mimetype in _FLUSH_EACH_CHUNK
+        )
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < _min_size:
+            return response
+        compressor = zlib.compressobj(_level, zlib.DEFLATED, _WBITS[coding])
+        response.set_data(compressor.compress(data) + compressor.flush())
+    response.headers["Content-Encoding"] = coding
+    etag, weak = response.get_etag()
+    if etag:
+        # A different byte sequence must not share the identity body's validator
+        response.set_etag(f"{etag}-{coding}", weak=weak)
+    return response
+
+
+def init_app(app: Flask, min_size: int = 1024, level: int = 6, mimetypes: Optional[Iterable[str]] = None) -> None:
+    """Register the compression hook; call before other after_request hooks so it runs last.
+
+    Bodies under min_size bytes go out as they are (below roughly one packet the
+    CPU spent buys no latency). level 0 disables compression entirely.
+    """
+    global _min_size, _level, _mimetypes
+    _min_size = max(0, int(min_size))
+    _level = max(0, min(int(level), 9))
+    _mimetypes = frozenset(mimetypes) if mimetypes else DEFAULT_MIMETYPES
+    if _level:
+        app.after_request(compress_response)
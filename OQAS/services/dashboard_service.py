@@ -0,0 +1,149 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from db import read_connection
+from services.tracing import traced
+
+
+class DashboardService:
+    """Everything a dashboard shows, from one read connection and a fixed number of queries.
+
+    The lecturer view used to be one query for the modules plus one connection and
+    query per module for its active session; here it is two grouped queries
+    whatever the number of modules. The same dict renders the page and is served
+    as JSON (/api/lecturer/dashboard) for the page to refresh itself.
+    """
+
+    @staticmethod
+    def _week_bounds(today: date) -> tuple:
+        monday = today - timedelta(days=today.weekday())
+        return monday.isoformat(), (monday + timedelta(days=6)).isoformat()
+
+    @staticmethod
+    @traced()
+    def lecturer(lecturer_id: int, today: Optional[date] = None) -> Dict[str, Any]:
+        """Modules with today's active session, this week's check-ins and the latest session's turnout."""
+        today = today or date.today()
+        week_start, week_end = DashboardService._week_bounds(today)
+        conn = read_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT m.module_id, m.module_code, m.module_name, m.planned_weeks, m.created_at,
+                       COALESCE(w.sessions, 0), COALESCE(w.checkins, 0), COALESCE(e.enrolled, 0)
+                FROM modules m
+                LEFT JOIN (
+                    SELECT s.module_id, COUNT(DISTINCT s.session_id) AS sessions, COUNT(a.attendance_id) AS checkins
+                    FROM modules mm
+                    JOIN sessions s ON s.module_id = mm.module_id
+                    LEFT JOIN attendance a ON a.session_id = s.session_id
+                    WHERE mm.lecturer_id = ? AND s.session_date BETWEEN ? AND ?
+                    GROUP BY s.module_id
+                ) w ON w.module_id = m.module_id
+                LEFT JOIN (
+                    SELECT e.module_id, COUNT(*) AS enrolled
+                    FROM modules mm
+                    JOIN enrollments e ON e.module_id = mm.module_id
+                    WHERE mm.lecturer_id = ?
+                    GROUP BY e.module_id
+                ) e ON e.module_id = m.module_id
+                WHERE m.lecturer_id = ?
+                ORDER BY m.module_code
+                """,
+                (lecturer_id, week_start, week_end, lecturer_id, lecturer_id),
+            )
+            modules: List[Dict[str, Any]] = []
+            by_id: Dict[int, Dict[str, Any]] = {}
+            for r in cursor.fetchall():
+                module = {
+                    "module_id": r[0],
+                    "module_code": r[1],
+                    "module_name": r[2],
+                    "planned_weeks": r[3],
+                    "created_at": r[4],
+                    "enrolled": r[7],
+                    "this_week": {"sessions": r[5], "checkins": r[6]},
+                    "active_session": None,
+                    "last_session": None,
+                }
+                modules.append(module)
+                by_id[r[0]] = module
+
+            # Per module: the latest session, and today's newest active one (often the same row)
+            cursor.execute(
+                """
+                SELECT r.module_id, r.session_id, r.week_number, r.session_date, r.status, r.created_at,
+                       r.latest, r.is_active AND r.active_rank = 1,
+                       (SELECT COUNT(*) FROM attendance a WHERE a.session_id = r.session_id)
+                FROM (
+                    SELECT s.module_id, s.session_id, s.week_number, s.session_date, s.status, s.created_at,
+                           (s.status = 'active' AND s.session_date = ?) AS is_active,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY s.module_id
+                               ORDER BY s.session_date DESC, s.created_at DESC, s.session_id DESC
+                           ) AS latest,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY s.module_id, (s.status = 'active' AND s.session_date = ?)
+                               ORDER BY s.created_at DESC, s.session_id DESC
+                           ) AS active_rank
+                    FROM modules m
+                    JOIN sessions s ON s.module_id = m.module_id
+                    WHERE m.lecturer_id = ?
+                ) r
+                WHERE r.latest = 1 OR (r.is_active AND r.active_rank = 1)
+                """,
+                (today.isoformat(), today.isoformat(), lecturer_id),
+            )
+            for module_id, session_id, week, session_date, status, created_at, latest, active, present in cursor.fetchall():
+                module = by_id.get(module_id)
+                if module is None:
+                    continue
+                if active:
+                    module["active_session"] = {
+                        "session_id": session_id,
+                        "week_number": week,
+                        "session_date": session_date,
+                        "created_at": created_at,
+                        "present": present,
+                    }
+                if latest == 1:
+                    enrolled = module["enrolled"]
+                    module["last_session"] = {
+                        "session_id": session_id,
+                        "week_number": week,
+                        "session_date": session_date,
+                        "status": status,
+                        "present": present,
+                        "attendance_rate": round(present * 100.0 / enrolled, 1) if enrolled else None,
+                    }
+        finally:
+            conn.close()
+
+        return {
+            "today": today.isoformat(),
+            "week_start": week_start,
+            "week_end": week_end,
+            "modules": modules,
+            "active_count": sum(1 for m in modules if m["active_session"]),
+        }
+
+    @staticmethod
+    @traced()
+    def admin() -> Dict[str, int]:
+        """Head counts for the admin tabs; the rows themselves are searched page by page
+        (AdminService.search_lecturers / search_modules)."""
+        conn = read_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT (SELECT COUNT(*) FROM users WHERE role = 'lecturer'),
+                       (SELECT COUNT(*) FROM modules),
+                       (SELECT COUNT(*) FROM users WHERE role = 'student')
+                """
+            )
+            lecturers, modules, students = cursor.fetchone()
+        finally:
+            conn.close()
+        return {"lecturers": lecturers, "modules": modules, "students": students}
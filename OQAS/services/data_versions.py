@@ -0,0 +1,145 @@
+"""Change counters for modules, sessions and students, shared by every worker process.
+
+Services call touch() after a write commits ("module:3", "session:41",
+"student:905001234"), or touch_all() after bulk changes (restore, archive,
+roster import, module edits). Conditional GETs (services/http_cache.py) read
+the counters to build validators without running any SQL.
+
+The counters live in a small memory-mapped file next to the database
+(oqas.db-versions), so a check-in handled by one worker invalidates pages
+cached through another, and CLI scripts that touch() invalidate them too. Keys
+hash into a fixed number of slots; a collision only causes a needless
+re-render. Slot 0 is the global version that touch_all() bumps. Writes that
+bypass the services (sqlite3 shell, hand-run SQL) are not seen: touch_all()
+by hand, or delete the file, after such edits.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Iterable, Optional, Tuple
+
+import db
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process, the thread lock is enough
+    fcntl = None
+
+logger = logging.getLogger("oqas.versions")
+
+SLOTS = 4096
+# Per slot: change counter, time of the last change (ms since the epoch)
+_SLOT = struct.Struct("<QQ")
+GLOBAL = "*"
+
+
+def module(module_id: int) -> str:
+    return f"module:{int(module_id)}"
+
+
+def session(session_id: int) -> str:
+    return f"session:{int(session_id)}"
+
+
+def student(student_id: int) -> str:
+    return f"student:{int(student_id)}"
+
+
+def _slot(key: str) -> int:
+    if key == GLOBAL:
+        return 0
+    return zlib.crc32(key.encode("utf-8")) % (SLOTS - 1) + 1
+
+
+class VersionStore:
+    """SLOTS (counter, changed_ms) pairs in a shared mapping, or in memory if that fails."""
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+        size = SLOTS * _SLOT.size
+        buf = None
+        if path:
+            try:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                buf = mmap.mmap(fd, size)
+                self._fd = fd
+            except (OSError, ValueError):
+                logger.warning("cannot map %s; data versions are local to this process", path)
+        self._buf = buf if buf is not None else bytearray(size)
+
+    def read(self, key: str) -> Tuple[int, int]:
+        return _SLOT.unpack_from(self._buf, _slot(key) * _SLOT.size)
+
+    def bump(self, keys: Iterable[str]) -> None:
+        now = int(time.time() * 1000)
+        slots = {_slot(k) for k in keys}
+        with self._lock:
+            if self._fd is not None and fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                for slot in slots:
+                    counter, _ = _SLOT.unpack_from(self._buf, slot * _SLOT.size)
+                    _SLOT.pack_into(self._buf, slot * _SLOT.size, counter + 1, now)
+            finally:
+                if self._fd is not None and fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+_store: Optional[VersionStore] = None
+_store_lock = threading.Lock()
+
+
+def store() -> VersionStore:
+    """The store for the database the writer pool currently points at."""
+    global _store
+    path = db.get_pool().path
+    current = _store
+    if current is not None and current.path == path + "-versions":
+        return current
+    with _store_lock:
+        if _store is None or _store.path != path + "-versions":
+            old = _store
+            _store = VersionStore(path + "-versions")
+            if old is not None:
+                old.close()
+        return _store
+
+
+def touch(*keys: str) -> None:
+    """Mark data as changed; call after the write has committed."""
+    try:
+        store().bump(keys)
+    except Exception:
+        logger.exception("failed to bump data versions %s", keys)
+
+
+def touch_all() -> None:
+    """Invalidate every conditional-GET validator (bulk edits, restore)."""
+    touch(GLOBAL)
+
+
+def current(keys: Iterable[str]) -> Tuple[Tuple[int, ...], float]:
+    """(counters of GLOBAL and keys, last change of any of them in seconds)."""
+    s = store()
+    counters = []
+    changed = 0
+    for key in (GLOBAL, *keys):
+        counter, changed_ms = s.read(key)
+        counters.append(counter)
+        changed = max(changed, changed_ms)
+    return tuple(counters), changed / 1000.0
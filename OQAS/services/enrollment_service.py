@@ -0,0 +1,188 @@
+import csv
+import io
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from db import connect, read_connection
+from services import data_versions
+
+
+class EnrollmentService:
+    """Module rosters: which students are expected in which module.
+
+    Summaries and reports are driven from this table, so students who never
+    checked in still show up (with 0%) and the roster is an indexed range read
+    on the ``(module_id, student_id)`` primary key instead of a DISTINCT scan
+    over attendance.
+    """
+
+    @staticmethod
+    def enroll(module_id: int, student_ids: Iterable[int]) -> int:
+        """Add students to a module (existing enrollments are kept). Returns rows added."""
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT OR IGNORE INTO enrollments (module_id, student_id) VALUES (?, ?)",
+                [(module_id, int(sid)) for sid in student_ids],
+            )
+            conn.commit()
+            data_versions.touch(data_versions.module(module_id))
+            return max(cursor.rowcount, 0)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def unenroll(module_id: int, student_ids: Iterable[int]) -> int:
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "DELETE FROM enrollments WHERE module_id = ? AND student_id = ?",
+                [(module_id, int(sid)) for sid in student_ids],
+            )
+            conn.commit()
+            data_versions.touch(data_versions.module(module_id))
+            return max(cursor.rowcount, 0)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def sync_module(module_id: int, student_ids: Iterable[int]) -> Dict[str, int]:
+        """Make a module's roster exactly ``student_ids`` in one transaction."""
+        wanted = {int(sid) for sid in student_ids}
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT student_id FROM enrollments WHERE module_id = ?", (module_id,))
+            current = {r[0] for r in cursor.fetchall()}
+            to_add = sorted(wanted - current)
+            to_remove = sorted(current - wanted)
+            cursor.executemany(
+                "INSERT OR IGNORE INTO enrollments (module_id, student_id) VALUES (?, ?)",
+                [(module_id, sid) for sid in to_add],
+            )
+            cursor.executemany(
+                "DELETE FROM enrollments WHERE module_id = ? AND student_id = ?",
+                [(module_id, sid) for sid in to_remove],
+            )
+            conn.commit()
+            data_versions.touch(data_versions.module(module_id))
+            return {"added": len(to_add), "removed": len(to_remove), "unchanged": len(current & wanted)}
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def load_csv(data: bytes, replace: bool = False) -> Tuple[Dict[str, int], List[str]]:
+        """Bulk load ``module_code,student_id`` rows.
+
+        With ``replace`` each module named in the file is synced to exactly the
+        listed students; otherwise rows are only added. Returns (counts, errors).
+        """
+        reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+        fields = {(f or "").strip().lower(): f for f in (reader.fieldnames or [])}
+        code_col, id_col = fields.get("module_code"), fields.get("student_id")
+        if not code_col or not id_col:
+            return {"added": 0, "removed": 0, "unchanged": 0}, ["CSV must have module_code and student_id columns"]
+
+        conn = read_connection()
+        try:
+            module_ids = {r[0]: r[1] for r in conn.execute("SELECT module_code, module_id FROM modules")}
+        finally:
+            conn.close()
+
+        by_module: Dict[int, List[int]] = {}
+        errors: List[str] = []
+        for line_no, rec in enumerate(reader, start=2):
+            code = (rec.get(code_col) or "").strip()
+            raw_id = (rec.get(id_col) or "").strip()
+            if code not in module_ids:
+                errors.append(f"line {line_no}: unknown module_code {code!r}")
+                continue
+            if not raw_id.isdigit():
+                errors.append(f"line {line_no}: invalid student_id {raw_id!r}")
+                continue
+            by_module.setdefault(module_ids[code], []).append(int(raw_id))
+
+        totals = {"added": 0, "removed": 0, "unchanged": 0}
+        for module_id, sids in by_module.items():
+            if replace:
+                result = EnrollmentService.sync_module(module_id, sids)
+            else:
+                added = EnrollmentService.enroll(module_id, sids)
+                result = {"added": added, "removed": 0, "unchanged": len(set(sids)) - added}
+            for k in totals:
+                totals[k] += result[k]
+        return totals, errors
+
+    @staticmethod
+    def backfill_from_attendance(module_id: Optional[int] = None) -> int:
+        """Enroll everyone who has attended (all modules, or one). Returns rows added."""
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT OR IGNORE INTO enrollments (module_id, student_id)
+                SELECT DISTINCT s.module_id, a.student_id
+                FROM attendance a
+                JOIN sessions s ON s.session_id = a.session_id
+                WHERE ? IS NULL OR s.module_id = ?
+                """,
+                (module_id, module_id),
+            )
+            conn.commit()
+            if module_id is None:
+                data_versions.touch_all()
+            else:
+                data_versions.touch(data_versions.module(module_id))
+            return max(cursor.rowcount, 0)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def list_students(module_id: int) -> List[Dict[str, Any]]:
+        conn = read_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT e.student_id, u.full_name
+                FROM enrollments e
+                JOIN users u ON u.user_id = e.student_id
+                WHERE e.module_id = ?
+                ORDER BY u.full_name
+                """,
+                (module_id,),
+            )
+            return [{"student_id": r[0], "student_name": r[1]} for r in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def list_absentees(session_id: int) -> List[Dict[str, Any]]:
+        """Enrolled students of the session's module with no attendance row for it (anti-join)."""
+        conn = read_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT e.student_id, u.full_name
+                FROM sessions s
+                JOIN enrollments e ON e.module_id = s.module_id
+                JOIN users u ON u.user_id = e.student_id
+                WHERE s.session_id = ?
+                  AND NOT EXISTS (
+                      SELECT 1 FROM attendance a
+                      WHERE a.session_id = s.session_id AND a.student_id = e.student_id
+                  )
+                ORDER BY u.full_name
+                """,
+                (session_id,),
+            )
+            return [{"student_id": r[0], "student_name": r[1]} for r in cursor.fetchall()]
+        finally:
+            conn.close()
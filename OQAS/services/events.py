@@ -0,0 +1,191 @@
+"""Change feed of attendance events for downstream systems (student records).
+
+Every check-in appends one row to attendance_events in the same transaction
+as the attendance row itself, so the feed holds exactly the committed
+check-ins, never one that rolled back. SQLite has a single writer, so
+event_ids become visible in increasing order: a consumer that remembers the
+last event_id it saw and asks for ``after`` it never misses or repeats one.
+Each page is a primary-key range read, the same cost however long the log is.
+
+The log is compacted from the front (compact(), run by the scheduler): events
+recorded more than EVENTS_RETENTION_DAYS ago are deleted. A cursor older than
+what is left is answered with CursorExpired rather than a silently partial
+page; the consumer has to re-sync from a full export.
+"""
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from db import connect, read_connection
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+# NDJSON responses are streamed, so they may ask for much more per request
+MAX_STREAM_SIZE = 100_000
+_FETCH = 500
+_COMPACT_BATCH = 5000
+
+_COLUMNS = """
+    e.event_id, e.kind, e.attendance_id, e.session_id, e.module_id, m.module_code,
+    e.week_number, e.student_id, e.status, e.occurred_at, e.recorded_at
+"""
+_KEYS = ("event_id", "kind", "attendance_id", "session_id", "module_id", "module_code",
+         "week_number", "student_id", "status", "occurred_at", "recorded_at")
+
+
+class CursorExpired(Exception):
+    """The requested cursor is older than the oldest event still kept."""
+
+    def __init__(self, horizon: int) -> None:
+        super().__init__(f"events up to {horizon} have been compacted; re-sync and resume after {horizon}")
+        self.horizon = horizon
+
+
+def parse_cursor(value: Optional[str]) -> Optional[int]:
+    """?after= as a cursor: None when absent, else a non-negative event_id.
+
+    Anything else raises ValueError rather than reading as "from the start",
+    which would replay the whole feed to a consumer with a corrupted cursor.
+    """
+    if value is None:
+        return None
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(f"invalid cursor {value!r}: pass the \"next\" of the previous page")
+    return int(value)
+
+
+def append_checkin(cursor: sqlite3.Cursor, attendance_id: int, session_id: int, module_id: int,
+                   week_number: Optional[int], student_id: int, status: str = "present",
+                   occurred_at: Optional[str] = None) -> None:
+    """Append a check-in event inside the caller's (uncommitted) attendance transaction."""
+    cursor.execute(
+        """
+        INSERT INTO attendance_events (kind, attendance_id, session_id, module_id, week_number, student_id, status, occurred_at)
+        VALUES ('checkin', ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        """,
+        (attendance_id, session_id, module_id, week_number, student_id, status, occurred_at),
+    )
+
+
+def horizon(conn: sqlite3.Connection) -> int:
+    """Highest event_id that has been compacted away (0 if none)."""
+    row = conn.execute("SELECT MIN(event_id) FROM attendance_events").fetchone()
+    if row[0] is not None:
+        return row[0] - 1
+    # Empty log: everything ever appended (if anything) was compacted
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'attendance_events'").fetchone()
+    return row[0] if row else 0
+
+
+def _rows(conn: sqlite3.Connection, after: Optional[int], limit: int) -> Iterator[Dict[str, Any]]:
+    if after is not None:
+        oldest = horizon(conn)
+        if after < oldest:
+            raise CursorExpired(oldest)
+    cursor = conn.execute(
+        f"""
+        SELECT {_COLUMNS}
+        FROM attendance_events e
+        LEFT JOIN modules m ON m.module_id = e.module_id
+        WHERE e.event_id > ?
+        ORDER BY e.event_id
+        LIMIT ?
+        """,
+        (after or 0, limit),
+    )
+    while True:
+        chunk = cursor.fetchmany(_FETCH)
+        if not chunk:
+            return
+        for row in chunk:
+            yield dict(zip(_KEYS, row))
+
+
+def page(after: Optional[int] = None, limit: int = PAGE_SIZE) -> Dict[str, Any]:
+    """Up to ``limit`` events after the cursor; "next" is the cursor for the following call.
+
+    ``after`` omitted starts from the oldest event kept. Raises CursorExpired.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    conn = read_connection()
+    try:
+        events: List[Dict[str, Any]] = list(_rows(conn, after, limit + 1))
+    finally:
+        conn.close()
+    has_more = len(events) > limit
+    events = events[:limit]
+    return {
+        "events": events,
+        "next": events[-1]["event_id"] if events else (after or 0),
+        "has_more": has_more,
+    }
+
+
+class _NdjsonLines:
+    """Iterable of NDJSON lines that hands its read connection back when exhausted or closed.
+
+    WSGI servers call close() on the response body even if it was never iterated
+    (client gone before the first chunk), which a bare generator would ignore.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, rows: Iterator[Dict[str, Any]], first: Optional[Dict[str, Any]]) -> None:
+        self._conn: Optional[sqlite3.Connection] = conn
+        self._rows = rows
+        self._first = first
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            if self._first is not None:
+                yield json.dumps(self._first, separators=(",", ":")) + "\n"
+                for event in self._rows:
+                    yield json.dumps(event, separators=(",", ":")) + "\n"
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            conn.close()
+
+
+def stream(after: Optional[int] = None, limit: int = MAX_STREAM_SIZE) -> Iterable[str]:
+    """The same events as NDJSON lines, read in chunks from one snapshot.
+
+    The cursor check happens before the first line (so CursorExpired is raised
+    to the caller, not mid-stream); resume after the last line's event_id.
+    """
+    limit = max(1, min(int(limit), MAX_STREAM_SIZE))
+    conn = read_connection()
+    try:
+        rows = _rows(conn, after, limit)
+        first = next(rows, None)
+    except BaseException:
+        conn.close()
+        raise
+    return _NdjsonLines(conn, rows, first)
+
+
+def compact(retention_days: float) -> Dict[str, int]:
+    """Delete events recorded more than retention_days ago, oldest first, in short batches.
+
+    Everything up to the newest such event goes, so only a prefix of the log is
+    removed and every cursor at or past the new horizon stays valid. Each batch
+    is its own primary-key range delete, keeping check-ins waiting briefly.
+    """
+    conn = connect()
+    try:
+        oldest = horizon(conn)
+        cutoff = conn.execute(
+            "SELECT MAX(event_id) FROM attendance_events WHERE recorded_at < datetime('now', ?)",
+            (f"-{float(retention_days)} days",),
+        ).fetchone()[0]
+        conn.rollback()
+        removed = 0
+        while cutoff is not None and oldest < cutoff:
+            upto = min(cutoff, oldest + _COMPACT_BATCH)
+            removed += conn.execute("DELETE FROM attendance_events WHERE event_id <= ?", (upto,)).rowcount
+            conn.commit()
+            oldest = upto
+    finally:
+        conn.close()
+    return {"removed": removed, "horizon": oldest}
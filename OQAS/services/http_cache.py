@@ -0,0 +1,106 @@
+"""Conditional GET for pages rendered from versioned data.
+
+@conditional(keys) computes an ETag from the data versions the page depends on
+(services/data_versions.py), the URL, the signed-in user and the deployed
+code, and answers 304 Not Modified before the view runs a single query when
+the browser's copy is still current. Fresh renders carry the same ETag plus
+Last-Modified and "Cache-Control: private, no-cache": the browser keeps the
+page but asks again on every back/refresh navigation, which then costs a
+hash and a few shared-memory reads.
+
+If-None-Match wins over If-Modified-Since, as RFC 9110 says; Last-Modified is
+only second-precise and is there for clients that do not keep ETags.
+"""
+import glob
+import hashlib
+import os
+import time
+from functools import wraps
+from typing import Callable, Iterable, Optional
+
+from flask import Response, make_response, request, session
+from werkzeug.http import http_date, parse_date
+
+from services import data_versions, metrics
+from services.compression import etag_variants
+
+KeysFunc = Callable[..., Optional[Iterable[str]]]
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Files whose change means a cached page may render differently
+_RELEASE_GLOBS = ("app.py", "services/*.py", "templates/*.html", "static/dist/manifest.json")
+_release: Optional[tuple] = None
+
+
+def _release_id() -> tuple:
+    """(digest, newest mtime) of the deployed code and templates; same in every worker."""
+    global _release
+    if _release is None:
+        stamps = []
+        for pattern in _RELEASE_GLOBS:
+            for path in sorted(glob.glob(os.path.join(_PROJECT_ROOT, pattern))):
+                st = os.stat(path)
+                stamps.append((os.path.relpath(path, _PROJECT_ROOT), st.st_mtime_ns, st.st_size))
+        digest = hashlib.blake2b(repr(stamps).encode("utf-8"), digest_size=8).hexdigest()
+        _release = (digest, max((s[1] for s in stamps), default=0) / 1e9)
+    return _release
+
+
+def _not_modified(etag: str, last_modified: float) -> Optional[str]:
+    """The ETag to answer 304 with (the variant the client holds), or None to render."""
+    if request.if_none_match:
+        for tag in etag_variants(etag):
+            if request.if_none_match.contains_weak(tag):
+                return tag
+        return None
+    since = parse_date(request.headers.get("If-Modified-Since"))
+    if since is not None and int(last_modified) <= since.timestamp():
+        return etag
+    return None
+
+
+def _validators(response: Response, etag: str, last_modified: float) -> Response:
+    response.set_etag(etag)
+    # A later change within the same second would carry the same Last-Modified,
+    # so it is only sent once the data has been stable for a full second
+    if time.time() - last_modified >= 1.0:
+        response.headers["Last-Modified"] = http_date(int(last_modified))
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
+
+
+def conditional(keys: KeysFunc):
+    """Answer GETs with 304 while the data versions from keys(**view_args) are unchanged.
+
+    keys returns the data_versions keys the page reads, or None to skip
+    caching for this request (e.g. a missing parameter). Put it under the
+    login decorators so unauthorised users never see a 304.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            # Pending flashes are shown by the next render; a 304 would hold them back
+            if request.method != "GET" or "_flashes" in session:
+                return f(*args, **kwargs)
+            page_keys = keys(**kwargs)
+            if page_keys is None:
+                return f(*args, **kwargs)
+            counters, changed = data_versions.current(page_keys)
+            release, released = _release_id()
+            user = session.get("user") or {}
+            tag_source = f"{release}|{request.endpoint}|{request.full_path}|{user.get('user_id')}|{user.get('role')}|{counters}"
+            etag = hashlib.blake2b(tag_source.encode("utf-8"), digest_size=12).hexdigest()
+            last_modified = max(changed, released)
+            held = _not_modified(etag, last_modified)
+            if held is not None:
+                metrics.cache_hit("conditional_get")
+                return _validators(Response(status=304), held, last_modified)
+            metrics.cache_miss("conditional_get")
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                _validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
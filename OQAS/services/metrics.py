@@ -0,0 +1,278 @@
+import bisect
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, request
+
+from db.pool import add_statement_listener
+
+logger = logging.getLogger("oqas.metrics")
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels, float]
+
+# Latency buckets (seconds) for request histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements-per-request buckets
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+_METADATA: Dict[str, Tuple[str, str]] = {
+    "oqas_http_requests_total": ("counter", "Requests handled, by endpoint, method and status."),
+    "oqas_http_request_duration_seconds": ("histogram", "Request latency by endpoint."),
+    "oqas_http_request_sql_statements": ("histogram", "SQL statements executed per request, by endpoint."),
+    "oqas_sql_statements_total": ("counter", "SQL statements executed on pooled connections, by endpoint."),
+    "oqas_sql_seconds_total": ("counter", "Time spent executing SQL, by endpoint."),
+    "oqas_cache_hits_total": ("counter", "Cache hits, by cache."),
+    "oqas_cache_misses_total": ("counter", "Cache misses, by cache."),
+    "oqas_db_pool_connections": ("gauge", "Pooled SQLite connections by pool and state (in_use, idle)."),
+    "oqas_db_pool_acquired_total": ("counter", "Connections handed out, by pool."),
+    "oqas_db_pool_wait_seconds_total": ("counter", "Time spent waiting to borrow a connection, by pool."),
+    "oqas_admission_active": ("gauge", "Requests currently inside each admission gate."),
+    "oqas_admission_rejected_total": ("counter", "Requests turned away with 503 by each admission gate."),
+    "oqas_password_jobs_total": ("counter", "Argon2 jobs submitted to / rejected by the hashing pool."),
+    "oqas_log_entries_total": ("counter", "Trace and slow-query entries written, dropped (queue full) or failed, by log."),
+}
+
+
+class _Shard:
+    """Counters owned by one thread. Only the owner writes; the exporter copies."""
+
+    __slots__ = ("counters", "histograms", "sql_count", "sql_seconds", "request_started")
+
+    def __init__(self) -> None:
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        # key -> [bucket counts..., +Inf count, sum]
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.request_started = 0.0
+
+
+_local = threading.local()
+_shards: List[_Shard] = []
+# Totals of threads that have exited (scheduler job runs, one-off workers)
+_retired = _Shard()
+_shards_lock = threading.Lock()
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+def _shard() -> _Shard:
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+        _local.shard = shard
+        # Fold it into _retired once the thread is gone, so short-lived threads
+        # do not leave a shard behind each
+        weakref.finalize(threading.current_thread(), _retire, shard)
+    return shard
+
+
+def _retire(shard: _Shard) -> None:
+    with _shards_lock:
+        for key, value in shard.counters.items():
+            _retired.counters[key] = _retired.counters.get(key, 0.0) + value
+        for key, hist in shard.histograms.items():
+            merged = _retired.histograms.get(key)
+            if merged is None:
+                _retired.histograms[key] = list(hist)
+            else:
+                for i, v in enumerate(hist):
+                    merged[i] += v
+        try:
+            _shards.remove(shard)
+        except ValueError:
+            pass
+
+
+def _labels(**labels: Any) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels: Any) -> None:
+    """Add to a counter in this thread's shard (no lock)."""
+    counters = _shard().counters
+    key = (name, _labels(**labels))
+    counters[key] = counters.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels: Any) -> None:
+    """Record one observation in a histogram in this thread's shard (no lock)."""
+    histograms = _shard().histograms
+    key = (name, _labels(**labels))
+    hist = histograms.get(key)
+    if hist is None:
+        hist = histograms[key] = [0.0] * (len(buckets) + 2)
+    hist[bisect.bisect_left(buckets, value)] += 1
+    hist[-1] += value
+
+
+def cache_hit(cache: str) -> None:
+    inc("oqas_cache_hits_total", cache=cache)
+
+
+def cache_miss(cache: str) -> None:
+    inc("oqas_cache_misses_total", cache=cache)
+
+
+def describe(name: str, kind: str, help_text: str) -> None:
+    _METADATA[name] = (kind, help_text)
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]) -> None:
+    """Add a callable yielding (name, labels, value) gauge samples at scrape time."""
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+# ---------------------- SQL accounting ----------------------
+def _on_statement(sql: str, parameters: Any, seconds: float) -> None:
+    shard = _shard()
+    shard.sql_count += 1
+    shard.sql_seconds += seconds
+
+
+def request_sql() -> Tuple[int, float]:
+    """Statements executed and seconds spent in SQL so far by this thread's current request."""
+    shard = _shard()
+    return shard.sql_count, shard.sql_seconds
+
+
+# ---------------------- Flask hooks ----------------------
+def _before_request() -> None:
+    shard = _shard()
+    shard.sql_count = 0
+    shard.sql_seconds = 0.0
+    shard.request_started = time.perf_counter()
+
+
+def _after_request(response):
+    shard = _shard()
+    if not shard.request_started:
+        return response
+    elapsed = time.perf_counter() - shard.request_started
+    shard.request_started = 0.0
+    endpoint = request.endpoint or "unmatched"
+    inc("oqas_http_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    observe("oqas_http_request_duration_seconds", elapsed, endpoint=endpoint)
+    observe("oqas_http_request_sql_statements", shard.sql_count, buckets=SQL_COUNT_BUCKETS, endpoint=endpoint)
+    if shard.sql_count:
+        inc("oqas_sql_statements_total", shard.sql_count, endpoint=endpoint)
+        inc("oqas_sql_seconds_total", shard.sql_seconds, endpoint=endpoint)
+    return response
+
+
+def _builtin_samples() -> Iterable[Sample]:
+    """Pool, admission, hashing and log-writer state, read from the services at scrape time."""
+    from db import pool_stats
+    from db.query_log import query_log
+    from services.admission import admission_stats
+    from services.password_service import PasswordService
+    from services.tracing import tracer
+
+    for pool, stats in pool_stats().items():
+        yield "oqas_db_pool_connections", _labels(pool=pool, state="in_use"), stats["in_use"]
+        yield "oqas_db_pool_connections", _labels(pool=pool, state="idle"), stats["idle"]
+        yield "oqas_db_pool_acquired_total", _labels(pool=pool), stats["acquired"]
+        yield "oqas_db_pool_wait_seconds_total", _labels(pool=pool), stats["wait_seconds_total"]
+        # An idle connection reused instead of opening a new handle is a cache hit
+        yield "oqas_cache_hits_total", _labels(cache=f"db_{pool}_connections"), stats["reused"]
+        yield "oqas_cache_misses_total", _labels(cache=f"db_{pool}_connections"), stats["opened"]
+    for gate, stats in admission_stats().items():
+        yield "oqas_admission_active", _labels(gate=gate), stats["active"]
+        yield "oqas_admission_rejected_total", _labels(gate=gate), stats["rejected"]
+    for outcome, count in PasswordService.stats().items():
+        yield "oqas_password_jobs_total", _labels(outcome=outcome), count
+    for log, stats in (("trace", tracer.stats()), ("slow_query", query_log.stats())):
+        for outcome, count in stats.items():
+            yield "oqas_log_entries_total", _labels(log=log, outcome=outcome), count
+
+
+def init_app(app: Flask) -> None:
+    """Time every request and count its SQL; safe to call for several apps."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    add_statement_listener(_on_statement)
+    register_collector(_builtin_samples)
+
+
+# ---------------------- Export ----------------------
+def _merged() -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], List[float]]]:
+    counters: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    # Held throughout so a shard being retired is counted once, live or folded
+    # in; owners keep writing their shards without taking it
+    with _shards_lock:
+        for shard in [_retired, *_shards]:
+            # dict() copies in one C call, so a concurrent writer cannot break the iteration
+            for key, value in dict(shard.counters).items():
+                counters[key] = counters.get(key, 0.0) + value
+            for key, hist in dict(shard.histograms).items():
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = list(hist)
+                else:
+                    for i, v in enumerate(hist):
+                        merged[i] += v
+    return counters, histograms
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _fmt_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _buckets_for(name: str) -> Tuple[float, ...]:
+    return SQL_COUNT_BUCKETS if name == "oqas_http_request_sql_statements" else LATENCY_BUCKETS
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    counters, histograms = _merged()
+    gauges: Dict[Tuple[str, Labels], float] = {}
+    for collector in list(_collectors):
+        try:
+            for name, labels, value in collector():
+                gauges[(name, labels)] = float(value)
+        except Exception:
+            logger.warning("metrics collector %r failed", collector, exc_info=True)
+            continue
+
+    by_name: Dict[str, List[str]] = {}
+    for (name, labels), value in list(counters.items()) + list(gauges.items()):
+        by_name.setdefault(name, []).append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+    for lines in by_name.values():
+        lines.sort()
+    # Histogram series keep bucket order
+    for (name, labels), hist in sorted(histograms.items()):
+        lines = by_name.setdefault(name, [])
+        cumulative = 0.0
+        for bound, count in zip(_buckets_for(name), hist):
+            cumulative += count
+            lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', _fmt_value(bound)))} {_fmt_value(cumulative)}")
+        cumulative += hist[-2]
+        lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {_fmt_value(cumulative)}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(hist[-1])}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {_fmt_value(cumulative)}")
+
+    out: List[str] = []
+    for name in sorted(by_name):
+        kind, help_text = _METADATA.get(name, ("untyped", ""))
+        if help_text:
+            out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(by_name[name])
+    return "\n".join(out) + "\n"
@@ -1,13 +1,17 @@
-import sqlite3
+import logging
 from datetime import datetime, date
-from config import DB_PATH
+from db import connect
+from services import audit, data_versions
+from services.session_service import SessionController
 from typing import List, Dict, Optional
 
+logger = logging.getLogger("oqas.modules")
+
 class ModuleService:
     @staticmethod
     def get_modules_by_lecturer(lecturer_id: int) -> List[Dict]:
         """Get all modules for a specific lecturer"""
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         try:
@@ -37,7 +41,7 @@ class ModuleService:
     @staticmethod
     def get_active_session(module_id: int) -> Optional[Dict]:
         """Get the currently active session for a module"""
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         try:
@@ -62,66 +66,24 @@ class ModuleService:
             conn.close()
     
     @staticmethod
-    def start_session(module_id: int, week_number: int) -> bool:
-        """Start a new session for a module.
+    def start_session(module_id: int, week_number: int, actor_user_id: Optional[int] = None) -> bool:
+        """Start (or reopen) the module's session for week_number.
 
-        Enforces: at most one session per module per ISO week. Also expires any
-        lingering active session older than 3 hours before attempting to start.
+        Enforces: at most one session per module per ISO week, atomically (see
+        SessionController.open_week). Sessions left active for too long are
+        ended by the scheduler (SessionController.expire_stale).
         """
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         try:
-            # Expire any active session older than 3 hours
-            cursor.execute(
-                """
-                UPDATE sessions
-                SET status = 'ended', ended_at = CURRENT_TIMESTAMP
-                WHERE module_id = ? AND status = 'active'
-                  AND (julianday('now') - julianday(created_at)) > (3.0/24.0)
-                """,
-                (module_id,)
-            )
-
-            # If a session exists for this module and week, reactivate it to continue
-            cursor.execute(
-                """
-                SELECT session_id, status FROM sessions
-                WHERE module_id = ? AND week_number = ?
-                ORDER BY created_at DESC
-                LIMIT 1
-                """,
-                (module_id, week_number)
-            )
-            existing = cursor.fetchone()
-            if existing is not None:
-                session_id, status = existing
-                if status != 'active':
-                    cursor.execute(
-                        "UPDATE sessions SET status='active', ended_at=NULL WHERE session_id=?",
-                        (session_id,)
-                    )
-                    conn.commit()
-                return True
-
-            # Insert new session (allow multiple per day)
-            cursor.execute("""
-                INSERT INTO sessions (module_id, week_number, session_date, status)
-                VALUES (?, ?, ?, 'active')
-            """, (module_id, week_number, date.today().isoformat()))
-            
-            conn.commit()
+            SessionController.open_week(module_id, week_number, actor_user_id=actor_user_id)
             return True
-        except Exception as e:
-            print(f"Error starting session: {e}")
+        except Exception:
+            logger.exception("starting session for module %s failed", module_id)
             return False
-        finally:
-            conn.close()
     
     @staticmethod
-    def close_session(module_id: int) -> bool:
+    def close_session(module_id: int, actor_user_id: Optional[int] = None) -> bool:
         """Close the active session for a module"""
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         try:
@@ -130,15 +92,21 @@ class ModuleService:
                 UPDATE sessions 
                 SET status = 'ended', ended_at = CURRENT_TIMESTAMP
                 WHERE module_id = ? AND session_date = ? AND status = 'active'
+                RETURNING session_id
             """, (module_id, date.today().isoformat()))
+            session_ids = [r[0] for r in cursor.fetchall()]
             
-            if cursor.rowcount > 0:
+            if session_ids:
                 conn.commit()
+                data_versions.touch(data_versions.module(module_id), *map(data_versions.session, session_ids))
+                for session_id in session_ids:
+                    audit.record("session.close", session_id=session_id, actor_user_id=actor_user_id,
+                                 target=f"module:{module_id}")
                 return True
             else:
                 return False  # No active session found
-        except Exception as e:
-            print(f"Error closing session: {e}")
+        except Exception:
+            logger.exception("closing session for module %s failed", module_id)
             return False
         finally:
             conn.close()
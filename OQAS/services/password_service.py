@@ -0,0 +1,162 @@
+import hmac
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import (
+    HASH_WORKERS,
+    HASH_MAX_QUEUE,
+    HASH_QUEUE_TIMEOUT,
+    ARGON2_TIME_COST,
+    ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM,
+)
+from services import tracing
+
+
+_hasher = None
+
+# Initial credential of students created by a roster import or their first check-in
+DEFAULT_STUDENT_PASSWORD = "temp-password"
+# Stored for students provisioned at check-in instead of hashing DEFAULT_STUDENT_PASSWORD
+# on the request path; replaced by a real hash at the first sign-in. Not an argon2 string.
+INITIAL_PASSWORD_HASH = "!initial-password"
+
+
+def get_hasher():
+    """The shared PasswordHasher with host-calibrated parameters (see scripts/calibrate_argon2.py).
+
+    argon2 is imported on first use so importing this module stays cheap.
+    """
+    global _hasher
+    if _hasher is None:
+        from argon2 import PasswordHasher
+        _hasher = PasswordHasher(
+            time_cost=ARGON2_TIME_COST,
+            memory_cost=ARGON2_MEMORY_COST,
+            parallelism=ARGON2_PARALLELISM,
+        )
+    return _hasher
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from services.password_service import ph` working without an eager import
+    if name == "ph":
+        return get_hasher()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _verify_errors() -> Tuple[type, ...]:
+    from argon2.exceptions import InvalidHashError, VerificationError, VerifyMismatchError
+    return (VerifyMismatchError, VerificationError, InvalidHashError)
+
+
+def hash_batch(passwords: List[str]) -> List[str]:
+    """Hash many passwords in the calling process (used as a process-pool task for bulk imports)."""
+    ph = get_hasher()
+    return [ph.hash(p) for p in passwords]
+
+
+class PasswordBusyError(RuntimeError):
+    """Raised when the hashing pool is saturated for longer than HASH_QUEUE_TIMEOUT."""
+
+
+class PasswordService:
+    """Argon2 hashing/verification on a small dedicated worker pool.
+
+    argon2-cffi releases the GIL while hashing, so a thread pool is enough to keep
+    CPU-heavy work off the request threads' CPU budget. At most HASH_WORKERS hashes
+    run at once and HASH_MAX_QUEUE more may wait; callers that cannot get a slot
+    within HASH_QUEUE_TIMEOUT seconds get PasswordBusyError instead of piling up.
+    """
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+    _slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_MAX_QUEUE)
+    _stats_lock = threading.Lock()
+    _stats: Dict[str, int] = {"submitted": 0, "rejected": 0}
+
+    @staticmethod
+    def _get_executor() -> ThreadPoolExecutor:
+        if PasswordService._executor is None:
+            with PasswordService._executor_lock:
+                if PasswordService._executor is None:
+                    PasswordService._executor = ThreadPoolExecutor(
+                        max_workers=HASH_WORKERS, thread_name_prefix="argon2"
+                    )
+        return PasswordService._executor
+
+    @staticmethod
+    def _run(fn: Callable[..., Any], *args: Any) -> Any:
+        with tracing.span("argon2." + fn.__name__.lstrip("_")) as span:
+            if not PasswordService._slots.acquire(timeout=HASH_QUEUE_TIMEOUT):
+                with PasswordService._stats_lock:
+                    PasswordService._stats["rejected"] += 1
+                raise PasswordBusyError("Too many sign-ins right now. Please try again in a moment.")
+            submitted = time.perf_counter()
+            started: List[float] = []
+            job = fn
+            if span is not None:
+                # Split the span into time queued for a hashing thread and time hashing
+                def job(*job_args: Any) -> Any:
+                    started.append(time.perf_counter())
+                    return fn(*job_args)
+            try:
+                future: Future = PasswordService._get_executor().submit(job, *args)
+            except Exception:
+                PasswordService._slots.release()
+                raise
+            future.add_done_callback(lambda _: PasswordService._slots.release())
+            with PasswordService._stats_lock:
+                PasswordService._stats["submitted"] += 1
+            result = future.result()
+            if span is not None and started:
+                span.attrs = {"queued_ms": round((started[0] - submitted) * 1000.0, 3)}
+            return result
+
+    @staticmethod
+    def hash(password: str) -> str:
+        return PasswordService._run(get_hasher().hash, password)
+
+    @staticmethod
+    def verify(password_hash: str, password: str) -> bool:
+        """True if password matches password_hash; False on mismatch or a malformed hash."""
+        if password_hash == INITIAL_PASSWORD_HASH:
+            return hmac.compare_digest(password.encode(), DEFAULT_STUDENT_PASSWORD.encode())
+
+        def _verify() -> bool:
+            try:
+                return get_hasher().verify(password_hash, password)
+            except _verify_errors():
+                return False
+        return PasswordService._run(_verify)
+
+    @staticmethod
+    def verify_and_rehash(password_hash: str, password: str) -> Tuple[bool, Optional[str]]:
+        """Verify, and if the stored hash uses outdated parameters return a fresh hash.
+
+        Returns (ok, new_hash_or_None). Both steps run in a single pool job.
+        INITIAL_PASSWORD_HASH is checked without the pool and, on a match,
+        always comes back with a real hash to store.
+        """
+        if password_hash == INITIAL_PASSWORD_HASH:
+            if not PasswordService.verify(password_hash, password):
+                return False, None
+            return True, PasswordService.hash(password)
+
+        def _verify_and_rehash() -> Tuple[bool, Optional[str]]:
+            ph = get_hasher()
+            try:
+                ph.verify(password_hash, password)
+            except _verify_errors():
+                return False, None
+            if ph.check_needs_rehash(password_hash):
+                return True, ph.hash(password)
+            return True, None
+        return PasswordService._run(_verify_and_rehash)
+
+    @staticmethod
+    def stats() -> Dict[str, int]:
+        with PasswordService._stats_lock:
+            return dict(PasswordService._stats)
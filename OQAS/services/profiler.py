@@ -0,0 +1,248 @@
+"""On-demand diagnostics for a live process: stack sampling and tracemalloc.
+
+SamplingProfiler wakes every interval on its own thread, reads every thread's
+current frame with sys._current_frames() and counts the stacks. Nothing is
+installed in the request threads, so the cost is the sampler's own CPU time
+(roughly 50-100 us per sample with a few dozen threads) and it disappears when
+the run ends. Results are collapsed stacks ("thread;outer;...;inner count"),
+the input format of flamegraph.pl and speedscope.
+
+MemoryTracker wraps tracemalloc: start tracing, take numbered snapshots and
+compare any two to see which lines keep allocating (a cache that only grows
+shows up as a steadily positive size_diff).
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THREAD_SUFFIX = re.compile(r"[-_ ]?\d+( \(.*\))?$")
+
+# Innermost Python frames of threads that are blocked waiting, not working
+_IDLE_LEAVES = frozenset({
+    ("threading.py", "Condition.wait"),
+    ("threading.py", "Event.wait"),
+    ("threading.py", "Thread._wait_for_tstate_lock"),
+    ("queue.py", "Queue.get"),
+    ("selectors.py", "_PollLikeSelector.select"),
+    ("selectors.py", "EpollSelector.select"),
+    ("wasyncore.py", "poll"),
+    ("wasyncore.py", "poll2"),
+})
+
+MAX_PROFILE_SECONDS = 300.0
+MAX_SNAPSHOTS = 5
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(_PROJECT_ROOT):
+        return os.path.relpath(filename, _PROJECT_ROOT)
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return os.path.basename(filename)
+
+
+class SamplingProfiler:
+    """Samples all thread stacks on a timer thread for a bounded time."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._labels: Dict[Any, str] = {}
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.seconds = 0.0
+        self.interval = 0.01
+        self.include_idle = False
+        self.overhead = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval_ms: float = 10.0, include_idle: bool = False) -> Dict[str, Any]:
+        """Sample for `seconds` (capped at MAX_PROFILE_SECONDS); previous results are discarded."""
+        with self._lock:
+            if self.running:
+                raise ProfilerBusyError("A profile is already running")
+            self.seconds = max(0.1, min(float(seconds), MAX_PROFILE_SECONDS))
+            self.interval = max(1.0, float(interval_ms)) / 1000.0
+            self.include_idle = include_idle
+            self.stacks = Counter()
+            self.samples = self.idle_samples = 0
+            self.overhead = 0.0
+            self.started_at = time.time()
+            self.finished_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5.0)
+        return self.status()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{_short_path(code.co_filename)}:{code.co_qualname}"
+            self._labels[code] = label
+        return label
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                began = time.perf_counter()
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    leaf = frame.f_code
+                    if not self.include_idle and (os.path.basename(leaf.co_filename), leaf.co_qualname) in _IDLE_LEAVES:
+                        self.idle_samples += 1
+                        continue
+                    stack: List[str] = []
+                    while frame is not None:
+                        stack.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    thread = _THREAD_SUFFIX.sub("", names.get(ident, "thread")) or "thread"
+                    stack.append(thread)
+                    stack.reverse()
+                    self.stacks[";".join(stack)] += 1
+                    self.samples += 1
+                spent = time.perf_counter() - began
+                self.overhead += spent
+                self._stop.wait(max(0.0, self.interval - spent))
+        finally:
+            self.finished_at = time.time()
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            "running": self.running,
+            "seconds": self.seconds,
+            "interval_ms": round(self.interval * 1000.0, 3),
+            "elapsed": round(elapsed, 3),
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "distinct_stacks": len(self.stacks),
+            "sampler_cpu_share": round(self.overhead / elapsed, 4) if elapsed else 0.0,
+        }
+
+    def collapsed(self) -> str:
+        """Folded stacks, one "frame;frame;... count" line each, heaviest first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class MemoryTracker:
+    """tracemalloc snapshots kept in memory (the last MAX_SNAPSHOTS) for top/diff views."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshots: Dict[int, Any] = {}
+        self._taken: Dict[int, float] = {}
+        self._next_id = 1
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, min(int(frames), 50)))
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        import tracemalloc
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+            self._taken.clear()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        with self._lock:
+            snapshots = [{"id": i, "taken_at": self._taken[i]} for i in sorted(self._snapshots)]
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "traceback_limit": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "overhead_bytes": tracemalloc.get_tracemalloc_memory() if tracemalloc.is_tracing() else 0,
+            "snapshots": snapshots,
+        }
+
+    def snapshot(self) -> int:
+        """Take a snapshot (tracing must be started) and return its id."""
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing; start it first")
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        with self._lock:
+            snap_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snap_id] = snap
+            self._taken[snap_id] = time.time()
+            for old in sorted(self._snapshots)[:-MAX_SNAPSHOTS]:
+                del self._snapshots[old]
+                del self._taken[old]
+        return snap_id
+
+    def _get(self, snap_id: int):
+        with self._lock:
+            snap = self._snapshots.get(snap_id)
+        if snap is None:
+            raise KeyError(f"No snapshot {snap_id}")
+        return snap
+
+    @staticmethod
+    def _frames(traceback) -> List[str]:
+        return [f"{_short_path(f.filename)}:{f.lineno}" for f in traceback]
+
+    def top(self, snap_id: int, key: str = "lineno", limit: int = 20) -> List[Dict[str, Any]]:
+        """Largest allocation sites in one snapshot, grouped by lineno, filename or traceback."""
+        stats = self._get(snap_id).statistics(key if key in ("lineno", "filename", "traceback") else "lineno")
+        return [
+            {"size": s.size, "count": s.count, "frames": self._frames(s.traceback)}
+            for s in stats[:limit]
+        ]
+
+    def diff(self, old_id: int, new_id: int, key: str = "lineno", limit: int = 20) -> List[Dict[str, Any]]:
+        """Allocation sites that grew (or shrank) the most between two snapshots."""
+        stats = self._get(new_id).compare_to(self._get(old_id), key if key in ("lineno", "filename", "traceback") else "lineno")
+        return [
+            {
+                "size_diff": s.size_diff,
+                "count_diff": s.count_diff,
+                "size": s.size,
+                "count": s.count,
+                "frames": self._frames(s.traceback),
+            }
+            for s in stats[:limit]
+        ]
+
+
+profiler = SamplingProfiler()
+memory = MemoryTracker()
@@ -1,21 +1,31 @@
-import qrcode, io, base64, jwt
+import io, base64
 from typing import Dict, Tuple, Optional
-from config import SECRET_KEY, PORT, LAN_HOST
+from config import SECRET_KEY, PORT, get_lan_host
+from services.cache import memoize
+from services.tracing import traced
+
+# jwt and qrcode (which pulls in PIL) are imported on first use to keep startup fast
 
 class QRService:
     @staticmethod
+    @traced()
     def generate_token(payload: Dict) -> str:
+        import jwt
         return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
 
     @staticmethod
     def verify_token(token: str) -> Optional[Dict]:
+        import jwt
         try:
             return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])  # type: ignore[no-any-return]
         except Exception:
             return None
 
     @staticmethod
+    @memoize("qr", maxsize=128, ttl=3600)  # a resumed session's token, and so its image, is unchanged
+    @traced()
     def make_qr_png_b64(url: str) -> str:
+        import qrcode
         img = qrcode.make(url)
         buffer = io.BytesIO()
         img.save(buffer, format="PNG")
@@ -23,10 +33,11 @@ class QRService:
 
     @staticmethod
     def build_checkin_url(token: str) -> str:
-        host = LAN_HOST or "localhost"
+        host = get_lan_host() or "localhost"
         return f"http://{host}:{PORT}/checkin?tk={token}"
 
     @staticmethod
+    @traced()
     def build_for_session(module_id: int, run_id: int, session_id: int, date: str) -> Tuple[str, str]:
         payload = {"module_id": module_id, "run_id": run_id, "session_id": session_id, "date": date}
         token = QRService.generate_token(payload)
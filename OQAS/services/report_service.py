@@ -1,10 +1,16 @@
-import sqlite3
+import logging
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
-from config import DB_PATH
+from db import read_connection
 import io
 import csv
+from services.archive_service import ArchiveService
+from services import data_versions
 from services.attendance_service import AttendanceService
+from services.cache import memoize
+from services.tracing import traced
+
+logger = logging.getLogger("oqas.reports")
 
 
 class ReportService:
@@ -20,6 +26,14 @@ class ReportService:
             return None
 
     @staticmethod
+    @memoize(
+        "report",
+        lambda module_id, *args, **kwargs: [data_versions.module(module_id)],
+        maxsize=128,
+        ttl=600,
+        store_if=lambda report: not report.get("error"),
+    )
+    @traced()
     def get_module_summary(
         module_id: int,
         start_date: Optional[str] = None,
@@ -34,12 +48,14 @@ class ReportService:
           - filters: {start_date, end_date, student_id}
           - total_sessions: int (within date window)
           - students: List[{student_id, student_name, attended_sessions, percentage}]
+
+        Archived terms whose dates overlap the window are included transparently.
         """
         try:
             norm_start = ReportService._parse_date(start_date)
             norm_end = ReportService._parse_date(end_date)
 
-            conn = sqlite3.connect(DB_PATH)
+            conn = read_connection()
             cursor = conn.cursor()
 
             # Module info
@@ -64,23 +80,79 @@ class ReportService:
             }
 
             # Build sessions filter
-            where_clauses: List[str] = ["module_id = ?"]
+            where_clauses: List[str] = ["s.module_id = ?"]
             params: List[Any] = [module_id]
             if norm_start:
-                where_clauses.append("session_date >= ?")
+                where_clauses.append("s.session_date >= ?")
                 params.append(norm_start)
             if norm_end:
-                where_clauses.append("session_date <= ?")
+                where_clauses.append("s.session_date <= ?")
                 params.append(norm_end)
 
             where_sql = " AND ".join(where_clauses)
 
-            # Total sessions in window
-            cursor.execute(
-                f"SELECT COUNT(*) FROM sessions WHERE {where_sql}",
-                tuple(params),
-            )
-            total_sessions = int(cursor.fetchone()[0] or 0)
+            att_where = where_sql
+            att_params: List[Any] = list(params)
+            if student_id:
+                att_where += " AND a.student_id = ?"
+                att_params.append(int(student_id))
+
+            # The module roster drives the report, so enrolled students who never
+            # attended are listed with 0 sessions
+            roster_sql = """
+                SELECT e.student_id, u.full_name
+                FROM enrollments e
+                JOIN users u ON u.user_id = e.student_id
+                WHERE e.module_id = ?
+            """
+            roster_params: List[Any] = [module_id]
+            if student_id:
+                roster_sql += " AND e.student_id = ?"
+                roster_params.append(int(student_id))
+            cursor.execute(roster_sql, tuple(roster_params))
+            attended_by_student: Dict[int, List[Any]] = {
+                sid: [full_name, 0] for sid, full_name in cursor.fetchall()
+            }
+
+            # Live sessions first, then any archived term the date window reaches into
+            total_sessions = 0
+            for schema in ArchiveService.iter_sources(conn, norm_start, norm_end):
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM {schema}.sessions s WHERE {where_sql}",
+                    tuple(params),
+                )
+                total_sessions += int(cursor.fetchone()[0] or 0)
+
+                cursor.execute(
+                    f"""
+                    SELECT a.student_id, COUNT(*) as attended
+                    FROM {schema}.sessions s
+                    JOIN {schema}.attendance a ON a.session_id = s.session_id
+                    WHERE {att_where}
+                    GROUP BY a.student_id
+                    """,
+                    tuple(att_params),
+                )
+                unrostered: List[int] = []
+                for sid, attended in cursor.fetchall():
+                    entry = attended_by_student.get(sid)
+                    if entry is None:
+                        # Attendance predating the enrollments table (e.g. an old archive)
+                        entry = attended_by_student[sid] = [None, 0]
+                        unrostered.append(sid)
+                    entry[1] += int(attended)
+                if unrostered:
+                    placeholders = ",".join("?" * len(unrostered))
+                    cursor.execute(
+                        f"SELECT user_id, full_name FROM main.users WHERE user_id IN ({placeholders})",
+                        tuple(unrostered),
+                    )
+                    known = dict(cursor.fetchall())
+                    for sid in unrostered:
+                        if sid in known:
+                            attended_by_student[sid][0] = known[sid]
+                        else:
+                            del attended_by_student[sid]
 
             if total_sessions == 0:
                 return {
@@ -90,47 +162,8 @@ class ReportService:
                     "students": [],
                 }
 
-            # Fetch attendance per student within sessions window
-            # First, get relevant session_ids
-            cursor.execute(
-                f"SELECT session_id FROM sessions WHERE {where_sql}",
-                tuple(params),
-            )
-            session_ids = [row[0] for row in cursor.fetchall()]
-            if not session_ids:
-                return {
-                    "module": module_info,
-                    "filters": {"start_date": norm_start, "end_date": norm_end, "student_id": student_id},
-                    "total_sessions": total_sessions,
-                    "students": [],
-                }
-
-            # Build attendance query
-            att_where = [
-                f"a.session_id IN ({','.join(['?'] * len(session_ids))})",
-            ]
-            att_params: List[Any] = list(session_ids)
-            if student_id:
-                att_where.append("a.student_id = ?")
-                att_params.append(int(student_id))
-
-            att_sql = " AND ".join(att_where)
-
-            cursor.execute(
-                f"""
-                SELECT a.student_id, u.full_name, COUNT(*) as attended
-                FROM attendance a
-                JOIN users u ON u.user_id = a.student_id
-                WHERE {att_sql}
-                GROUP BY a.student_id, u.full_name
-                ORDER BY u.full_name
-                """,
-                tuple(att_params),
-            )
-            rows = cursor.fetchall()
-
             students: List[Dict[str, Any]] = []
-            for sid, full_name, attended in rows:
+            for sid, (full_name, attended) in sorted(attended_by_student.items(), key=lambda kv: kv[1][0] or ""):
                 percentage = round((attended / total_sessions) * 100.0, 2) if total_sessions else 0.0
                 students.append(
                     {
@@ -148,6 +181,7 @@ class ReportService:
                 "students": students,
             }
         except Exception as e:
+            logger.exception("module summary failed for module %s", module_id)
             return {
                 "error": f"Report error: {str(e)}",
                 "module": None,
@@ -162,6 +196,7 @@ class ReportService:
                 pass
 
     @staticmethod
+    @traced()
     def export_csv(
         module_id: int,
         start_date: Optional[str] = None,
@@ -237,6 +272,7 @@ class ReportService:
         return filename, data
 
     @staticmethod
+    @traced()
     def export_pdf(
         module_id: int,
         start_date: Optional[str] = None,
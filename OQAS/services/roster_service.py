@@ -0,0 +1,238 @@
+import csv
+import io
+import json
+import logging
+import threading
+import uuid
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, TextIO, Tuple
+
+from config import ROSTER_CHUNK_SIZE, ROSTER_HASH_PROCESSES, ROSTER_JOB_TTL_HOURS
+from db import connect, read_connection
+from services import data_versions
+from services.password_service import DEFAULT_STUDENT_PASSWORD, hash_batch
+
+logger = logging.getLogger("oqas.roster")
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+ProgressCallback = Callable[[int, int], None]
+
+# Skipped-row messages kept with a job's result; the rest are only counted
+MAX_JOB_ERRORS = 50
+
+
+class RosterService:
+    """Bulk student roster import so accounts exist before the first check-in.
+
+    CSV columns: ``student_id`` and ``full_name`` (or ``name``), optional ``password``.
+    Initial passwords are hashed across a process pool, then each chunk is written
+    in one short transaction with executemany. Re-importing the same file is an
+    idempotent upsert: existing students keep their password, names are refreshed.
+    """
+
+    @staticmethod
+    def parse_csv(text: TextIO) -> Tuple[List[Tuple[int, str, str]], List[str]]:
+        """Return (rows, errors); rows are (student_id, full_name, initial_password)."""
+        reader = csv.DictReader(text)
+        fields = {(f or "").strip().lower(): f for f in (reader.fieldnames or [])}
+        id_col = fields.get("student_id")
+        name_col = fields.get("full_name") or fields.get("name")
+        pw_col = fields.get("password")
+        if not id_col or not name_col:
+            return [], ["CSV must have student_id and full_name columns"]
+
+        rows: List[Tuple[int, str, str]] = []
+        errors: List[str] = []
+        seen = set()
+        for line_no, rec in enumerate(reader, start=2):
+            raw_id = (rec.get(id_col) or "").strip()
+            name = (rec.get(name_col) or "").strip()
+            if not (raw_id.isdigit() and len(raw_id) == 9 and raw_id.startswith("90500")):
+                errors.append(f"line {line_no}: invalid student_id {raw_id!r}")
+                continue
+            if len(name) < 2:
+                errors.append(f"line {line_no}: name is too short")
+                continue
+            student_id = int(raw_id)
+            if student_id in seen:
+                continue
+            seen.add(student_id)
+            password = ((rec.get(pw_col) or "").strip() if pw_col else "") or DEFAULT_STUDENT_PASSWORD
+            rows.append((student_id, name, password))
+        return rows, errors
+
+    @staticmethod
+    def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+
+    @staticmethod
+    def _hash_passwords(passwords: List[str], executor: Optional["ProcessPoolExecutor"]) -> List[str]:
+        if executor is None or len(passwords) < 2:
+            return hash_batch(passwords)
+        # Small batches per task keep all processes busy without per-hash IPC overhead
+        batch = max(1, min(64, len(passwords) // (ROSTER_HASH_PROCESSES * 4) or 1))
+        hashed: List[str] = []
+        for part in executor.map(hash_batch, list(RosterService._chunks(passwords, batch))):
+            hashed.extend(part)
+        return hashed
+
+    @staticmethod
+    def import_rows(
+        rows: List[Tuple[int, str, str]],
+        progress: Optional[ProgressCallback] = None,
+        processes: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Upsert students in chunked transactions. Returns counts inserted/updated/unchanged."""
+        processes = ROSTER_HASH_PROCESSES if processes is None else processes
+        chunk_size = chunk_size or ROSTER_CHUNK_SIZE
+        stats = {"total": len(rows), "inserted": 0, "updated": 0, "unchanged": 0}
+        done = 0
+        executor: Optional["ProcessPoolExecutor"] = None
+        if processes > 1 and len(rows) > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn: forking a multi-threaded server process is unsafe
+            executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            for chunk in RosterService._chunks(rows, chunk_size):
+                ids = [r[0] for r in chunk]
+                conn = connect()
+                try:
+                    cursor = conn.cursor()
+                    placeholders = ",".join("?" * len(ids))
+                    cursor.execute(
+                        f"SELECT user_id, full_name FROM users WHERE user_id IN ({placeholders})",
+                        ids,
+                    )
+                    existing = {r[0]: r[1] for r in cursor.fetchall()}
+                finally:
+                    conn.close()
+
+                new_rows = [r for r in chunk if r[0] not in existing]
+                renamed = [(r[1], r[0]) for r in chunk if r[0] in existing and existing[r[0]] != r[1]]
+                # Hash outside the write transaction so the DB lock is held only for the inserts
+                hashes = RosterService._hash_passwords([r[2] for r in new_rows], executor)
+
+                conn = connect()
+                try:
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    cursor.executemany(
+                        """
+                        INSERT INTO users (user_id, username, password_hash, role, full_name)
+                        VALUES (?, ?, ?, 'student', ?)
+                        ON CONFLICT DO NOTHING
+                        """,
+                        [(sid, str(sid), h, name) for (sid, name, _), h in zip(new_rows, hashes)],
+                    )
+                    inserted = cursor.rowcount
+                    cursor.executemany(
+                        "UPDATE users SET full_name = ? WHERE user_id = ? AND role = 'student'",
+                        renamed,
+                    )
+                    updated = cursor.rowcount if renamed else 0
+                    conn.commit()
+                    if renamed:
+                        # Student names appear on lecturer pages of every module
+                        data_versions.touch_all()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()
+
+                stats["inserted"] += max(inserted, 0)
+                stats["updated"] += max(updated, 0)
+                done += len(chunk)
+                if progress:
+                    progress(done, len(rows))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        stats["unchanged"] = stats["total"] - stats["inserted"] - stats["updated"]
+        return stats
+
+    @staticmethod
+    def import_csv(data: bytes, progress: Optional[ProgressCallback] = None, processes: Optional[int] = None) -> Dict[str, Any]:
+        rows, errors = RosterService.parse_csv(io.StringIO(data.decode("utf-8-sig")))
+        stats: Dict[str, Any] = RosterService.import_rows(rows, progress=progress, processes=processes) if rows else {
+            "total": 0, "inserted": 0, "updated": 0, "unchanged": 0,
+        }
+        stats["errors"] = errors
+        return stats
+
+    # ---------------------- Background jobs (admin upload) ----------------------
+    @staticmethod
+    def start_import_job(data: bytes) -> str:
+        """Run import_csv on a background thread; poll get_job() for progress.
+
+        Job state lives in the import_jobs table rather than in this process, so
+        the status poll may land on any serve.py worker. Jobs not updated for
+        ROSTER_JOB_TTL_HOURS (finished, or orphaned by a worker that died) are
+        pruned whenever a new one starts.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        conn = connect()
+        try:
+            conn.execute(
+                "DELETE FROM import_jobs WHERE updated_at < datetime('now', ?)",
+                (f"-{float(ROSTER_JOB_TTL_HOURS)} hours",),
+            )
+            conn.execute("INSERT INTO import_jobs (job_id) VALUES (?)", (job_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        def _progress(done: int, total: int) -> None:
+            RosterService._update_job(job_id, done=done, total=total)
+
+        def _run() -> None:
+            try:
+                result = RosterService.import_csv(data, progress=_progress)
+                errors = result["errors"]
+                result["skipped"] = len(errors)
+                result["errors"] = errors[:MAX_JOB_ERRORS]
+                RosterService._update_job(job_id, status="finished", result=json.dumps(result))
+            except Exception as e:
+                logger.exception("roster import job %s failed", job_id)
+                RosterService._update_job(job_id, status="failed", error=str(e))
+
+        threading.Thread(target=_run, name=f"roster-import-{job_id}", daemon=True).start()
+        return job_id
+
+    @staticmethod
+    def _update_job(job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn = connect()
+        try:
+            conn.execute(
+                f"UPDATE import_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+                (*fields.values(), job_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+        conn = read_connection()
+        try:
+            row = conn.execute(
+                "SELECT job_id, status, done, total, result, error FROM import_jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "done": row[2],
+            "total": row[3],
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+        }
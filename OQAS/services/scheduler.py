@@ -0,0 +1,278 @@
+"""In-process scheduler for periodic maintenance jobs.
+
+One daemon thread per process keeps each job's next due time and starts the
+job on a short-lived thread of its own, so a slow backup never delays session
+expiry. Intervals are jittered (+/- a fraction of the interval, re-drawn on
+every run) so workers and restarts do not line up on the same second. A job
+never overlaps itself: a run that comes due, or is triggered by hand, while
+the previous one is still going is recorded as "skipped".
+
+Database maintenance must happen once per deployment, not once per worker:
+jobs added with leader_only=True (the default) run only in the process
+holding an exclusive lock on ``<database>-scheduler.lock``. The other workers
+keep trying that lock on every tick and take over if the leader exits.
+Per-process jobs (warming this process's connection pool) pass
+leader_only=False.
+
+Every run is recorded (start time, duration, outcome, result or error) in a
+short per-job history for /admin/scheduler, and counted in /metrics.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from services import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process, always the leader
+    fcntl = None
+
+logger = logging.getLogger("oqas.scheduler")
+
+HISTORY = 20
+# Longest the scheduler thread sleeps, so a newly won leader lock is used promptly
+_MAX_TICK = 5.0
+
+metrics.describe("oqas_job_runs_total", "counter", "Scheduled job runs by outcome (ok, error, skipped)")
+metrics.describe("oqas_job_seconds", "histogram", "Scheduled job duration")
+
+
+class Job:
+    """A function run every ``interval`` seconds, with its run history."""
+
+    def __init__(self, name: str, func: Callable[[], Any], interval: float, jitter: float = 0.1,
+                 first_delay: Optional[float] = None, leader_only: bool = True) -> None:
+        self.name = name
+        self.func = func
+        self.interval = float(interval)
+        self.jitter = max(0.0, min(float(jitter), 0.5))
+        self.leader_only = leader_only
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=HISTORY)
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self._running = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.next_run = time.monotonic() + (self._delay() if first_delay is None else float(first_delay))
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
+
+    def _delay(self) -> float:
+        spread = self.interval * self.jitter
+        return max(0.0, self.interval + random.uniform(-spread, spread))
+
+    def reschedule(self) -> None:
+        self.next_run = time.monotonic() + self._delay()
+
+    def run(self, trigger: str = "schedule") -> Dict[str, Any]:
+        """Run now on the calling thread unless a run is already in progress; returns the record."""
+        record: Dict[str, Any] = {"started_at": time.time(), "trigger": trigger}
+        if not self._running.acquire(blocking=False):
+            record.update(status="skipped", seconds=0.0, error="previous run still in progress")
+            with self._stats_lock:
+                self.skipped += 1
+                self.history.append(record)
+            metrics.inc("oqas_job_runs_total", job=self.name, status="skipped")
+            return record
+        started = time.perf_counter()
+        try:
+            record["result"] = self.func()
+            record["status"] = "ok"
+        except Exception as e:
+            logger.exception("scheduled job %s failed", self.name)
+            record["status"] = "error"
+            record["error"] = str(e) or type(e).__name__
+        finally:
+            self._running.release()
+        record["seconds"] = round(time.perf_counter() - started, 4)
+        with self._stats_lock:
+            self.runs += 1
+            if record["status"] == "error":
+                self.failures += 1
+            self.history.append(record)
+        metrics.inc("oqas_job_runs_total", job=self.name, status=record["status"])
+        metrics.observe("oqas_job_seconds", record["seconds"], job=self.name)
+        return record
+
+    def status(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            history = list(self.history)
+            counts = {"runs": self.runs, "failures": self.failures, "skipped": self.skipped}
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "leader_only": self.leader_only,
+            "running": self.running,
+            "next_run_in": round(max(0.0, self.next_run - time.monotonic()), 1),
+            **counts,
+            "last": history[-1] if history else None,
+            "history": history[::-1],
+        }
+
+
+class Scheduler:
+    """Runs registered jobs on their intervals from one background thread."""
+
+    def __init__(self) -> None:
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_path: Optional[str] = None
+        self._lock_fd: Optional[int] = None
+        self._leader_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add(self, name: str, func: Callable[[], Any], interval: float, **options: Any) -> Optional[Job]:
+        """Register (or replace) a job; an interval <= 0 leaves it out."""
+        with self._lock:
+            self._jobs.pop(name, None)
+            if interval <= 0:
+                return None
+            job = self._jobs[name] = Job(name, func, interval, **options)
+        self._wake.set()
+        return job
+
+    def get(self, name: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(name)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    # ---------------------- Leadership ----------------------
+    def is_leader(self) -> bool:
+        """Whether this process holds the scheduler lock, trying to take it if not."""
+        with self._leader_lock:
+            if self._lock_fd is not None or fcntl is None or self._lock_path is None:
+                return True
+            fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            os.ftruncate(fd, 0)
+            os.write(fd, str(os.getpid()).encode("ascii"))
+            self._lock_fd = fd
+        logger.info("pid %s runs the scheduled jobs", os.getpid())
+        return True
+
+    def _release_leadership(self) -> None:
+        with self._leader_lock:
+            if self._lock_fd is not None:
+                try:
+                    fcntl.lockf(self._lock_fd, fcntl.LOCK_UN)
+                finally:
+                    os.close(self._lock_fd)
+                    self._lock_fd = None
+
+    # ---------------------- Running ----------------------
+    def start(self, lock_path: Optional[str] = None) -> None:
+        """Start the scheduler thread; lock_path elects one process for leader_only jobs."""
+        with self._lock:
+            if self.running:
+                return
+            self._lock_path = lock_path
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+        self._thread = None
+        self._release_leadership()
+
+    def run_now(self, name: str) -> Optional[Dict[str, Any]]:
+        """Run a job on the calling thread (admin trigger), honouring overlap protection.
+
+        Manual runs happen in whichever process took the request, leader or not.
+        """
+        job = self.get(name)
+        if job is None:
+            return None
+        return job.run(trigger="manual")
+
+    def _dispatch(self, job: Job) -> None:
+        threading.Thread(target=job.run, name=f"job-{job.name}", daemon=True).start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            leader: Optional[bool] = None
+            for job in self.jobs():
+                if job.next_run > now:
+                    continue
+                job.reschedule()
+                if job.leader_only:
+                    if leader is None:
+                        leader = self.is_leader()
+                    if not leader:
+                        continue
+                self._dispatch(job)
+            jobs = self.jobs()
+            wait = min([j.next_run for j in jobs], default=now + _MAX_TICK) - time.monotonic()
+            self._wake.wait(max(0.05, min(wait, _MAX_TICK)))
+            self._wake.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "leader": self.running and self.is_leader(),
+            "jobs": [job.status() for job in self.jobs()],
+        }
+
+
+scheduler = Scheduler()
+
+
+def _prewarm() -> Dict[str, int]:
+    """Open this process's idle read connections, each having read the active-session index."""
+    from db import get_read_pool
+
+    opened = get_read_pool().prewarm(warm_sql="SELECT COUNT(*) FROM sessions WHERE status = 'active'")
+    return {"opened": opened}
+
+
+def start_maintenance() -> bool:
+    """Register the maintenance jobs and start the thread, unless SCHEDULER_ENABLED is off.
+
+    serve.py calls this in each worker; the Flask dev server and scripts that build
+    an app do not, so nothing runs in the background there.
+    """
+    from config import (
+        BACKUP_DIR, BACKUP_INTERVAL, BACKUP_KEEP, EVENTS_COMPACT_INTERVAL, EVENTS_RETENTION_DAYS,
+        PREWARM_INTERVAL, SCHEDULER_ENABLED, SCHEDULER_JITTER, SESSION_EXPIRY_INTERVAL,
+        SESSION_MAX_AGE_HOURS, WAL_CHECKPOINT_INTERVAL,
+    )
+    from services import events
+    from db import checkpoint, get_pool
+    from services.admin_service import AdminService
+    from services.session_service import SessionController
+
+    if not SCHEDULER_ENABLED:
+        return False
+    scheduler.add("expire_sessions", lambda: {"expired": SessionController.expire_stale(SESSION_MAX_AGE_HOURS)},
+                  SESSION_EXPIRY_INTERVAL, jitter=SCHEDULER_JITTER, first_delay=0)
+    scheduler.add("wal_checkpoint", lambda: checkpoint("PASSIVE"), WAL_CHECKPOINT_INTERVAL, jitter=SCHEDULER_JITTER)
+    scheduler.add("backup", lambda: AdminService.scheduled_backup(BACKUP_DIR, BACKUP_KEEP), BACKUP_INTERVAL, jitter=SCHEDULER_JITTER)
+    scheduler.add("compact_events", lambda: events.compact(EVENTS_RETENTION_DAYS), EVENTS_COMPACT_INTERVAL, jitter=SCHEDULER_JITTER)
+    scheduler.add("prewarm", _prewarm, PREWARM_INTERVAL, jitter=SCHEDULER_JITTER, first_delay=0, leader_only=False)
+    scheduler.start(lock_path=get_pool().path + "-scheduler.lock")
+    return True
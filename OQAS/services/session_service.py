@@ -1,12 +1,20 @@
-import sqlite3, datetime, qrcode, io, base64, jwt, secrets
-from config import DB_PATH, SECRET_KEY, PORT
+import datetime, logging, secrets
+from typing import Any, Dict, Optional, Tuple
+from config import SECRET_KEY, PORT, SESSION_MAX_AGE_HOURS
+from db import connect, read_connection
+from services import audit, data_versions
+from services.cache import memoize
 from services.qr_services import QRService
+from services.tracing import traced
+
+logger = logging.getLogger("oqas.sessions")
+
 
 class SessionController:
 
     @staticmethod
     def get_active_session(module_id: int):
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         cursor.execute("""
             SELECT session_id, module_id, session_date, run_id, status 
@@ -18,9 +26,37 @@ class SessionController:
         return row
 
     @staticmethod
+    @memoize("checkin_info", maxsize=512, ttl=300, store_if=lambda info: info is not None)
+    def checkin_info(session_id: int) -> Optional[Dict[str, Any]]:
+        """Module name, week and lecturer shown on a session's check-in page.
+
+        None of these change while a session runs (module edits and deletions
+        touch_all()), so check-ins do not invalidate it: every student scanning
+        the same QR code reuses one lookup.
+        """
+        conn = read_connection()
+        try:
+            row = conn.execute(
+                """
+                SELECT m.module_name, s.week_number, u.full_name AS lecturer_name
+                FROM sessions s
+                JOIN modules m ON s.module_id = m.module_id
+                JOIN users u ON m.lecturer_id = u.user_id
+                WHERE s.session_id = ?
+                """,
+                (session_id,),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {"module_name": row[0], "week_number": row[1], "lecturer_name": row[2]}
+
+    @staticmethod
+    @traced()
     def start_session(module_id: int, lecturer_id: int, week_number: int | None = None):
-        # enforce one session per ISO week; expire lingering active >3h
-        conn = sqlite3.connect(DB_PATH)
+        # One session per module and ISO week (open_week); stale ones are expired by the scheduler
+        conn = connect()
         cursor = conn.cursor()
 
         # ensure an app run exists with a session_seed
@@ -33,6 +69,7 @@ class SessionController:
             run_id = cursor.lastrowid
         else:
             run_id = row[0]
+        conn.close()
 
         today = datetime.date.today().isoformat()
         # Use provided week number if valid, otherwise default to current ISO week
@@ -46,62 +83,106 @@ class SessionController:
         except Exception:
             week_number = datetime.date.today().isocalendar()[1]
 
-        # expire any active session older than 3 hours
-        cursor.execute(
-            """
-            UPDATE sessions
-            SET status='ended', ended_at=CURRENT_TIMESTAMP
-            WHERE module_id=? AND status='active'
-              AND (julianday('now') - julianday(created_at)) > (3.0/24.0)
-            """,
-            (module_id,)
-        )
-
-        # If a session already exists for this module and week, reuse it.
-        cursor.execute(
-            """
-            SELECT session_id, status FROM sessions
-            WHERE module_id=? AND week_number=?
-            ORDER BY created_at DESC
-            LIMIT 1
-            """,
-            (module_id, week_number)
-        )
-        existing = cursor.fetchone()
-        if existing is not None:
-            existing_session_id, existing_status = existing
-            if existing_status != 'active':
-                cursor.execute(
-                    """
-                    UPDATE sessions
-                    SET status='active', ended_at=NULL
-                    WHERE session_id=?
-                    """,
-                    (existing_session_id,)
-                )
-                conn.commit()
-            # Build QR for the reused session
-            token, qr_b64 = QRService.build_for_session(module_id=module_id, run_id=run_id, session_id=existing_session_id, date=today)
-            conn.close()
-            return {"session_id": existing_session_id, "token": token, "qr": qr_b64}, None
-        cursor.execute("""
-            INSERT INTO sessions(module_id, week_number, session_date, status, run_id) 
-            VALUES (?, ?, ?, 'active', ?)
-        """, (module_id, week_number, today, run_id))
-        conn.commit()
-
-        session_id = cursor.lastrowid
+        session_id, _ = SessionController.open_week(module_id, week_number, actor_user_id=lecturer_id, run_id=run_id)
 
         # generate token + QR via QRService
         token, qr_b64 = QRService.build_for_session(module_id=module_id, run_id=run_id, session_id=session_id, date=today)
-
-        conn.close()
         return {"session_id": session_id, "token": token, "qr": qr_b64}, None
 
     @staticmethod
-    def close_session(session_id: int):
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE sessions SET status='ended', ended_at = CURRENT_TIMESTAMP WHERE session_id=?", (session_id,))
-        conn.commit()
-        conn.close()
+    @traced()
+    def open_week(module_id: int, week_number: int, actor_user_id: Optional[int] = None,
+                  run_id: Optional[int] = None) -> Tuple[int, str]:
+        """Make the module's session for week_number active; returns (session_id, action).
+
+        One module/week has one session (unique index idx_sessions_module_week), so
+        this is a single upsert: a new row ("start"), an ended one reactivated
+        ("reopen"), or, when it is already active, nothing written ("resume").
+        Concurrent starts cannot create duplicates, and the write transaction is
+        just the upsert. The audit entry is not part of it: it is queued after
+        the commit and written by the audit writer's next batch (services/audit.py).
+        A reopen stamps reopened_at, which is what expire_stale() measures its
+        age from.
+        """
+        today = datetime.date.today().isoformat()
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO sessions (module_id, week_number, session_date, status, run_id)
+                VALUES (?, ?, ?, 'active', ?)
+                ON CONFLICT (module_id, week_number) DO UPDATE
+                    SET status = 'active', ended_at = NULL, reopened_at = CURRENT_TIMESTAMP
+                    WHERE sessions.status <> 'active'
+                RETURNING session_id, reopened_at IS NOT NULL
+                """,
+                (module_id, week_number, today, run_id),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute("SELECT session_id FROM sessions WHERE module_id = ? AND week_number = ?", (module_id, week_number))
+                session_id = cursor.fetchone()[0]
+                conn.rollback()
+                return session_id, "resume"
+            session_id, reopened = row
+            action = "reopen" if reopened else "start"
+            conn.commit()
+        finally:
+            conn.close()
+        data_versions.touch(data_versions.module(module_id), data_versions.session(session_id))
+        audit.record(f"session.{action}", session_id=session_id, actor_user_id=actor_user_id,
+                     target=f"module:{module_id}", note=f"week {week_number}")
+        return session_id, action
+
+    @staticmethod
+    @traced()
+    def expire_stale(max_age_hours: float = SESSION_MAX_AGE_HOURS) -> int:
+        """End every active session started more than max_age_hours ago, in any module.
+
+        A reopened session counts from reopened_at, not from when the week was
+        first started. The cutoff is a constant, so this is a range scan of the
+        expression index idx_sessions_status_started rather than a julianday()
+        computed for each active row.
+        """
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE sessions
+                SET status = 'ended', ended_at = CURRENT_TIMESTAMP
+                WHERE status = 'active' AND COALESCE(reopened_at, created_at) < datetime('now', ?)
+                RETURNING session_id, module_id
+                """,
+                (f"-{float(max_age_hours)} hours",),
+            )
+            rows = cursor.fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+        if rows:
+            data_versions.touch(*{key for session_id, module_id in rows for key in (data_versions.session(session_id), data_versions.module(module_id))})
+            for session_id, module_id in rows:
+                audit.record("session.expire", session_id=session_id, target=f"module:{module_id}",
+                             note=f"active over {max_age_hours:g}h")
+            logger.info("expired %d stale session(s)", len(rows))
+        return len(rows)
+
+    @staticmethod
+    @traced()
+    def close_session(session_id: int, actor_user_id: Optional[int] = None):
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE sessions SET status='ended', ended_at = CURRENT_TIMESTAMP WHERE session_id=? AND status='active' RETURNING module_id",
+                (session_id,),
+            )
+            row = cursor.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        if row is not None:
+            audit.record("session.close", session_id=session_id, actor_user_id=actor_user_id, target=f"module:{row[0]}")
+            data_versions.touch(data_versions.module(row[0]), data_versions.session(session_id))
@@ -0,0 +1,88 @@
+"""Compiled-template reuse: a Jinja bytecode cache, a precompile step and a block fast path.
+
+Jinja compiles a template to Python source and then to a code object the first
+time each process renders it (5-20 ms per template here); with a
+FileSystemBytecodeCache the code object is written to TEMPLATE_CACHE_DIR and the
+next process only unmarshals it. precompile() fills that cache at build time
+(scripts/build_templates.py) and loads every template into the environment when
+a worker starts, so no request pays for compilation.
+
+render_block() is the fast path for pages that wrap one dynamic block in a
+shell that never changes between requests (checkin.html). The shell, with its
+asset_url() links, is rendered once and cached; each request renders only the
+named block, without Flask's context processors and template signals.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask, current_app, g, request, session
+from jinja2 import FileSystemBytecodeCache
+
+from services import assets
+
+logger = logging.getLogger("oqas.templates")
+
+# Stands in for the block while the shell is rendered; split on afterwards
+_MARKER = "\x00oqas-block\x00"
+
+# (template name, block, script_root) -> (template, assets generation, head, tail)
+_shells: Dict[Tuple[str, str, str], Tuple[Any, int, str, str]] = {}
+_shells_lock = threading.Lock()
+
+
+def init_app(app: Flask, cache_dir: Optional[str]) -> None:
+    """Use a filesystem bytecode cache in cache_dir (None or "" leaves it off)."""
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        logger.warning("template cache dir %s is not writable; compiling in memory only", cache_dir)
+        return
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+
+def precompile(app: Flask) -> List[Tuple[str, float]]:
+    """Load every .html template (compiling and caching bytecode as needed); returns (name, ms)."""
+    env = app.jinja_env
+    timings: List[Tuple[str, float]] = []
+    for name in env.list_templates(filter_func=lambda n: n.endswith(".html")):
+        started = time.perf_counter()
+        env.get_template(name)
+        timings.append((name, (time.perf_counter() - started) * 1000.0))
+    return timings
+
+
+def _shell(template, name: str, block: str, context: Dict[str, Any]) -> Tuple[str, str]:
+    key = (name, block, request.script_root)
+    generation = assets.generation()
+    cached = _shells.get(key)
+    if cached is not None and cached[0] is template and cached[1] == generation:
+        return cached[2], cached[3]
+    ctx = template.new_context(context)
+    ctx.blocks[block] = [lambda _ctx: iter((_MARKER,))]
+    html = "".join(template.root_render_func(ctx))
+    head, sep, tail = html.partition(_MARKER)
+    if not sep:
+        raise ValueError(f"{name} renders block {block!r} conditionally; it cannot use the fast path")
+    with _shells_lock:
+        _shells[key] = (template, generation, head, tail)
+    return head, tail
+
+
+def render_block(name: str, block: str = "content", **context: Any) -> str:
+    """render_template(name, **context) for a page whose only dynamic part is `block`.
+
+    Everything outside the block is rendered once (per script root and asset
+    build) and must not depend on the context.
+    """
+    template = current_app.jinja_env.get_template(name)
+    context.setdefault("request", request)
+    context.setdefault("session", session)
+    context.setdefault("g", g)
+    head, tail = _shell(template, name, block, context)
+    ctx = template.new_context(context)
+    return head + "".join(template.blocks[block](ctx)) + tail
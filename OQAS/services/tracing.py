@@ -0,0 +1,297 @@
+"""Per-request span trees written to a rotating JSONL file.
+
+A sampled request gets a root span (the route handler); service methods wrapped
+with @traced, each SQL statement on a pooled connection and each Argon2 job
+become child spans. Finished trees are queued and written by a background
+thread, so a request only pays for building a few small objects.
+
+Which requests are kept:
+  * a random TRACE_SAMPLE_RATE fraction, decided when the request starts;
+  * with TRACE_SLOW_MS > 0, every request is recorded and the ones slower than
+    that are kept too, so the slow check-in you are hunting is never sampled away.
+
+Render the file with scripts/trace_view.py.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import Flask, g, request
+
+from db.pool import add_statement_listener
+
+logger = logging.getLogger("oqas.trace")
+# Problems writing the trace file go to the application log, not to the file itself
+errors = logging.getLogger("oqas.tracing")
+# At most one traceback per this many seconds while writes keep failing
+ERROR_LOG_INTERVAL = 60.0
+
+# Bulk imports can run thousands of statements; keep a trace file line bounded
+MAX_SPANS_PER_TRACE = 500
+
+
+class _FileHandler(RotatingFileHandler):
+    """Raises write failures (disk full, unwritable path) to the writer thread instead
+    of printing them to stderr, so they are counted and logged."""
+
+    def handleError(self, record: logging.LogRecord) -> None:
+        raise
+
+
+class Span:
+    __slots__ = ("name", "start", "duration", "attrs", "children")
+
+    def __init__(self, name: str, start: float, attrs: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.attrs = attrs
+        self.children: List["Span"] = []
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000.0, 3),
+            "ms": round(self.duration * 1000.0, 3),
+        }
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.children:
+            out["children"] = [c.to_dict(origin) for c in self.children]
+        return out
+
+
+class _Trace:
+    __slots__ = ("root", "sampled", "span_count", "dropped")
+
+    def __init__(self, root: Span, sampled: bool) -> None:
+        self.root = root
+        self.sampled = sampled
+        self.span_count = 1
+        self.dropped = 0
+
+
+# (trace, innermost open span) for the current request; None when not recording
+_current: ContextVar[Optional[tuple]] = ContextVar("oqas_trace", default=None)
+
+
+class _SpanContext:
+    __slots__ = ("name", "attrs", "_token", "_span")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.attrs = attrs
+        self._token = None
+        self._span: Optional[Span] = None
+
+    def __enter__(self) -> Optional[Span]:
+        state = _current.get()
+        if state is None:
+            return None
+        trace, parent = state
+        if trace.span_count >= MAX_SPANS_PER_TRACE:
+            trace.dropped += 1
+            return None
+        trace.span_count += 1
+        self._span = Span(self.name, time.perf_counter(), self.attrs or None)
+        parent.children.append(self._span)
+        self._token = _current.set((trace, self._span))
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._span is None:
+            return
+        self._span.duration = time.perf_counter() - self._span.start
+        if exc_type is not None:
+            self._span.attrs = dict(self._span.attrs or {}, error=exc_type.__name__)
+        _current.reset(self._token)
+
+
+def span(name: str, **attrs: Any) -> _SpanContext:
+    """Context manager timing a child span of the current request (no-op when not traced)."""
+    return _SpanContext(name, attrs)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator recording each call as a span named after the function's qualname."""
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        span_name = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with _SpanContext(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name: str, seconds: float, **attrs: Any) -> None:
+    """Attach an already finished span (measured elsewhere) to the current span."""
+    state = _current.get()
+    if state is None:
+        return
+    trace, parent = state
+    if trace.span_count >= MAX_SPANS_PER_TRACE:
+        trace.dropped += 1
+        return
+    trace.span_count += 1
+    finished = Span(name, time.perf_counter() - seconds, attrs or None)
+    finished.duration = seconds
+    parent.children.append(finished)
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+class Tracer:
+    """Decides what to record, builds root spans from Flask hooks and writes traces."""
+
+    def __init__(self) -> None:
+        self.sample_rate = 0.0
+        self.slow_seconds = 0.0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=1000)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._listening = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._last_error = float("-inf")
+
+    def install(self, sample_rate: float, slow_ms: float = 0.0, log_path: Optional[str] = None) -> None:
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.slow_seconds = slow_ms / 1000.0 if slow_ms > 0 else 0.0
+        if log_path and not logger.handlers:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            handler = _FileHandler(log_path, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8", delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        if not self._listening:
+            add_statement_listener(self._on_statement)
+            self._listening = True
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0.0 or self.slow_seconds > 0.0
+
+    # ---------------------- request lifecycle ----------------------
+    def start(self, name: str, **attrs: Any) -> bool:
+        """Open a root span for the current context; False if this one is not recorded."""
+        if not self.enabled:
+            return False
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        if not sampled and not self.slow_seconds:
+            return False
+        trace = _Trace(Span(name, time.perf_counter(), attrs or None), sampled)
+        _current.set((trace, trace.root))
+        return True
+
+    def finish(self, **attrs: Any) -> None:
+        state = _current.get()
+        if state is None:
+            return
+        _current.set(None)
+        trace, _ = state
+        root = trace.root
+        root.duration = time.perf_counter() - root.start
+        if attrs:
+            root.attrs = dict(root.attrs or {}, **attrs)
+        if not trace.sampled and root.duration < self.slow_seconds:
+            return
+        entry = {
+            "trace_id": uuid.uuid4().hex[:16],
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ms": round(root.duration * 1000.0, 3),
+            "kept": "sampled" if trace.sampled else "slow",
+            "spans": trace.span_count,
+            "dropped_spans": trace.dropped,
+            "root": root.to_dict(root.start),
+        }
+        self._enqueue(entry)
+
+    def _on_statement(self, sql: str, parameters: Any, seconds: float) -> None:
+        if _current.get() is None:
+            return
+        text = " ".join(sql.split())
+        record("sql", seconds, sql=text[:300])
+
+    # ---------------------- writer ----------------------
+    def _enqueue(self, entry: Dict[str, Any]) -> None:
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                    self._worker.start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            try:
+                if entry is None:
+                    return
+                logger.info(json.dumps(entry, default=str))
+                self.written += 1
+            except Exception:
+                self.failed += 1
+                now = time.monotonic()
+                if now - self._last_error >= ERROR_LOG_INTERVAL:
+                    self._last_error = now
+                    errors.exception("writing a trace failed (%d lost so far)", self.failed)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, int]:
+        """Traces written, dropped because the queue was full, and lost to failed writes."""
+        return {"written": self.written, "dropped": self.dropped, "failed": self.failed}
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait until queued traces are written (tests, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+tracer = Tracer()
+
+
+def _before_request() -> None:
+    if tracer.start(request.endpoint or "unmatched", method=request.method, path=request.path):
+        g._trace_open = True
+
+
+def _teardown_request(exc: Optional[BaseException]) -> None:
+    if g.pop("_trace_open", False):
+        status = getattr(g, "_trace_status", None)
+        tracer.finish(status=status if exc is None else 500)
+
+
+def _after_request(response):
+    if g.get("_trace_open"):
+        g._trace_status = response.status_code
+    return response
+
+
+def init_app(app: Flask, sample_rate: float, slow_ms: float = 0.0, log_path: Optional[str] = None) -> None:
+    """Trace the app's requests; safe to call for several apps."""
+    tracer.install(sample_rate, slow_ms, log_path)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
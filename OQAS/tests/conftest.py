@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+# Run from anywhere: make the OQAS project root importable
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Logs written while testing go to a scratch directory, not the project's logs/
+_LOG_DIR = tempfile.mkdtemp(prefix="oqas-test-logs-")
+for _name, _file in (("LOG_PATH", "app.log"), ("SLOW_QUERY_LOG", "slow_queries.jsonl"), ("TRACE_LOG", "traces.jsonl")):
+    os.environ.setdefault(_name, os.path.join(_LOG_DIR, _file))
+# ...and so does compiled template bytecode
+os.environ.setdefault("TEMPLATE_CACHE_DIR", os.path.join(_LOG_DIR, "templates"))
+
+import db
+from config import DB_PATH
+from init_db import create_tables
+from services import audit
+
+
+def make_database(path: str) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        create_tables(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def temp_db(tmp_path):
+    """Point the connection pool at a fresh, empty OQAS database for one test."""
+    path = str(tmp_path / "oqas_test.db")
+    make_database(path)
+    pool = db.configure_pool(path)
+    yield path
+    audit.flush()  # queued entries belong to this database
+    pool.close()
+    db.configure_pool(DB_PATH)
+
+
+@pytest.fixture
+def seeded_db(temp_db):
+    """temp_db with lecturer 2 ('lect', "Lecturer") teaching module 1 (CS101 "One", 14 weeks)."""
+    conn = sqlite3.connect(temp_db)
+    try:
+        conn.execute("INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (2, 'lect', 'x', 'lecturer', 'Lecturer')")
+        conn.execute("INSERT INTO modules (module_id, module_code, module_name, lecturer_id, planned_weeks) VALUES (1, 'CS101', 'One', 2, 14)")
+        conn.commit()
+    finally:
+        conn.close()
+    return temp_db
@@ -0,0 +1,84 @@
+import sqlite3
+
+import app as app_module
+from services.admin_service import AdminService
+
+
+def _seed(path: str) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        cur.executemany(
+            "INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (?, ?, 'x', 'lecturer', ?)",
+            [(100 + i, f"lect{i:03d}", f"Lecturer {i}") for i in range(120)],
+        )
+        cur.execute("INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (900, 'lect999s', 'x', 'student', 'Not a lecturer')")
+        cur.executemany(
+            "INSERT INTO modules (module_code, module_name, lecturer_id, planned_weeks) VALUES (?, ?, ?, 14)",
+            [(f"{'CS' if i % 2 else 'IT'}{i:03d}", f"Module {i}", 100 + i % 3) for i in range(90)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _all_pages(search, **kwargs):
+    seen, after = [], None
+    while True:
+        page = search(after=after, limit=25, **kwargs)
+        seen.append(page["items"])
+        after = page["next"]
+        if after is None:
+            return seen
+
+
+def test_keyset_pages_cover_every_row_once_in_either_direction(temp_db):
+    _seed(temp_db)
+    pages = _all_pages(AdminService.search_lecturers)
+    names = [l["username"] for page in pages for l in page]
+    assert [len(p) for p in pages] == [25, 25, 25, 25, 20]
+    assert names == sorted(f"lect{i:03d}" for i in range(120))
+
+    backwards = [l["username"] for page in _all_pages(AdminService.search_lecturers, descending=True) for l in page]
+    assert backwards == names[::-1]
+
+    codes = [m["module_code"] for page in _all_pages(AdminService.search_modules) for m in page]
+    assert len(codes) == 90 and codes == sorted(codes)
+
+
+def test_prefix_and_lecturer_filters(temp_db):
+    _seed(temp_db)
+    page = AdminService.search_lecturers(q="lect01")
+    assert [l["username"] for l in page["items"]] == [f"lect01{i}" for i in range(10)]
+    assert page["items"][0]["module_count"] == 0 and page["next"] is None
+    assert AdminService.search_lecturers(q="lect000")["items"][0]["module_count"] == 30
+
+    cs = AdminService.search_modules(q="CS", limit=200)["items"]
+    assert len(cs) == 45 and all(m["module_code"].startswith("CS") for m in cs)
+    # Prefix search is a BINARY range, so case matters
+    assert AdminService.search_modules(q="cs")["items"] == []
+
+    mine = AdminService.search_modules(lecturer_id=101, limit=200)["items"]
+    assert len(mine) == 30 and {m["lecturer_name"] for m in mine} == {"Lecturer 1"}
+    assert [m["module_code"] for m in AdminService.search_modules(q="IT", lecturer_id=101)["items"]] == [
+        f"IT{i:03d}" for i in range(90) if i % 2 == 0 and i % 3 == 1
+    ]
+
+
+def test_search_routes_are_admin_only_json(temp_db):
+    _seed(temp_db)
+    client = app_module.create_app({"TESTING": True}).test_client()
+    assert client.get("/admin/lecturers").status_code == 302
+
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 1, "username": "admin", "role": "admin"}
+    first = client.get("/admin/lecturers?limit=10&dir=desc").get_json()
+    assert first["ok"] and first["items"][0]["username"] == "lect119" and first["next"] == "lect110"
+    second = client.get(f"/admin/lecturers?limit=10&dir=desc&after={first['next']}").get_json()
+    assert second["items"][0]["username"] == "lect109"
+
+    modules = client.get("/admin/modules?q=CS00&lecturer_id=100").get_json()
+    assert [m["module_code"] for m in modules["items"]] == ["CS003", "CS009"]
+
+    page = client.get("/admin/dashboard")
+    assert page.status_code == 200 and b"lect050" not in page.data
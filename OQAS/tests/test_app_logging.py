@@ -0,0 +1,32 @@
+import json
+import logging
+
+import app as app_module
+from services import app_logging
+
+
+def test_requests_are_logged_as_json_off_thread(temp_db, tmp_path):
+    log_path = str(tmp_path / "app.log")
+    app_logging.shutdown_logging()  # another test may have built a default app already
+    assert app_logging.setup_logging(log_path, "INFO", "oqas.roster=DEBUG,bogus")
+    try:
+        assert logging.getLogger("oqas.roster").level == logging.DEBUG
+        flask_app = app_module.create_app({"TESTING": True, "WTF_CSRF_ENABLED": False})
+        client = flask_app.test_client()
+        response = client.post("/login", data={"username": "nobody", "password": "x"}, headers={"X-Request-ID": "req-42"})
+        assert response.headers["X-Request-ID"] == "req-42"
+        generated = client.get("/checkin").headers["X-Request-ID"]
+        logging.getLogger("oqas.modules").warning("outside any request")
+    finally:
+        app_logging.shutdown_logging()
+        logging.getLogger("oqas.roster").setLevel(logging.NOTSET)
+
+    with open(log_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    login = next(r for r in records if r.get("request_id") == "req-42")
+    assert login["logger"] == "oqas.access"
+    assert login["route"] == "login" and login["method"] == "POST" and login["status"] == 200
+    assert login["sql_count"] >= 1 and login["ms"] > 0
+    assert any(r.get("request_id") == generated and r["route"] == "checkin" for r in records)
+    outside = next(r for r in records if r["msg"] == "outside any request")
+    assert outside["level"] == "WARNING" and "request_id" not in outside
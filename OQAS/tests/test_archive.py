@@ -0,0 +1,72 @@
+import sqlite3
+
+from services.archive_service import ArchiveService
+from services.attendance_service import AttendanceService
+from services.report_service import ReportService
+
+
+def _add_terms(path: str) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (905000001, '905000001', 'x', 'student', 'Student One')")
+        cur.executemany(
+            "INSERT INTO sessions (session_id, module_id, week_number, session_date, status) VALUES (?, 1, ?, ?, ?)",
+            [(1, 5, "2024-02-01", "ended"), (2, 6, "2024-02-08", "ended"), (3, 40, "2025-10-01", "active")],
+        )
+        cur.executemany(
+            "INSERT INTO attendance (session_id, student_id, checkin_time) VALUES (?, 905000001, ?)",
+            [(1, "2024-02-01T09:00:00"), (3, "2025-10-01T09:00:00")],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_archive_moves_closed_term_and_reads_stay_transparent(seeded_db):
+    _add_terms(seeded_db)
+
+    ok, err, stats = ArchiveService.archive_term("2024-S1", "2024-01-01", "2024-06-30")
+    assert ok, err
+    assert stats == {"sessions": 2, "attendance": 1}
+
+    conn = sqlite3.connect(seeded_db)
+    assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0] == 1
+    conn.close()
+
+    # Live-only window does not touch the archive
+    live = ReportService.get_module_summary(1, start_date="2025-01-01")
+    assert live["total_sessions"] == 1
+
+    # Whole-history summary spans live + archive
+    report = ReportService.get_module_summary(1)
+    assert report["total_sessions"] == 3
+    assert report["students"][0]["attended_sessions"] == 2
+
+    history = AttendanceService.get_student_attendance_history(905000001)
+    assert [h["session_id"] for h in history] == [3, 1]
+    assert [h["session_id"] for h in AttendanceService.get_student_attendance_history(905000001, limit=1)] == [3]
+
+
+def test_archive_refuses_terms_with_active_sessions(seeded_db):
+    _add_terms(seeded_db)
+    ok, err, _ = ArchiveService.archive_term("2025-S2", "2025-09-01", "2025-12-31")
+    assert not ok and "active" in err
+
+
+def test_attendance_summaries_match_reports_after_archiving(seeded_db):
+    _add_terms(seeded_db)
+    ok, err, _ = ArchiveService.archive_term("2024-S1", "2024-01-01", "2024-06-30")
+    assert ok, err
+
+    report = ReportService.get_module_summary(1)
+    summary = AttendanceService.calculate_module_attendance_summary(1)
+    student = AttendanceService.calculate_student_attendance_percentage(905000001, 1)
+
+    assert summary["total_sessions"] == student["total_sessions"] == report["total_sessions"] == 3
+    assert [(s["student_id"], s["attended_sessions"]) for s in summary["student_attendance"]] == [
+        (s["student_id"], s["attended_sessions"]) for s in report["students"]
+    ] == [(905000001, 2)]
+    assert student["attended_sessions"] == 2
+    assert student["attendance_percentage"] == report["students"][0]["attendance_percentage"]
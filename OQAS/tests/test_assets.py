@@ -0,0 +1,47 @@
+import gzip
+import os
+
+import app as app_module
+from services import assets
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_build_fingerprints_rewrites_and_serves_precompressed(tmp_path, monkeypatch):
+    static = str(tmp_path / "static")
+    _write(os.path.join(static, "vendor", "fontawesome", "webfonts", "fa-solid-900.woff2"), b"\x00font" * 10)
+    css = b"@font-face{src:url(../webfonts/fa-solid-900.woff2?v=6) format('woff2')}" + b".x{color:red}" * 200
+    _write(os.path.join(static, "vendor", "fontawesome", "css", "all.min.css"), css)
+
+    built = assets.build(static)
+    entry = built["vendor/fontawesome/css/all.min.css"]
+    font = built["vendor/fontawesome/webfonts/fa-solid-900.woff2"]
+    assert entry["path"] != "vendor/fontawesome/css/all.min.css" and entry["encodings"] == ["gzip"]
+    assert font["encodings"] == []
+    with open(os.path.join(static, "dist", entry["path"]), "rb") as f:
+        rewritten = f.read()
+    assert b"url(../webfonts/" + os.path.basename(font["path"]).encode() + b"?v=6)" in rewritten
+
+    monkeypatch.setattr(assets, "STATIC_DIR", static)
+    assets.reload_manifest()
+    try:
+        flask_app = app_module.create_app({"TESTING": True})
+        client = flask_app.test_client()
+        with flask_app.test_request_context():
+            url = assets.asset_url("vendor/fontawesome/css/all.min.css")
+            assert url == "/static/dist/" + entry["path"]
+            # Never downloaded: the page still works, from the CDN
+            assert assets.asset_url("vendor/bootstrap/css/bootstrap.min.css").startswith("https://cdn.jsdelivr.net/")
+
+        zipped = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+        assert zipped.headers["Content-Encoding"] == "gzip"
+        assert "immutable" in zipped.headers["Cache-Control"] and "Accept-Encoding" in zipped.headers["Vary"]
+        assert gzip.decompress(zipped.data) == rewritten
+        plain = client.get(url, headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in plain.headers and plain.data == rewritten
+    finally:
+        assets.reload_manifest()
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+
+import app as app_module
+from db import read_connection
+from init_db import create_tables
+from services import audit
+from services.audit import AuditWriter
+
+
+def _actions(path: str):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT session_id, actor_user_id, action, target FROM session_audit ORDER BY audit_id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_entries_are_written_in_batches_off_the_calling_thread(temp_db):
+    batching = AuditWriter(batch_size=50, flush_seconds=0.2)
+    entries = [(i, 2, "session.start", None, None, "2026-01-01 09:00:00") for i in range(120)]
+    threads = [threading.Thread(target=lambda chunk=entries[i::4]: [batching.append(e) for e in chunk]) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batching.flush()
+
+    stats = batching.stats()
+    assert (stats["written"], stats["pending"], stats["dropped"]) == (120, 0, 0)
+    assert stats["batches"] <= 4
+    assert sorted(r[0] for r in _actions(temp_db)) == list(range(120))
+
+
+def test_actor_defaults_to_the_signed_in_user(temp_db):
+    client = app_module.create_app({"TESTING": True, "WTF_CSRF_ENABLED": False}).test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 1, "username": "admin", "role": "admin"}
+    client.post("/admin/lecturers", data={"username": "lect", "full_name": "Lecturer", "password": "secret123"})
+    audit.record("db.backup", note="scheduled")  # no request: a NULL actor
+    audit.flush()
+
+    rows = _actions(temp_db)
+    assert [(r[1], r[2]) for r in rows] == [(1, "lecturer.create"), (None, "db.backup")]
+    assert rows[0][3].startswith("user:")
+
+
+def test_query_pages_by_session_actor_and_time(temp_db):
+    conn = sqlite3.connect(temp_db)
+    try:
+        conn.executemany(
+            "INSERT INTO session_audit (session_id, actor_user_id, action, created_at) VALUES (?, ?, ?, ?)",
+            [(i % 3, 10 + i % 2, "session.close", f"2026-03-{1 + i // 10:02d} 09:00:{i % 10:02d}") for i in range(60)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    seen, before = [], None
+    while True:
+        page = audit.query(session_id=1, before=before, limit=7)
+        seen += page["items"]
+        before = page["next"]
+        if before is None:
+            break
+    assert len(seen) == 20 and all(e["session_id"] == 1 for e in seen)
+    assert [(e["created_at"], e["audit_id"]) for e in seen] == sorted(((e["created_at"], e["audit_id"]) for e in seen), reverse=True)
+
+    window = audit.query(actor_user_id=11, since="2026-03-02", until="2026-03-04", limit=500)["items"]
+    assert len(window) == 10 and {e["actor_user_id"] for e in window} == {11}
+
+    conn = read_connection()
+    try:
+        for column in ("session_id", "actor_user_id"):
+            plan = " ".join(r[3] for r in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT audit_id FROM session_audit WHERE {column} = 1 "
+                "AND (created_at, audit_id) < ('2026-03-04', 99) ORDER BY created_at DESC, audit_id DESC LIMIT 7"
+            ))
+            assert "INDEX idx_audit_" in plan and "TEMP B-TREE" not in plan
+    finally:
+        conn.close()
+
+
+def test_migration_rebuilds_old_audit_table(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        create_tables(cur)
+        cur.execute("DROP TABLE session_audit")
+        cur.execute("""
+            CREATE TABLE session_audit (
+                audit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER NOT NULL,
+                actor_user_id INTEGER NOT NULL,
+                action TEXT NOT NULL,
+                note TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.executemany("INSERT INTO session_audit (session_id, actor_user_id, action) VALUES (?, 2, ?)", [(1, "start"), (1, "close")])
+        create_tables(cur)
+        conn.commit()
+
+        assert [r[0] for r in conn.execute("SELECT action FROM session_audit ORDER BY audit_id")] == ["session.start", "session.close"]
+        assert conn.execute("PRAGMA foreign_key_list('session_audit')").fetchall() == []
+        conn.execute("INSERT INTO session_audit (action, target) VALUES ('module.delete', 'module:9')")
+    finally:
+        conn.close()
+
+
+def test_audit_route_is_admin_only(temp_db):
+    audit.record("module.update", actor_user_id=1, target="module:1")
+    audit.flush()
+    client = app_module.create_app({"TESTING": True}).test_client()
+    assert client.get("/admin/audit").status_code == 302
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 1, "username": "admin", "role": "admin"}
+    body = client.get("/admin/audit?actor=1&action=module.update").get_json()
+    assert body["ok"] and [e["target"] for e in body["items"]] == ["module:1"] and body["next"] is None
+    bad = client.get("/admin/audit?before=garbage")
+    assert bad.status_code == 400 and not bad.get_json()["ok"]
+    assert client.get("/admin/audit?before=2026-01-01 09:00:00|x").status_code == 400
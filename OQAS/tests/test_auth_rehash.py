@@ -0,0 +1,62 @@
+import sqlite3
+import threading
+
+import pytest
+from argon2 import PasswordHasher
+
+from services import password_service
+from services.attendance_service import AttendanceService
+from services.auth_service import AuthService
+from services.password_service import INITIAL_PASSWORD_HASH, PasswordService, ph
+
+
+def test_login_upgrades_hash_made_with_old_parameters(temp_db):
+    weak = PasswordHasher(time_cost=1, memory_cost=8, parallelism=1).hash("lect123")
+    conn = sqlite3.connect(temp_db)
+    conn.execute(
+        "INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (2, 'lect1', ?, 'lecturer', 'Lecturer')",
+        (weak,),
+    )
+    conn.commit()
+    conn.close()
+
+    user = AuthService.login("lect1", "lect123")
+    assert user["user_id"] == 2
+
+    conn = sqlite3.connect(temp_db)
+    stored = conn.execute("SELECT password_hash FROM users WHERE user_id = 2").fetchone()[0]
+    conn.close()
+    assert stored != weak
+    assert not ph.check_needs_rehash(stored)
+    assert AuthService.login("lect1", "lect123")["username"] == "lect1"
+
+
+def test_checkin_provisioning_defers_hashing_to_first_login(seeded_db, monkeypatch):
+    conn = sqlite3.connect(seeded_db)
+    conn.execute("INSERT INTO sessions (session_id, module_id, week_number, session_date, status) VALUES (1, 1, 1, date('now'), 'active')")
+    conn.commit()
+    conn.close()
+
+    # A saturated login pool does not hold up check-ins that create accounts
+    monkeypatch.setattr(PasswordService, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(password_service, "HASH_QUEUE_TIMEOUT", 0.01)
+    PasswordService._slots.acquire()
+    try:
+        assert AttendanceService.submit_attendance(1, 905000001, "Ada Lovelace") == (True, None)
+        assert AttendanceService.record_attendance(1, 905000002, "Alan Turing")[0]
+        with pytest.raises(ValueError):
+            AuthService.login("905000001", "guess")
+    finally:
+        PasswordService._slots.release()
+
+    conn = sqlite3.connect(seeded_db)
+    stored = dict(conn.execute("SELECT user_id, password_hash FROM users WHERE role = 'student'").fetchall())
+    conn.close()
+    assert stored == {905000001: INITIAL_PASSWORD_HASH, 905000002: INITIAL_PASSWORD_HASH}
+
+    assert AuthService.login("905000001", "temp-password")["role"] == "student"
+    conn = sqlite3.connect(seeded_db)
+    stored = conn.execute("SELECT password_hash FROM users WHERE user_id = 905000001").fetchone()[0]
+    conn.close()
+    assert stored != INITIAL_PASSWORD_HASH and ph.verify(stored, "temp-password")
+    assert AuthService.change_password(905000002, "temp-password", "n3w-secret")
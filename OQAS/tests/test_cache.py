@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import time
+
+import app as app_module
+from services import cache, data_versions
+from services.attendance_service import AttendanceService
+from services.cache import Cache, memoize, parse_limits
+from services.report_service import ReportService
+from services.session_service import SessionController
+
+
+def _open_week() -> int:
+    session_id, _ = SessionController.open_week(1, 4, actor_user_id=2)
+    return session_id
+
+
+def test_lru_ttl_and_limits(temp_db):
+    calls = []
+
+    @memoize("test_lru", maxsize=2, ttl=0.2)
+    def square(n, offset=0):
+        calls.append(n)
+        return n * n + offset
+
+    assert [square(2), square(2), square(n=2), square(3)] == [4, 4, 4, 9]
+    assert calls == [2, 3]
+    square(4)  # evicts 2, the least recently used
+    square(3)
+    square(2)
+    assert calls == [2, 3, 4, 2]
+    time.sleep(0.25)
+    square(2)
+    assert calls == [2, 3, 4, 2, 2]
+    stats = cache.stats()["test_lru"]
+    assert (stats["entries"], stats["evictions"], stats["hits"]) == (2, 2, 3)
+
+    assert parse_limits("report=64:120, qr=0:0,bad,x=1") == {"report": (64, 120.0), "qr": (0, 0.0)}
+    off = Cache("test_off", 0, 60)
+    assert not off.enabled
+
+
+def test_reports_are_invalidated_by_checkins_and_other_processes(seeded_db):
+    session_id = _open_week()
+    first = ReportService.get_module_summary(1)
+    assert ReportService.get_module_summary(module_id=1) is first
+    assert ReportService.get_module_summary(99)["error"] and ReportService.get_module_summary(99) is not ReportService.get_module_summary(99)
+
+    assert AttendanceService.submit_attendance(session_id, 905000001, "Ada Lovelace") == (True, None)
+    second = ReportService.get_module_summary(1)
+    assert second is not first and [s["attended_sessions"] for s in second["students"]] == [1]
+    assert ReportService.get_module_summary(1) is second
+
+    # A write in another process (CLI script, other worker) publishes through the shared versions file
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1]); import db; db.configure_pool(sys.argv[2]);"
+        "from services import data_versions; data_versions.touch(data_versions.module(1))"
+    )
+    subprocess.run([sys.executable, "-c", script, project_root, seeded_db], check=True, timeout=60)
+    assert ReportService.get_module_summary(1) is not second
+
+    data_versions.touch_all()
+    assert cache.stats()["report"]["invalidations"] >= 2
+
+
+def test_checkin_info_survives_checkins_but_not_module_edits(seeded_db):
+    session_id = _open_week()
+    info = SessionController.checkin_info(session_id)
+    assert info == {"module_name": "One", "week_number": 4, "lecturer_name": "Lecturer"}
+    AttendanceService.submit_attendance(session_id, 905000001, "Ada Lovelace")
+    assert SessionController.checkin_info(session_id) is info
+
+    client = app_module.create_app({"TESTING": True, "WTF_CSRF_ENABLED": False}).test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 1, "username": "admin", "role": "admin"}
+    client.post("/admin/modules/1", data={"module_code": "CS101", "module_name": "Renamed", "lecturer_id": "2", "planned_weeks": "14"})
+    assert SessionController.checkin_info(session_id)["module_name"] == "Renamed"
+
+    body = client.get("/admin/cache").get_json()
+    assert body["ok"] and body["caches"]["checkin_info"]["hits"] >= 1
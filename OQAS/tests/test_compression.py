@@ -0,0 +1,63 @@
+import gzip
+import zlib
+
+from flask import Flask, Response, jsonify
+
+from services import compression
+
+
+def _app(min_size=100):
+    app = Flask(__name__)
+    compression.init_app(app, min_size=min_size)
+
+    @app.route("/big")
+    def big():
+        return jsonify(rows=[{"student": f"S{i:05d}", "status": "present"} for i in range(200)])
+
+    @app.route("/tiny")
+    def tiny():
+        return jsonify(ok=True)
+
+    @app.route("/png")
+    def png():
+        return Response(b"\x89PNG" + b"\0" * 5000, mimetype="image/png")
+
+    @app.route("/events")
+    def events():
+        def gen():
+            for i in range(3):
+                yield f"data: {i}\n\n"
+        return Response(gen(), mimetype="text/event-stream")
+
+    return app
+
+
+def test_gzip_and_deflate_negotiation_and_thresholds():
+    client = _app().test_client()
+    plain = client.get("/big")
+    assert "Content-Encoding" not in plain.headers and "Accept-Encoding" in plain.headers["Vary"]
+
+    gz = client.get("/big", headers={"Accept-Encoding": "gzip, deflate"})
+    assert gz.headers["Content-Encoding"] == "gzip"
+    assert int(gz.headers["Content-Length"]) < len(plain.data)
+    assert gzip.decompress(gz.data) == plain.data
+
+    df = client.get("/big", headers={"Accept-Encoding": "gzip;q=0, deflate"})
+    assert df.headers["Content-Encoding"] == "deflate"
+    assert zlib.decompress(df.data) == plain.data
+
+    for path in ("/tiny", "/png"):
+        resp = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in resp.headers
+
+
+def test_streamed_responses_are_compressed_chunk_by_chunk():
+    client = _app().test_client()
+    resp = client.get("/events", headers={"Accept-Encoding": "gzip"}, buffered=False)
+    assert resp.headers["Content-Encoding"] == "gzip" and "Content-Length" not in resp.headers
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunks = [decoder.decompress(chunk) for chunk in resp.response]
+    resp.close()
+    # Every event is decodable as soon as its chunk arrives
+    assert chunks[:3] == [b"data: 0\n\n", b"data: 1\n\n", b"data: 2\n\n"]
+    assert b"".join(chunks) + decoder.flush() == b"data: 0\n\ndata: 1\n\ndata: 2\n\n"
@@ -0,0 +1,70 @@
+import sqlite3
+from datetime import date, timedelta
+
+import app as app_module
+from db import pool
+from services.dashboard_service import DashboardService
+
+
+def _seed(path: str, today: date) -> None:
+    last_week = (today - timedelta(days=7)).isoformat()
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (2, 'lect', 'x', 'lecturer', 'Lecturer')")
+        cur.executemany(
+            "INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (?, ?, 'x', 'student', ?)",
+            [(905000001, "905000001", "Ada"), (905000002, "905000002", "Bob")],
+        )
+        cur.executemany(
+            "INSERT INTO modules (module_id, module_code, module_name, lecturer_id, planned_weeks) VALUES (?, ?, ?, 2, 14)",
+            [(module_id, f"M{module_id:03d}", f"Module {module_id}") for module_id in range(1, 13)],
+        )
+        cur.executemany("INSERT INTO enrollments (module_id, student_id) VALUES (1, ?)", [(905000001,), (905000002,)])
+        cur.executemany(
+            "INSERT INTO sessions (session_id, module_id, week_number, session_date, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (1, 1, 1, last_week, "ended", last_week + " 09:00:00"),
+                (2, 1, 2, today.isoformat(), "active", today.isoformat() + " 09:00:00"),
+                (3, 2, 2, today.isoformat(), "ended", today.isoformat() + " 08:00:00"),
+            ],
+        )
+        cur.executemany(
+            "INSERT INTO attendance (session_id, student_id) VALUES (?, ?)",
+            [(1, 905000001), (1, 905000002), (2, 905000001)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_lecturer_dashboard_is_two_queries_for_any_module_count(temp_db):
+    today = date.today()
+    _seed(temp_db, today)
+    statements = []
+    listener = lambda sql, params, seconds: statements.append(sql)
+    pool.add_statement_listener(listener)
+    try:
+        data = DashboardService.lecturer(2, today)
+    finally:
+        pool.remove_statement_listener(listener)
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 2
+
+    modules = {m["module_code"]: m for m in data["modules"]}
+    assert len(modules) == 12 and data["active_count"] == 1
+    m1 = modules["M001"]
+    assert m1["active_session"]["session_id"] == 2 and m1["this_week"] == {"sessions": 1, "checkins": 1}
+    assert m1["last_session"] == {
+        "session_id": 2, "week_number": 2, "session_date": today.isoformat(),
+        "status": "active", "present": 1, "attendance_rate": 50.0,
+    }
+    m2 = modules["M002"]
+    assert m2["active_session"] is None and m2["last_session"]["status"] == "ended"
+    assert modules["M003"]["last_session"] is None
+
+    client = app_module.create_app({"TESTING": True}).test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 2, "username": "lect", "role": "lecturer"}
+    body = client.get("/api/lecturer/dashboard").get_json()
+    assert body["ok"] and body["data"]["modules"][0]["module_code"] == "M001"
+    assert client.get("/lecturer/dashboard").status_code == 200
@@ -0,0 +1,50 @@
+import sqlite3
+
+from services.attendance_service import AttendanceService
+from services.enrollment_service import EnrollmentService
+from services.report_service import ReportService
+
+
+def _add_students_and_sessions(path: str) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        cur.executemany(
+            "INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (?, ?, 'x', 'student', ?)",
+            [(905000001, "905000001", "Ada"), (905000002, "905000002", "Bob"), (905000003, "905000003", "Cy")],
+        )
+        cur.executemany(
+            "INSERT INTO sessions (session_id, module_id, week_number, session_date, status) VALUES (?, 1, ?, ?, 'active')",
+            [(1, 1, "2025-02-01"), (2, 2, "2025-02-08")],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_summary_and_report_are_driven_by_enrollment(seeded_db):
+    _add_students_and_sessions(seeded_db)
+    counts, errors = EnrollmentService.load_csv(b"module_code,student_id\nCS101,905000001\nCS101,905000002\nNOPE,905000003\n")
+    assert counts["added"] == 2 and len(errors) == 1
+
+    ok, err = AttendanceService.submit_attendance(1, 905000001, "Ada")
+    assert ok, err
+    # A walk-in is enrolled by the check-in itself
+    ok, err = AttendanceService.submit_attendance(2, 905000003, "Cy")
+    assert ok, err
+
+    summary = AttendanceService.calculate_module_attendance_summary(1)
+    rows = {s["student_id"]: s for s in summary["student_attendance"]}
+    assert set(rows) == {905000001, 905000002, 905000003}
+    assert rows[905000002]["attended_sessions"] == 0 and rows[905000002]["absent_sessions"] == 2
+    assert rows[905000001]["attendance_percentage"] == 50.0
+
+    report = ReportService.get_module_summary(1)
+    assert [s["student_name"] for s in report["students"]] == ["Ada", "Bob", "Cy"]
+    assert [s["attended_sessions"] for s in report["students"]] == [1, 0, 1]
+
+    assert [a["student_id"] for a in EnrollmentService.list_absentees(1)] == [905000002, 905000003]
+
+    result = EnrollmentService.sync_module(1, [905000001])
+    assert result == {"added": 0, "removed": 2, "unchanged": 1}
+    assert [s["student_id"] for s in EnrollmentService.list_students(1)] == [905000001]
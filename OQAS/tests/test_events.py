@@ -0,0 +1,146 @@
+import json
+import sqlite3
+
+from werkzeug.test import EnvironBuilder
+
+import app as app_module
+import db
+from init_db import create_tables
+from services import events
+from services.attendance_service import AttendanceService
+from services.session_service import SessionController
+
+STUDENTS = [905000001 + i for i in range(7)]
+
+
+def _open_week() -> int:
+    session_id, _ = SessionController.open_week(1, 3, actor_user_id=2)
+    return session_id
+
+
+def test_checkins_feed_a_keyset_paginated_log(seeded_db):
+    session_id = _open_week()
+    for student_id in STUDENTS:
+        assert AttendanceService.submit_attendance(session_id, student_id, f"Student {student_id}") == (True, None)
+    # Rejected check-ins (duplicate, ended session) add nothing
+    assert not AttendanceService.submit_attendance(session_id, STUDENTS[0], "Again")[0]
+    SessionController.close_session(session_id)
+    assert not AttendanceService.record_attendance(session_id, 905000099, "Late")[0]
+
+    seen, cursor = [], None
+    while True:
+        page = events.page(after=cursor, limit=3)
+        seen += page["events"]
+        cursor = page["next"]
+        if not page["has_more"]:
+            break
+    assert [e["student_id"] for e in seen] == STUDENTS
+    assert [e["event_id"] for e in seen] == sorted(e["event_id"] for e in seen)
+    assert {(e["kind"], e["module_code"], e["week_number"], e["session_id"]) for e in seen} == {("checkin", "CS101", 3, session_id)}
+    assert events.page(after=cursor) == {"events": [], "next": cursor, "has_more": False}
+
+
+def test_compaction_removes_a_prefix_and_expires_old_cursors(seeded_db):
+    session_id = _open_week()
+    for student_id in STUDENTS:
+        AttendanceService.submit_attendance(session_id, student_id, f"Student {student_id}")
+    conn = sqlite3.connect(seeded_db)
+    try:
+        conn.execute("UPDATE attendance_events SET recorded_at = datetime('now', '-40 days') WHERE event_id <= 4")
+        conn.commit()
+    finally:
+        conn.close()
+
+    assert events.compact(30) == {"removed": 4, "horizon": 4}
+    assert events.compact(30) == {"removed": 0, "horizon": 4}
+    assert [e["event_id"] for e in events.page()["events"]] == [5, 6, 7]
+    assert [e["event_id"] for e in events.page(after=4)["events"]] == [5, 6, 7]
+    try:
+        events.page(after=2)
+    except events.CursorExpired as e:
+        assert e.horizon == 4
+    else:
+        raise AssertionError("cursor behind the horizon was accepted")
+
+
+def test_events_route_streams_ndjson_and_is_protected(seeded_db, monkeypatch):
+    session_id = _open_week()
+    for student_id in STUDENTS:
+        AttendanceService.submit_attendance(session_id, student_id, f"Student {student_id}")
+    monkeypatch.setattr(app_module, "EVENTS_TOKEN", "sis-secret")
+    client = app_module.create_app({"TESTING": True}).test_client()
+    assert client.get("/api/events").status_code == 403
+    auth = {"Authorization": "Bearer sis-secret"}
+
+    for bad in ("abc", "3x", "", "-1", " 3"):
+        resp = client.get(f"/api/events?after={bad}", headers=auth)
+        assert resp.status_code == 400 and not resp.get_json()["ok"], bad
+    assert client.get("/api/events?after=0", headers=auth).get_json()["events"][0]["event_id"] == 1
+
+    body = client.get("/api/events?after=2&limit=2", headers=auth).get_json()
+    assert body["ok"] and [e["event_id"] for e in body["events"]] == [3, 4] and body["next"] == 4 and body["has_more"]
+
+    resp = client.get("/api/events?after=4", headers={**auth, "Accept": "application/x-ndjson"})
+    assert resp.mimetype == "application/x-ndjson"
+    assert [json.loads(line)["event_id"] for line in resp.get_data(as_text=True).splitlines()] == [5, 6, 7]
+
+    conn = sqlite3.connect(seeded_db)
+    try:
+        conn.execute("UPDATE attendance_events SET recorded_at = datetime('now', '-400 days')")
+        conn.commit()
+    finally:
+        conn.close()
+    events.compact(30)
+    expired = client.get("/api/events?after=4&format=ndjson", headers=auth)
+    assert expired.status_code == 410 and expired.get_json()["horizon"] == 7
+    assert client.get("/api/events?after=7&format=ndjson", headers=auth).get_data() == b""
+
+
+def test_unread_compressed_stream_releases_its_connection(seeded_db, monkeypatch):
+    session_id = _open_week()
+    for student_id in STUDENTS:
+        AttendanceService.submit_attendance(session_id, student_id, f"Student {student_id}")
+    monkeypatch.setattr(app_module, "EVENTS_TOKEN", "sis-secret")
+    flask_app = app_module.create_app({"TESTING": True})
+
+    for encoding in ("identity", "gzip"):
+        environ = EnvironBuilder(
+            path="/api/events", query_string="format=ndjson",
+            headers={"Authorization": "Bearer sis-secret", "Accept-Encoding": encoding},
+        ).get_environ()
+        headers = []
+        body = flask_app.wsgi_app(environ, lambda status, response_headers, exc_info=None: headers.extend(response_headers))
+        assert (("Content-Encoding", "gzip") in headers) == (encoding == "gzip")
+        assert db.pool_stats()["reader"]["in_use"] == 1
+        # Client gone before the first chunk: the server closes the body without iterating it
+        body.close()
+        assert db.pool_stats()["reader"]["in_use"] == 0
+
+
+def test_migration_replays_existing_checkins(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        create_tables(cur)
+        cur.execute("DROP TABLE attendance_events")
+        cur.execute("INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (2, 'lect', 'x', 'lecturer', 'L')")
+        cur.executemany(
+            "INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (?, ?, 'x', 'student', ?)",
+            [(905000001, "905000001", "Ada"), (905000002, "905000002", "Bob")],
+        )
+        cur.execute("INSERT INTO modules (module_id, module_code, module_name, lecturer_id, planned_weeks) VALUES (1, 'CS101', 'One', 2, 14)")
+        cur.execute("INSERT INTO sessions (session_id, module_id, week_number, session_date, status) VALUES (1, 1, 2, '2025-02-01', 'ended')")
+        cur.executemany(
+            "INSERT INTO attendance (session_id, student_id, checkin_time) VALUES (1, ?, ?)",
+            [(905000002, "2025-02-01 09:10:00"), (905000001, "2025-02-01 09:05:00")],
+        )
+        create_tables(cur)
+        conn.commit()
+
+        rows = conn.execute("SELECT event_id, student_id, module_id, week_number, occurred_at FROM attendance_events ORDER BY event_id").fetchall()
+        assert rows == [(1, 905000001, 1, 2, "2025-02-01 09:05:00"), (2, 905000002, 1, 2, "2025-02-01 09:10:00")]
+        create_tables(cur)  # existing feed is never replayed twice
+        assert conn.execute("SELECT COUNT(*) FROM attendance_events").fetchone()[0] == 2
+    finally:
+        conn.close()
@@ -0,0 +1,49 @@
+import sqlite3
+
+import app as app_module
+from db import pool
+from services.attendance_service import AttendanceService
+
+
+def _add_session(path: str) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO sessions (session_id, module_id, week_number, session_date, status) VALUES (1, 1, 1, '2025-02-01', 'active')")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_unchanged_pages_get_304_without_sql(seeded_db):
+    _add_session(seeded_db)
+    client = app_module.create_app({"TESTING": True}).test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 2, "username": "lect", "role": "lecturer"}
+
+    first = client.get("/lecturer/modules/1/weeks", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200 and first.headers["Content-Encoding"] == "gzip"
+    etag = first.headers["ETag"]
+    assert "private" in first.headers["Cache-Control"] and "no-cache" in first.headers["Cache-Control"]
+
+    statements = []
+    listener = lambda sql, params, seconds: statements.append(sql)
+    pool.add_statement_listener(listener)
+    try:
+        again = client.get("/lecturer/modules/1/weeks", headers={"If-None-Match": etag})
+    finally:
+        pool.remove_statement_listener(listener)
+    assert again.status_code == 304 and again.headers["ETag"] == etag and statements == []
+
+    session_page = client.get("/lecturer/sessions/1/attendance")
+    ok, err = AttendanceService.submit_attendance(1, 905000001, "Ada")
+    assert ok, err
+    changed = client.get("/lecturer/modules/1/weeks", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    refreshed = client.get("/lecturer/sessions/1/attendance", headers={"If-None-Match": session_page.headers["ETag"]})
+    assert refreshed.status_code == 200 and b"905000001" in refreshed.data
+
+    # Another user never matches this user's validators
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 3, "username": "other", "role": "lecturer"}
+    assert client.get("/lecturer/modules/1/weeks", headers={"If-None-Match": changed.headers["ETag"]}).status_code == 200
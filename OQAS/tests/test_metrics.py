@@ -0,0 +1,53 @@
+import re
+
+import app as app_module
+from services import metrics
+
+
+def _value(text, series):
+    match = re.search(r"^" + re.escape(series) + r" (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_metrics_counts_requests_and_sql(temp_db, monkeypatch):
+    flask_app = app_module.create_app({"TESTING": True, "WTF_CSRF_ENABLED": False})
+    client = flask_app.test_client()
+
+    assert client.get("/metrics").status_code == 403
+
+    before = metrics.render_prometheus()
+    client.post("/login", data={"username": "nobody", "password": "x"})
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 1, "username": "admin", "role": "admin"}
+    text = client.get("/metrics").data.decode()
+
+    requests = 'oqas_http_requests_total{endpoint="login",method="POST",status="200"}'
+    assert _value(text, requests) == _value(before, requests) + 1
+    sql = 'oqas_sql_statements_total{endpoint="login"}'
+    assert _value(text, sql) >= _value(before, sql) + 1
+    assert 'oqas_http_request_duration_seconds_bucket{endpoint="login",le="+Inf"}' in text
+    assert "# TYPE oqas_db_pool_connections gauge" in text
+
+    monkeypatch.setattr(app_module, "METRICS_TOKEN", "scrape-me")
+    anonymous = flask_app.test_client()
+    assert anonymous.get("/metrics", headers={"Authorization": "Bearer scrape-me"}).status_code == 200
+    assert anonymous.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+
+
+def test_exited_threads_fold_their_shards_into_the_totals():
+    import gc
+    import threading
+
+    before = len(metrics._shards)
+    baseline = metrics._merged()[0].get(("oqas_test_runs_total", (("job", "t"),)), 0.0)
+    for _ in range(20):
+        t = threading.Thread(target=lambda: (metrics.inc("oqas_test_runs_total", job="t"), metrics.observe("oqas_test_seconds", 0.01, job="t")))
+        t.start()
+        t.join()
+        del t
+    gc.collect()
+
+    assert len(metrics._shards) <= before + 1
+    counters, histograms = metrics._merged()
+    assert counters[("oqas_test_runs_total", (("job", "t"),))] == baseline + 20
+    assert sum(histograms[("oqas_test_seconds", (("job", "t"),))][:-1]) == 20
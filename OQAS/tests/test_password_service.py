@@ -0,0 +1,35 @@
+import threading
+
+import pytest
+
+from services import password_service
+from services.admission import AdmissionGate
+from services.password_service import PasswordBusyError, PasswordService
+
+
+def test_hash_and_verify_run_on_worker_pool():
+    hashed = PasswordService.hash("s3cret")
+    assert PasswordService.verify(hashed, "s3cret") is True
+    assert PasswordService.verify(hashed, "wrong") is False
+    assert PasswordService.verify("not-a-hash", "s3cret") is False
+
+
+def test_saturated_pool_rejects_after_queue_timeout(monkeypatch):
+    monkeypatch.setattr(PasswordService, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(password_service, "HASH_QUEUE_TIMEOUT", 0.01)
+    PasswordService._slots.acquire()
+    try:
+        with pytest.raises(PasswordBusyError):
+            PasswordService.hash("s3cret")
+    finally:
+        PasswordService._slots.release()
+
+
+def test_admission_gate_caps_concurrency():
+    gate = AdmissionGate("login", limit=1, wait_seconds=0.01)
+    assert gate.enter() is True
+    assert gate.enter() is False
+    gate.leave()
+    assert gate.enter() is True
+    gate.leave()
+    assert gate.stats() == {"limit": 1, "active": 0, "admitted": 2, "rejected": 1}
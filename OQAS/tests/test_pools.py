@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+import db
+
+
+def test_read_connections_are_query_only_snapshots(temp_db):
+    reader = db.read_connection()
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("INSERT INTO app_runs (session_seed) VALUES ('x')")
+        assert reader.execute("SELECT COUNT(*) FROM app_runs").fetchone()[0] == 0
+
+        # A write committed after the snapshot started is not visible to this borrow
+        writer = db.connect()
+        try:
+            writer.execute("INSERT INTO app_runs (session_seed) VALUES ('seed')")
+            writer.commit()
+        finally:
+            writer.close()
+        assert reader.execute("SELECT COUNT(*) FROM app_runs").fetchone()[0] == 0
+    finally:
+        reader.close()
+
+    reader = db.read_connection()
+    try:
+        assert reader.execute("SELECT COUNT(*) FROM app_runs").fetchone()[0] == 1
+    finally:
+        reader.close()
+
+
+def test_pool_stats_are_reported_per_pool(temp_db):
+    db.connect().close()
+    db.read_connection().close()
+    db.read_connection().close()
+    stats = db.pool_stats()
+    assert stats["writer"]["acquired"] == 1
+    assert stats["reader"]["acquired"] == 2
+    assert stats["reader"]["in_use"] == 0
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import app as app_module
+from services.profiler import profiler
+
+
+def _busy_checkin_stand_in(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def _admin_client():
+    flask_app = app_module.create_app({"TESTING": True, "WTF_CSRF_ENABLED": False})
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 1, "username": "admin", "role": "admin"}
+    return client
+
+
+def test_sampling_profile_collects_collapsed_stacks():
+    client = _admin_client()
+    assert app_module.create_app({"TESTING": True}).test_client().post("/admin/profile/start").status_code == 302
+
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_checkin_stand_in, args=(stop,), name="waitress-7")
+    worker.start()
+    try:
+        started = client.post("/admin/profile/start?seconds=5&interval_ms=2").get_json()
+        assert started["profile"]["running"]
+        assert client.post("/admin/profile/start").status_code == 409
+        time.sleep(0.3)
+        status = client.post("/admin/profile/stop").get_json()["profile"]
+    finally:
+        stop.set()
+        worker.join()
+        profiler.stop()
+
+    assert not status["running"] and status["samples"] > 0
+    body = client.get("/admin/profile/collapsed")
+    assert "attachment" in body.headers["Content-Disposition"]
+    line = next(l for l in body.data.decode().splitlines() if "_busy_checkin_stand_in" in l)
+    stack, count = line.rsplit(" ", 1)
+    assert stack.startswith("waitress;") and int(count) >= 1
+    assert "tests/test_profiler.py:_busy_checkin_stand_in" in stack
+
+
+def test_memory_snapshots_show_growth():
+    client = _admin_client()
+    assert client.post("/admin/memory/start?frames=5").get_json()["memory"]["tracing"]
+    try:
+        first = client.post("/admin/memory/snapshot").get_json()["snapshot"]
+        leak = [bytearray(1024) for _ in range(2000)]
+        second = client.post("/admin/memory/snapshot").get_json()["snapshot"]
+        diff = client.get(f"/admin/memory/diff?from={first}&to={second}&limit=50").get_json()
+        assert diff["ok"]
+        grown = [s for s in diff["stats"] if any("test_profiler.py" in f for f in s["frames"])]
+        assert grown and grown[0]["size_diff"] >= 2000 * 1024
+        assert client.get("/admin/memory/diff?from=999&to=1").status_code == 404
+        del leak
+    finally:
+        assert not client.post("/admin/memory/stop").get_json()["memory"]["tracing"]
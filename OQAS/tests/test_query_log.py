@@ -0,0 +1,53 @@
+import json
+import logging
+
+from db.query_log import QueryLog, logger
+from services.attendance_service import AttendanceService
+
+
+def test_slow_statements_are_logged_with_plan_and_caller(temp_db, tmp_path):
+    log = QueryLog()
+    log.install(0, db_path=temp_db)  # everything counts as slow
+    records = []
+    handler = logging.Handler()
+    handler.emit = lambda record: records.append(json.loads(record.getMessage()))
+    logger.addHandler(handler)
+    previous_level = logger.level
+    logger.setLevel(logging.INFO)
+    try:
+        AttendanceService.calculate_module_attendance_summary(1)
+        log.flush()
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(previous_level)
+        log.uninstall()
+
+    entry = next(r for r in records if r["sql"].startswith("SELECT module_code, module_name FROM modules"))
+    assert entry["params"] == ["int"]
+    assert entry["caller"].startswith("services/attendance_service.py:AttendanceService.calculate_module_attendance_summary:")
+    assert any("modules" in step for step in entry["plan"])
+
+    top = log.top(5)
+    assert top and top[0]["total_ms"] >= top[-1]["total_ms"]
+    assert all(row["count"] >= 1 for row in top)
+
+
+def test_failed_writes_are_counted_and_logged(temp_db, monkeypatch, caplog):
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    log = QueryLog()
+    log.install(0, db_path=temp_db)
+    monkeypatch.setattr(logger, "info", disk_full)
+    try:
+        with caplog.at_level(logging.ERROR, logger="oqas.sql.query_log"):
+            AttendanceService.calculate_module_attendance_summary(1)
+            log.flush()
+    finally:
+        log.uninstall()
+
+    stats = log.stats()
+    assert stats["failed"] >= 1 and stats["written"] == 0 and stats["dropped"] == 0
+    # The app's own query_log may be installed too; each writer logs its first failure
+    errors = [r for r in caplog.records if r.name == "oqas.sql.query_log"]
+    assert errors and all(r.exc_info[0] is OSError and "lost so far" in r.getMessage() for r in errors)
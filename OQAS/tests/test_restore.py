@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import threading
+
+import db
+from services import admin_service
+from services.admin_service import AdminService
+from tests.conftest import make_database
+
+
+def _add_lecturer(path: str, username: str) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(
+            "INSERT INTO users (username, password_hash, role, full_name) VALUES (?, 'x', 'lecturer', ?)",
+            (username, username.title()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _usernames() -> list:
+    conn = db.connect()
+    try:
+        return [r[0] for r in conn.execute("SELECT username FROM users ORDER BY username")]
+    finally:
+        conn.close()
+
+
+def test_restore_swaps_in_validated_copy(temp_db, tmp_path):
+    _add_lecturer(temp_db, "live")
+    backup = str(tmp_path / "backup.sqlite3")
+    make_database(backup)
+    _add_lecturer(backup, "restored")
+
+    # Warm the pool so there is an idle handle on the old file
+    assert _usernames() == ["live"]
+
+    ok, err = AdminService.restore_database(backup)
+    assert ok, err
+    assert _usernames() == ["restored"]
+    assert os.path.exists(backup)  # non-staged sources are copied, not consumed
+    assert any(n.startswith("auto_backup_before_restore_") for n in os.listdir(os.path.dirname(temp_db)))
+
+
+def test_restore_rejects_invalid_files(temp_db, tmp_path):
+    _add_lecturer(temp_db, "live")
+
+    garbage = tmp_path / "garbage.db"
+    garbage.write_bytes(b"definitely not sqlite" * 100)
+    ok, err = AdminService.restore_database(str(garbage))
+    assert not ok and err
+
+    foreign = str(tmp_path / "foreign.db")
+    conn = sqlite3.connect(foreign)
+    conn.execute("CREATE TABLE other (x INTEGER)")
+    conn.commit()
+    conn.close()
+    ok, err = AdminService.restore_database(foreign)
+    assert not ok and "missing tables" in err
+
+    assert _usernames() == ["live"]
+    assert not [n for n in os.listdir(os.path.dirname(temp_db)) if n.startswith(".restore_")]
+
+
+def test_pause_waits_for_in_flight_connections(temp_db):
+    pool = db.get_pool()
+    held = pool.acquire()
+    assert pool.pause(drain_timeout=0.05) is False  # borrowed connection blocks the drain
+
+    released = threading.Timer(0.1, held.close)
+    released.start()
+    assert pool.pause(drain_timeout=5) is True
+    try:
+        assert pool.in_use == 0
+    finally:
+        pool.resume()
+    released.join()
+    conn = pool.acquire()
+    conn.close()
+
+
+def test_restore_is_refused_with_several_workers(temp_db, tmp_path, monkeypatch):
+    _add_lecturer(temp_db, "live")
+    backup = str(tmp_path / "backup.sqlite3")
+    make_database(backup)
+    _add_lecturer(backup, "restored")
+    monkeypatch.setattr(admin_service, "SERVE_WORKERS", 3)
+
+    ok, err = AdminService.restore_database(backup)
+    assert not ok and "3 workers" in err
+    with open(backup, "rb") as upload:
+        staged = AdminService.stage_restore_upload(upload)
+    ok, err = AdminService.restore_database(staged, staged=True)
+    assert not ok and not os.path.exists(staged)
+
+    assert _usernames() == ["live"]
+    assert not [n for n in os.listdir(os.path.dirname(temp_db)) if n.startswith("auto_backup_before_restore_")]
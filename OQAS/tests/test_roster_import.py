@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from services import roster_service
+from services.password_service import PasswordService
+from services.roster_service import RosterService
+
+
+CSV = (
+    "student_id,full_name,password\n"
+    "905000001,Ada Lovelace,\n"
+    "905000002,Alan Turing,enigma\n"
+    "123,Too Short Id,\n"
+    "905000001,Ada Lovelace,\n"
+).encode("utf-8")
+
+
+def _students(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT user_id, full_name, password_hash FROM users WHERE role = 'student' ORDER BY user_id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_import_is_an_idempotent_upsert(temp_db):
+    progress = []
+    result = RosterService.import_csv(CSV, progress=lambda d, t: progress.append((d, t)), processes=1)
+    assert (result["inserted"], result["updated"], result["unchanged"]) == (2, 0, 0)
+    assert len(result["errors"]) == 1
+    assert progress[-1] == (2, 2)
+
+    first = _students(temp_db)
+    assert [r[1] for r in first] == ["Ada Lovelace", "Alan Turing"]
+    assert PasswordService.verify(first[0][2], "temp-password")
+    assert PasswordService.verify(first[1][2], "enigma")
+
+    renamed = CSV.replace(b"Alan Turing", b"Alan M. Turing")
+    result = RosterService.import_csv(renamed, processes=1)
+    assert (result["inserted"], result["updated"], result["unchanged"]) == (0, 1, 1)
+    second = _students(temp_db)
+    assert second[1][1] == "Alan M. Turing"
+    assert [r[2] for r in second] == [r[2] for r in first]  # passwords untouched
+
+
+def _wait(job_id):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        job = RosterService.get_job(job_id)
+        if job["status"] != "running":
+            return job
+        time.sleep(0.02)
+    raise AssertionError("import job did not finish")
+
+
+def test_import_jobs_are_shared_across_processes_and_expire(temp_db, monkeypatch):
+    monkeypatch.setattr(roster_service, "ROSTER_HASH_PROCESSES", 1)
+    monkeypatch.setattr(roster_service, "MAX_JOB_ERRORS", 1)
+    bad_rows = b"".join(b"%d,Short,\n" % i for i in range(3))
+    job = _wait(RosterService.start_import_job(CSV + bad_rows))
+    assert job["status"] == "finished" and (job["done"], job["total"]) == (2, 2)
+    assert job["result"]["inserted"] == 2 and job["result"]["skipped"] == 4 and len(job["result"]["errors"]) == 1
+
+    # Another worker process answers the status poll
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1]); import db; db.configure_pool(sys.argv[2]);"
+        "from services.roster_service import RosterService; print(RosterService.get_job(sys.argv[3])['status'])"
+    )
+    out = subprocess.run([sys.executable, "-c", script, project_root, temp_db, job["job_id"]],
+                         check=True, timeout=60, capture_output=True, text=True).stdout
+    assert out.strip() == "finished"
+
+    conn = sqlite3.connect(temp_db)
+    conn.execute("UPDATE import_jobs SET updated_at = datetime('now', '-2 days')")
+    conn.commit()
+    conn.close()
+    newer = _wait(RosterService.start_import_job(CSV))
+    assert RosterService.get_job(job["job_id"]) is None
+    assert newer["result"]["unchanged"] == 2
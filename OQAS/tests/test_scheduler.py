@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import app as app_module
+from db import read_connection
+from services import data_versions
+from services.admin_service import AdminService
+from services.scheduler import Job, Scheduler, scheduler
+from services.session_service import SessionController
+
+
+def _seed_sessions(path: str) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (2, 'lect', 'x', 'lecturer', 'Lecturer')")
+        cur.executemany(
+            "INSERT INTO modules (module_id, module_code, module_name, lecturer_id, planned_weeks) VALUES (?, ?, ?, 2, 14)",
+            [(1, "CS101", "One"), (2, "CS102", "Two")],
+        )
+        cur.executemany(
+            "INSERT INTO sessions (session_id, module_id, week_number, session_date, status, created_at) "
+            "VALUES (?, ?, ?, date('now'), ?, datetime('now', ?))",
+            [
+                (1, 1, 1, "active", "-5 hours"),
+                (2, 2, 1, "active", "-4 hours"),
+                (3, 2, 2, "active", "-10 minutes"),
+                (4, 1, 2, "ended", "-9 hours"),
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_expire_stale_ends_old_sessions_in_every_module(temp_db):
+    _seed_sessions(temp_db)
+    before = data_versions.current([data_versions.module(2)])[0]
+
+    assert SessionController.expire_stale(3) == 2
+    conn = read_connection()
+    try:
+        statuses = dict(conn.execute("SELECT session_id, status FROM sessions").fetchall())
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT session_id FROM sessions WHERE status = 'active' AND COALESCE(reopened_at, created_at) < datetime('now', '-3 hours')"
+        ))
+    finally:
+        conn.close()
+    assert statuses == {1: "ended", 2: "ended", 3: "active", 4: "ended"}
+    assert "idx_sessions_status_started" in plan
+    assert data_versions.current([data_versions.module(2)])[0] != before
+    assert SessionController.expire_stale(3) == 0
+
+
+def test_expire_stale_counts_a_reopened_session_from_its_reopening(temp_db):
+    _seed_sessions(temp_db)
+    # Session 4 (module 1, week 2) was started and ended hours ago
+    assert SessionController.open_week(1, 2) == (4, "reopen")
+    assert SessionController.expire_stale(3) == 2  # sessions 1 and 2 only
+    conn = read_connection()
+    try:
+        assert conn.execute("SELECT status FROM sessions WHERE session_id = 4").fetchone()[0] == "active"
+    finally:
+        conn.close()
+
+
+def test_job_never_overlaps_itself_and_keeps_history():
+    release = threading.Event()
+    job = Job("slow", lambda: release.wait(5) and {"done": True}, interval=60)
+    first = threading.Thread(target=job.run)
+    first.start()
+    while not job.running:
+        time.sleep(0.01)
+    assert job.run(trigger="manual")["status"] == "skipped"
+    release.set()
+    first.join()
+
+    failing = Job("broken", lambda: 1 / 0, interval=60)
+    assert failing.run()["status"] == "error"
+    status = job.status()
+    assert (status["runs"], status["skipped"]) == (1, 1)
+    assert status["last"]["result"] == {"done": True} and status["history"][1]["trigger"] == "manual"
+    assert failing.status()["failures"] == 1
+
+
+def test_scheduler_runs_due_jobs_on_jittered_intervals(tmp_path):
+    ran = []
+    sched = Scheduler()
+    sched.add("tick", lambda: ran.append(time.monotonic()), interval=0.2, jitter=0.5, first_delay=0)
+    assert sched.add("off", lambda: None, interval=0) is None
+    sched.start(lock_path=str(tmp_path / "sched.lock"))
+    try:
+        deadline = time.monotonic() + 5
+        while len(ran) < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert len(ran) >= 3
+        assert sched.status()["leader"] is True
+        assert [j["name"] for j in sched.status()["jobs"]] == ["tick"]
+    finally:
+        sched.stop()
+
+
+def test_only_one_process_holds_the_scheduler_lock(tmp_path):
+    lock_path = str(tmp_path / "sched.lock")
+    sched = Scheduler()
+    sched.start(lock_path=lock_path)
+    try:
+        assert sched.is_leader()
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        probe = (
+            "import sys; sys.path.insert(0, sys.argv[1]);"
+            "from services.scheduler import Scheduler; s = Scheduler(); s._lock_path = sys.argv[2];"
+            "print(s.is_leader())"
+        )
+        other = subprocess.run([sys.executable, "-c", probe, project_root, lock_path], capture_output=True, text=True, timeout=60)
+        assert other.stdout.strip() == "False", other.stderr
+    finally:
+        sched.stop()
+
+
+def test_scheduled_backup_is_consistent_and_prunes_only_its_own(temp_db, tmp_path):
+    _seed_sessions(temp_db)
+    target = str(tmp_path / "backups")
+    ok, _, manual = AdminService.backup_database(target)
+    assert ok
+    for _ in range(3):
+        AdminService.scheduled_backup(target, keep=2)
+        time.sleep(1.05)  # backup names carry a seconds timestamp
+    kept = AdminService.list_backups(target)
+    assert len(kept) == 3 and manual in kept
+    assert len([p for p in kept if "oqas_scheduled_" in p]) == 2
+    conn = sqlite3.connect(kept[0])
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 4
+    finally:
+        conn.close()
+
+
+def test_scheduler_routes_are_admin_only(temp_db):
+    _seed_sessions(temp_db)
+    client = app_module.create_app({"TESTING": True, "WTF_CSRF_ENABLED": False}).test_client()
+    assert client.get("/admin/scheduler").status_code == 302
+    with client.session_transaction() as sess:
+        sess["user"] = {"user_id": 1, "username": "admin", "role": "admin"}
+    assert client.get("/admin/scheduler").get_json()["ok"]
+    assert client.post("/admin/scheduler/nope/run").status_code == 404
+
+    scheduler.add("expire_sessions", lambda: {"expired": SessionController.expire_stale(3)}, interval=60)
+    try:
+        body = client.post("/admin/scheduler/expire_sessions/run").get_json()
+        assert body["ok"] and body["run"]["result"] == {"expired": 2} and body["run"]["trigger"] == "manual"
+        listed = client.get("/admin/scheduler").get_json()["jobs"]
+        assert listed[0]["name"] == "expire_sessions" and listed[0]["runs"] == 1
+    finally:
+        scheduler.add("expire_sessions", lambda: None, interval=0)
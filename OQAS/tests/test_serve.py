@@ -0,0 +1,58 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A worker like serve.run_worker, but with a slow stand-in app instead of OQAS
+WORKER = textwrap.dedent(
+    """
+    import sys, time
+    from waitress.server import create_server
+    from serve import GracefulShutdown, InFlightMiddleware, bind_socket
+
+    def slow_app(environ, start_response):
+        time.sleep(1.0)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"checked in"]
+
+    sock = bind_socket("127.0.0.1", 0, reuse_port=False)
+    middleware = InFlightMiddleware(slow_app)
+    server = create_server(middleware, sockets=[sock], threads=2)
+    GracefulShutdown(server, middleware, drain_timeout=10).install()
+    print(sock.getsockname()[1], flush=True)
+    server.run()
+    print("exited", middleware.served, flush=True)
+    """
+)
+
+
+def test_sigterm_drains_in_flight_request():
+    proc = subprocess.Popen(
+        [sys.executable, "-c", WORKER], cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        port = int(proc.stdout.readline())
+        result = {}
+
+        def _request():
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=10) as resp:
+                result["body"] = resp.read()
+
+        client = threading.Thread(target=_request)
+        client.start()
+        time.sleep(0.3)  # request is now inside the app
+        proc.send_signal(signal.SIGTERM)
+        client.join(timeout=10)
+
+        assert result.get("body") == b"checked in"
+        assert proc.wait(timeout=10) == 0
+        assert proc.stdout.read().strip() == "exited 1"
+    finally:
+        if proc.poll() is None:
+            proc.kill()
@@ -0,0 +1,120 @@
+import random
+import sqlite3
+import threading
+
+from init_db import create_tables
+from services import audit
+from services.module_service import ModuleService
+from services.session_service import SessionController
+
+
+def test_start_reopen_resume_and_close_are_audited(seeded_db):
+    session_id, action = SessionController.open_week(1, 5, actor_user_id=2)
+    assert action == "start"
+    assert SessionController.open_week(1, 5, actor_user_id=2) == (session_id, "resume")
+    SessionController.close_session(session_id, actor_user_id=2)
+    SessionController.close_session(session_id, actor_user_id=2)  # already ended: no second audit row
+    assert SessionController.open_week(1, 5, actor_user_id=2) == (session_id, "reopen")
+    assert ModuleService.close_session(1, actor_user_id=2)
+    audit.flush()
+
+    conn = sqlite3.connect(seeded_db)
+    try:
+        actions = [r[0] for r in conn.execute("SELECT action FROM session_audit WHERE session_id = ? ORDER BY audit_id", (session_id,))]
+        status, reopened_at = conn.execute("SELECT status, reopened_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+    finally:
+        conn.close()
+    assert actions == ["session.start", "session.close", "session.reopen", "session.close"]
+    assert status == "ended" and reopened_at is not None
+
+
+def test_reopened_session_survives_expiry(seeded_db):
+    session_id, _ = SessionController.open_week(1, 5, actor_user_id=2)
+    SessionController.close_session(session_id, actor_user_id=2)
+    conn = sqlite3.connect(seeded_db)
+    try:
+        conn.execute("UPDATE sessions SET created_at = datetime('now', '-1 day') WHERE session_id = ?", (session_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    assert SessionController.open_week(1, 5, actor_user_id=2) == (session_id, "reopen")
+    assert SessionController.expire_stale(3) == 0
+    assert SessionController.open_week(1, 5, actor_user_id=2) == (session_id, "resume")
+
+
+def test_concurrent_starts_and_closes_never_duplicate_a_week(seeded_db):
+    errors = []
+    barrier = threading.Barrier(12)
+
+    def hammer(seed: int) -> None:
+        rng = random.Random(seed)
+        barrier.wait()
+        try:
+            for _ in range(25):
+                op = rng.random()
+                if op < 0.4:
+                    SessionController.open_week(1, 7, actor_user_id=2)
+                elif op < 0.6:
+                    assert ModuleService.start_session(1, 7, actor_user_id=2)
+                elif op < 0.8:
+                    ModuleService.close_session(1, actor_user_id=2)
+                else:
+                    SessionController.close_session(1, actor_user_id=2)
+        except Exception as e:  # collected: assertion failures in threads would be lost
+            errors.append(e)
+
+    threads = [threading.Thread(target=hammer, args=(i,)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    audit.flush()
+
+    conn = sqlite3.connect(seeded_db)
+    try:
+        sessions = conn.execute("SELECT session_id, status FROM sessions WHERE module_id = 1 AND week_number = 7").fetchall()
+        counts = dict(conn.execute("SELECT action, COUNT(*) FROM session_audit GROUP BY action").fetchall())
+    finally:
+        conn.close()
+    assert len(sessions) == 1
+    # Every transition was audited exactly once, so opens and closes alternate
+    assert counts["session.start"] == 1
+    opens, closes = counts["session.start"] + counts.get("session.reopen", 0), counts.get("session.close", 0)
+    assert opens - closes == (1 if sessions[0][1] == "active" else 0)
+
+
+def test_migration_merges_duplicate_weeks(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        create_tables(cur)
+        cur.execute("DROP INDEX idx_sessions_module_week")
+        cur.execute("INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (2, 'lect', 'x', 'lecturer', 'L')")
+        cur.executemany(
+            "INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (?, ?, 'x', 'student', ?)",
+            [(905000001, "905000001", "Ada"), (905000002, "905000002", "Bob")],
+        )
+        cur.execute("INSERT INTO modules (module_id, module_code, module_name, lecturer_id, planned_weeks) VALUES (1, 'CS101', 'One', 2, 14)")
+        cur.executemany(
+            "INSERT INTO sessions (session_id, module_id, week_number, session_date, status, created_at) VALUES (?, 1, 3, '2025-02-01', ?, ?)",
+            [(1, "active", "2025-02-01 09:00:00"), (2, "ended", "2025-02-01 09:05:00"), (3, "ended", "2025-02-08 09:00:00")],
+        )
+        cur.executemany(
+            "INSERT INTO attendance (session_id, student_id) VALUES (?, ?)",
+            [(1, 905000001), (2, 905000001), (2, 905000002)],
+        )
+        cur.execute("INSERT INTO session_audit (session_id, actor_user_id, action) VALUES (1, 2, 'start')")
+        create_tables(cur)
+        conn.commit()
+
+        assert conn.execute("SELECT session_id, status FROM sessions").fetchall() == [(3, "active")]
+        assert conn.execute("SELECT session_id, student_id FROM attendance ORDER BY student_id").fetchall() == [
+            (3, 905000001), (3, 905000002),
+        ]
+        assert conn.execute("SELECT session_id FROM session_audit").fetchall() == [(3,)]
+        assert [r[1] for r in conn.execute("PRAGMA index_list('sessions')") if r[2]] == ["idx_sessions_module_week"]
+    finally:
+        conn.close()
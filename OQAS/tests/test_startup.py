@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fresh interpreter, so modules already imported by other tests do not hide eager imports
+PROBE = textwrap.dedent(
+    """
+    import socket, sqlite3, sys
+
+    def _forbidden(*args, **kwargs):
+        raise AssertionError("network or database touched during startup")
+
+    sqlite3.connect = _forbidden
+    socket.socket.connect = _forbidden
+
+    import app
+    flask_app = app.create_app()
+    with flask_app.test_request_context():
+        from flask import url_for
+        assert url_for("login") == "/login"
+        assert url_for("checkin") == "/checkin"
+
+    heavy = [m for m in ("qrcode", "PIL", "jwt", "argon2", "multiprocessing") if m in sys.modules]
+    assert not heavy, heavy
+    print("ok")
+    """
+)
+
+
+def test_import_and_create_app_have_no_side_effects():
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=60
+    )
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == "ok"
+
+
+def test_lan_host_is_overridable_and_cached(monkeypatch):
+    import config
+
+    calls = []
+    monkeypatch.setattr(config, "_detect_lan_ip", lambda: calls.append(1) or "10.0.0.5")
+    monkeypatch.setattr(config, "LAN_HOST", None)
+    monkeypatch.setattr(config, "_detected_lan_host", None)
+    assert config.get_lan_host() == "10.0.0.5"
+    assert config.get_lan_host() == "10.0.0.5"
+    assert calls == [1]
+
+    config.set_lan_host("attendance.local")
+    assert config.get_lan_host() == "attendance.local"
+    config.set_lan_host(None)
+    assert config.get_lan_host() == "10.0.0.5"
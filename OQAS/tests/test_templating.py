@@ -0,0 +1,28 @@
+import os
+
+from flask import render_template
+
+import app as app_module
+from services import templating
+
+
+def test_precompile_fills_bytecode_cache_and_block_render_matches(tmp_path):
+    cache_dir = str(tmp_path / "templates")
+    flask_app = app_module.create_app({"TESTING": True})
+    templating.init_app(flask_app, cache_dir)
+    names = [name for name, _ in templating.precompile(flask_app)]
+    assert "checkin.html" in names and "dashboard.html" in names
+    assert len(os.listdir(cache_dir)) == len(names)
+
+    data = {"module_name": "Networks", "lecturer_name": "Dr X", "module_id": 3, "week_number": 2, "session_id": 9}
+    cases = [
+        {"error": "Invalid or expired token"},
+        {"data": data},
+        {"data": data, "form_error": "Name is too short.", "form_values": {"student_id": "905001234", "student_name": "A"}},
+        {"data": data, "success": True, "form_values": {"student_id": 905001234, "student_name": "Ann"}},
+    ]
+    with flask_app.test_request_context("/checkin?tk=abc"):
+        for context in cases:
+            # Twice: the second render reuses the cached shell
+            for _ in range(2):
+                assert templating.render_block("checkin.html", **context) == render_template("checkin.html", **context)
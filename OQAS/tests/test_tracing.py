@@ -0,0 +1,90 @@
+import json
+import logging
+import sqlite3
+
+import app as app_module
+from services import tracing
+from services.password_service import ph
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.traces = []
+
+    def emit(self, record):
+        self.traces.append(json.loads(record.getMessage()))
+
+
+def _names(span):
+    yield span["name"]
+    for child in span.get("children", ()):
+        yield from _names(child)
+
+
+def test_sampled_request_writes_span_tree(temp_db, monkeypatch):
+    conn = sqlite3.connect(temp_db)
+    conn.execute(
+        "INSERT INTO users (user_id, username, password_hash, role, full_name) VALUES (2, 'lect1', ?, 'lecturer', 'Lecturer')",
+        (ph.hash("lect123"),),
+    )
+    conn.commit()
+    conn.close()
+
+    flask_app = app_module.create_app({"TESTING": True, "WTF_CSRF_ENABLED": False})
+    capture = _Capture()
+    tracing.logger.addHandler(capture)
+    try:
+        monkeypatch.setattr(tracing.tracer, "sample_rate", 1.0)
+        flask_app.test_client().post("/login", data={"username": "lect1", "password": "lect123"})
+        tracing.tracer.flush()
+    finally:
+        tracing.logger.removeHandler(capture)
+
+    trace = capture.traces[-1]
+    root = trace["root"]
+    assert root["name"] == "login"
+    assert root["attrs"]["status"] == 302
+    login = next(c for c in root["children"] if c["name"] == "AuthService.login")
+    names = list(_names(login))
+    assert "sql" in names
+    argon2 = next(c for c in login["children"] if c["name"] == "argon2.verify_and_rehash")
+    assert "queued_ms" in argon2["attrs"]
+    assert login["ms"] <= root["ms"]
+
+
+def test_unsampled_requests_are_not_recorded(monkeypatch):
+    monkeypatch.setattr(tracing.tracer, "sample_rate", 0.0)
+    monkeypatch.setattr(tracing.tracer, "slow_seconds", 0.0)
+    assert not tracing.tracer.start("probe")
+    assert not tracing.active()
+    with tracing.span("noop") as span:
+        assert span is None
+
+    # Slow-request capture records everything but keeps only what crossed the threshold
+    monkeypatch.setattr(tracing.tracer, "slow_seconds", 10.0)
+    monkeypatch.setattr(tracing.tracer, "_enqueue", lambda entry: kept.append(entry))
+    kept = []
+    assert tracing.tracer.start("fast")
+    tracing.record("sql", 0.001, sql="SELECT 1")
+    tracing.tracer.finish(status=200)
+    assert kept == [] and not tracing.active()
+
+
+def test_failed_writes_are_counted_and_logged(monkeypatch, caplog):
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(tracing.logger, "info", disk_full)
+    monkeypatch.setattr(tracing.tracer, "_last_error", float("-inf"))
+    before = tracing.tracer.stats()
+    with caplog.at_level(logging.ERROR, logger="oqas.tracing"):
+        tracing.tracer._enqueue({"trace_id": "a"})
+        tracing.tracer._enqueue({"trace_id": "b"})
+        tracing.tracer.flush()
+
+    after = tracing.tracer.stats()
+    assert after["failed"] - before["failed"] == 2 and after["written"] == before["written"]
+    # Rate limited: one traceback for the burst
+    errors = [r for r in caplog.records if r.name == "oqas.tracing"]
+    assert len(errors) == 1 and errors[0].exc_info[0] is OSError